@@ -0,0 +1,344 @@
+from django.db import IntegrityError, connection, transaction
+from django.db.models import BigIntegerField, Count, F, Func, Q, Sum
+from django.db.models.functions import TruncDay, TruncHour
+from django.utils import timezone
+from datetime import datetime, timedelta
+from itertools import islice
+import logging
+import numpy as np
+import pandas as pd
+
+from .models import (
+    User, Student, Faculty, Group, Domain, Topic, GroupSelection,
+    AdminLoginLog, RecoveryLog, ActivityRollup
+)
+from .retention import retention_days
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_COUNTERS = ('logins', 'successful_logins', 'group_creations', 'selections', 'recoveries', 'failed_recoveries')
+GRANULARITY_STEP = {
+    'hour': timedelta(hours=1),
+    'day': timedelta(days=1),
+}
+
+
+def truncate(dt, granularity):
+    """Start of the hour/day bucket containing dt (in the current timezone)"""
+    dt = timezone.localtime(dt)
+    if granularity == 'hour':
+        return dt.replace(minute=0, second=0, microsecond=0)
+    return dt.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _bump(granularity, period_start, increments):
+    updates = {name: F(name) + value for name, value in increments.items()}
+    lookup = {'granularity': granularity, 'period_start': period_start}
+
+    if ActivityRollup.objects.filter(**lookup).update(**updates):
+        return
+    try:
+        with transaction.atomic():
+            ActivityRollup.objects.create(**lookup, **increments)
+    except IntegrityError:
+        # Another request created the bucket first
+        ActivityRollup.objects.filter(**lookup).update(**updates)
+
+
+def record_activity(timestamp, **increments):
+    """Add increments (e.g. logins=1) to the hourly and daily buckets for timestamp"""
+    increments = {name: value for name, value in increments.items() if value}
+    if not increments:
+        return
+    with transaction.atomic():
+        for granularity in GRANULARITY_STEP:
+            _bump(granularity, truncate(timestamp, granularity), increments)
+
+
+def record_activity_on_commit(timestamp, **increments):
+    """
+    record_activity() once the current transaction commits.
+
+    Every write bumps the same hourly and daily rows; doing it inside the
+    group creation or FCFS transaction would hold their row locks until
+    that commits and serialize all selections on them.
+    """
+    def bump():
+        try:
+            record_activity(timestamp, **increments)
+        except Exception:
+            # backfill_rollups() repairs a missed bump
+            logger.exception("Failed to update activity rollups")
+    transaction.on_commit(bump)
+
+
+def _bucket_counts(queryset, field, trunc, counters):
+    """{bucket: {counter: n}} for one model, one GROUP BY query"""
+    rows = queryset.annotate(bucket=trunc(field)).values('bucket').annotate(**counters)
+    return {row.pop('bucket'): row for row in rows}
+
+
+def rebuild_floor():
+    """
+    First day whose audit rows are all still in the raw tables.
+
+    archive_old_rows() moves logins and recoveries older than
+    AUDIT_RETENTION_DAYS out of the database; the rollups of those days are
+    the only counts left, so they must never be rebuilt from the raw tables.
+    """
+    cutoff = timezone.now() - timedelta(days=retention_days())
+    return truncate(cutoff, 'day') + timedelta(days=1)
+
+
+def backfill_rollups(since=None):
+    """Rebuild rollup rows from the raw tables from `since` on, but never before rebuild_floor()"""
+    start = rebuild_floor()
+    if since is not None:
+        start = max(start, truncate(since, 'day'))
+
+    sources = (
+        (AdminLoginLog.objects.all(), 'timestamp', {
+            'logins': Count('id'),
+            'successful_logins': Count('id', filter=Q(success=True)),
+        }),
+        (Group.objects.all(), 'created_at', {'group_creations': Count('id')}),
+        (GroupSelection.objects.all(), 'selected_at', {'selections': Count('id')}),
+        (RecoveryLog.objects.all(), 'timestamp', {
+            'recoveries': Count('id'),
+            'failed_recoveries': Count('id', filter=Q(success=False)),
+        }),
+    )
+
+    created = 0
+    with transaction.atomic():
+        ActivityRollup.objects.filter(period_start__gte=start).delete()
+
+        for granularity, trunc in (('hour', TruncHour), ('day', TruncDay)):
+            buckets = {}
+            for queryset, field, counters in sources:
+                queryset = queryset.filter(**{f'{field}__gte': start})
+                for bucket, counts in _bucket_counts(queryset, field, trunc, counters).items():
+                    buckets.setdefault(bucket, {}).update(counts)
+
+            ActivityRollup.objects.bulk_create(
+                [ActivityRollup(granularity=granularity, period_start=bucket, **counts)
+                 for bucket, counts in buckets.items()],
+                batch_size=500
+            )
+            created += len(buckets)
+
+    logger.info(f"Backfilled {created} activity rollup rows")
+    return created
+
+
+def activity_series(start, end, granularity='day'):
+    """Zero-filled activity per bucket in [start, end), newest first"""
+    step = GRANULARITY_STEP[granularity]
+    start = truncate(start, granularity)
+
+    rows = ActivityRollup.objects.filter(
+        granularity=granularity,
+        period_start__gte=start,
+        period_start__lt=end
+    ).values('period_start', 'logins', 'group_creations', 'selections', 'recoveries')
+    by_bucket = {row['period_start']: row for row in rows}
+
+    series = []
+    bucket = start
+    while bucket < end:
+        row = by_bucket.get(bucket, {})
+        logins = row.get('logins', 0)
+        groups = row.get('group_creations', 0)
+        selections = row.get('selections', 0)
+        series.append({
+            'date': bucket.date() if granularity == 'day' else bucket,
+            'logins': logins,
+            'groupCreations': groups,
+            'selections': selections,
+            'recoveries': row.get('recoveries', 0),
+            'total': logins + groups + selections
+        })
+        bucket += step
+    series.reverse()
+    return series
+
+
+def rollup_totals():
+    """Lifetime counters summed from the daily rollups"""
+    totals = ActivityRollup.objects.filter(granularity='day').aggregate(
+        **{name: Sum(name) for name in ROLLUP_COUNTERS}
+    )
+    return {name: value or 0 for name, value in totals.items()}
+
+
+def user_totals():
+    totals = User.objects.aggregate(
+        total=Count('id'),
+        admins=Count('id', filter=Q(role='admin')),
+        superAdmins=Count('id', filter=Q(role='super_admin')),
+    )
+    totals['students'] = Student.objects.count()
+    totals['faculty'] = Faculty.objects.count()
+    return totals
+
+
+def group_totals():
+    return Group.objects.aggregate(
+        total=Count('id'),
+        active=Count('id', filter=Q(is_complete=False)),
+        completed=Count('id', filter=Q(is_complete=True)),
+        twoMember=Count('id', filter=Q(size=2)),
+        fourMember=Count('id', filter=Q(size=4)),
+    )
+
+
+def selection_totals():
+    return GroupSelection.objects.aggregate(
+        total=Count('id'),
+        approved=Count('id', filter=Q(is_approved=True)),
+        pending=Count('id', filter=Q(is_approved=False)),
+    )
+
+
+def catalog_totals():
+    return {
+        'total': Domain.objects.count(),
+        'topics': Topic.objects.count(),
+    }
+
+
+# ==================== HISTORICAL (VECTORIZED) ANALYTICS ====================
+
+HISTORY_SOURCES = {
+    'logins': (AdminLoginLog, 'timestamp'),
+    'groupCreations': (Group, 'created_at'),
+    'selections': (GroupSelection, 'submitted_at'),
+    'recoveries': (RecoveryLog, 'timestamp'),
+}
+HISTORY_PERIODS = {
+    'minute': 'min',
+    'hour': 'H',
+    'day': 'D',
+    'week': 'W',
+    'month': 'M',
+}
+HISTORY_MAX_BUCKETS = 100000
+HISTORY_CHUNK_SIZE = 20000
+PERCENTILES = (50, 90, 95, 99)
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_MILLISECOND = timedelta(milliseconds=1)
+
+
+class EpochMillis(Func):
+    """Milliseconds since the Unix epoch, computed by the database"""
+    output_field = BigIntegerField()
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return self.as_sql(
+            compiler, connection,
+            template="CAST(ROUND((julianday(%(expressions)s) - 2440587.5) * 86400000.0) AS INTEGER)",
+            **extra_context
+        )
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        return self.as_sql(
+            compiler, connection,
+            template='CAST(EXTRACT(EPOCH FROM %(expressions)s) * 1000 AS BIGINT)',
+            **extra_context
+        )
+
+
+def fetch_epoch_millis(model, field, start, end, chunk_size=HISTORY_CHUNK_SIZE):
+    """All `field` values in [start, end) as an int64 array of epoch milliseconds.
+
+    One column fetch, consumed in chunks. On SQLite/Postgres the conversion
+    happens in SQL so no datetime objects are built in Python.
+    """
+    queryset = model.objects.filter(**{f'{field}__gte': start, f'{field}__lt': end}).order_by()
+
+    if connection.vendor in ('sqlite', 'postgresql'):
+        rows = queryset.values_list(EpochMillis(field), flat=True).iterator(chunk_size=chunk_size)
+        convert = None
+    else:
+        rows = queryset.values_list(field, flat=True).iterator(chunk_size=chunk_size)
+        convert = lambda ts: (ts - _EPOCH) // _MILLISECOND
+
+    chunks = []
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+        if convert:
+            chunk = map(convert, chunk)
+        chunks.append(np.fromiter(chunk, dtype=np.int64))
+
+    if not chunks:
+        return np.empty(0, dtype=np.int64)
+    return np.concatenate(chunks)
+
+
+def _distribution(counts):
+    if not len(counts):
+        return {'total': 0, 'mean': 0.0, 'max': 0, **{f'p{p}': 0.0 for p in PERCENTILES}}
+    values = np.percentile(counts, PERCENTILES)
+    return {
+        'total': int(counts.sum()),
+        'mean': float(counts.mean()),
+        'max': int(counts.max()),
+        **{f'p{p}': float(v) for p, v in zip(PERCENTILES, values)},
+    }
+
+
+def history_series(start, end, granularity='day', opening=None):
+    """Bucketed activity counts and per-bucket percentiles for [start, end).
+
+    `start`/`end` are aware datetimes; buckets are aligned in UTC. If `opening`
+    is given (or else at the first selection in range) the per-second
+    selection rate over the following minute is reported as well.
+
+    Raises ValueError when the range would produce more than
+    HISTORY_MAX_BUCKETS buckets.
+    """
+    freq = HISTORY_PERIODS[granularity]
+    start_utc = pd.Timestamp(start).tz_convert('UTC').tz_localize(None)
+    end_utc = pd.Timestamp(end).tz_convert('UTC').tz_localize(None)
+    first = pd.Period(start_utc, freq=freq)
+    last = pd.Period(end_utc - pd.Timedelta(milliseconds=1), freq=freq)
+    # Period ordinals count buckets without building the index
+    buckets = last.ordinal - first.ordinal + 1
+    if buckets > HISTORY_MAX_BUCKETS:
+        raise ValueError(f'Range too large for {granularity} granularity ({buckets} buckets)')
+    periods = pd.period_range(start=first, end=last, freq=freq)
+
+    series, stats, raw = {}, {}, {}
+    for name, (model, field) in HISTORY_SOURCES.items():
+        millis = fetch_epoch_millis(model, field, start, end)
+        raw[name] = millis
+        counts = (
+            pd.to_datetime(millis, unit='ms').to_period(freq)
+            .value_counts()
+            .reindex(periods, fill_value=0)
+            .to_numpy(dtype=np.int64)
+        )
+        series[name] = counts.tolist()
+        stats[name] = _distribution(counts)
+
+    selections = raw['selections']
+    opening_minute = None
+    if opening is not None or len(selections):
+        opening_ms = (opening - _EPOCH) // _MILLISECOND if opening is not None else int(selections.min())
+        offsets = (selections - opening_ms) // 1000
+        per_second = np.bincount(offsets[(offsets >= 0) & (offsets < 60)], minlength=60)
+        opening_minute = {
+            'opening': _EPOCH + timedelta(milliseconds=int(opening_ms)),
+            'perSecond': per_second.tolist(),
+            **_distribution(per_second),
+        }
+
+    return {
+        'buckets': periods.start_time.tz_localize('UTC').to_pydatetime().tolist(),
+        'series': series,
+        'stats': stats,
+        'openingMinute': opening_minute,
+    }
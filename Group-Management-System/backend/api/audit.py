@@ -0,0 +1,205 @@
+from django.apps import apps
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, close_old_connections, connections, transaction
+from django.db.models import DateTimeField
+from django.utils.dateparse import parse_datetime
+import atexit
+import json
+import logging
+import os
+import threading
+
+from .analytics import record_activity, truncate
+from .models import AdminLoginLog, RecoveryLog
+from .ratelimit import admin_lockout_limiter
+
+logger = logging.getLogger(__name__)
+
+
+def _rollup_increments(model, fields):
+    """ActivityRollup counters for one entry, mirroring the post_save handlers in api.signals"""
+    if model is AdminLoginLog:
+        return {'logins': 1, 'successful_logins': int(bool(fields.get('success')))}
+    if model is RecoveryLog:
+        return {'recoveries': 1, 'failed_recoveries': int(not fields.get('success'))}
+    return {}
+
+
+class AuditSink:
+    """
+    Buffers audit rows in-process and writes them with bulk_create.
+
+    A flush happens every AUDIT_FLUSH_BATCH_SIZE entries or
+    AUDIT_FLUSH_INTERVAL_MS, whichever comes first, and at interpreter exit.
+    If a write fails for any reason the entries are appended to an NDJSON
+    spool file (AUDIT_SPOOL_PATH, under AUDIT_DATA_DIR by default) and
+    replayed by the next successful flush.
+
+    bulk_create does not send post_save, so the side effects of api.signals
+    are applied here: failed admin logins hit the lockout limiter at once,
+    and activity rollups are bumped per flush.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.buffer = []
+        self.wakeup = threading.Event()
+        self.thread = None
+
+    @property
+    def spool_path(self):
+        data_dir = getattr(settings, 'AUDIT_DATA_DIR', settings.BASE_DIR)
+        return getattr(settings, 'AUDIT_SPOOL_PATH', os.path.join(data_dir, 'audit_spool.ndjson'))
+
+    def record(self, model, **fields):
+        """Queue a row; takes the same keyword arguments as model.objects.create()"""
+        entry = self._entry(model, fields)
+
+        if model is AdminLoginLog and not entry['success']:
+            admin_lockout_limiter().hit(entry['ip_address'], entry['timestamp'].timestamp())
+
+        if not getattr(settings, 'AUDIT_WRITE_BEHIND', True):
+            self._write([(model, entry)])
+            return
+
+        with self.lock:
+            self.buffer.append((model, entry))
+            full = len(self.buffer) >= getattr(settings, 'AUDIT_FLUSH_BATCH_SIZE', 100)
+        self._ensure_thread()
+        if full:
+            self.wakeup.set()
+
+    def _entry(self, model, fields):
+        entry = {}
+        for name, value in fields.items():
+            field = model._meta.get_field(name)
+            if field.is_relation and value is not None and not isinstance(value, (int, str)):
+                value = value.pk
+            entry[field.attname] = value
+        for field in model._meta.concrete_fields:
+            if field.attname not in entry and not field.primary_key and field.has_default():
+                entry[field.attname] = field.get_default()
+        return entry
+
+    def flush(self):
+        """Write everything buffered (and any spooled entries). Returns the number of rows written"""
+        with self.lock:
+            batch, self.buffer = self.buffer, []
+
+        with self.flush_lock:
+            spooled = self._take_spool()
+            pending = spooled + batch
+            if not pending:
+                return 0
+            try:
+                return self._write(pending)
+            except Exception:
+                # Not just DatabaseError: anything that aborts the write would otherwise drop the batch
+                logger.exception(f"Audit flush failed, spooling {len(pending)} entries to {self.spool_path}")
+                self._spool(pending)
+                return 0
+
+    def _write(self, entries):
+        by_model = {}
+        for model, entry in entries:
+            by_model.setdefault(model, []).append(entry)
+
+        written = []
+        with transaction.atomic():
+            for model, rows in by_model.items():
+                try:
+                    with transaction.atomic():
+                        model.objects.bulk_create([model(**row) for row in rows])
+                except IntegrityError:
+                    # One bad row must not lose the rest of the batch
+                    rows = self._write_rows(model, rows)
+                written.extend((model, row) for row in rows)
+            self._rollup(written)
+        return len(written)
+
+    def _write_rows(self, model, rows):
+        written = []
+        for row in rows:
+            try:
+                with transaction.atomic():
+                    model.objects.bulk_create([model(**row)])
+                written.append(row)
+            except IntegrityError:
+                logger.error(f"Dropping invalid {model.__name__} audit entry: {row}", exc_info=True)
+        return written
+
+    def _rollup(self, entries):
+        buckets = {}
+        for model, entry in entries:
+            key = truncate(entry['timestamp'], 'hour')
+            counters = buckets.setdefault(key, {})
+            for name, value in _rollup_increments(model, entry).items():
+                counters[name] = counters.get(name, 0) + value
+        for hour, counters in buckets.items():
+            record_activity(hour, **counters)
+
+    def _spool(self, entries):
+        os.makedirs(os.path.dirname(self.spool_path), exist_ok=True)
+        with open(self.spool_path, 'a', encoding='utf-8') as spool:
+            for model, entry in entries:
+                spool.write(json.dumps({'model': model._meta.label_lower, 'fields': entry}, cls=DjangoJSONEncoder) + '\n')
+            spool.flush()
+            os.fsync(spool.fileno())
+
+    def _take_spool(self):
+        """Claim the spool file (rename is atomic across processes) and parse it"""
+        replay_path = f'{self.spool_path}.{os.getpid()}.replay'
+        try:
+            os.replace(self.spool_path, replay_path)
+        except FileNotFoundError:
+            return []
+
+        entries = []
+        with open(replay_path, encoding='utf-8') as spool:
+            for line in spool:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                model = apps.get_model(record['model'])
+                fields = record['fields']
+                for field in model._meta.concrete_fields:
+                    if isinstance(field, DateTimeField) and isinstance(fields.get(field.attname), str):
+                        fields[field.attname] = parse_datetime(fields[field.attname])
+                entries.append((model, fields))
+        os.remove(replay_path)
+        logger.info(f"Replaying {len(entries)} spooled audit entries")
+        return entries
+
+    def _ensure_thread(self):
+        if self.thread is not None and self.thread.is_alive():
+            return
+        with self.lock:
+            if self.thread is not None and self.thread.is_alive():
+                return
+            self.thread = threading.Thread(target=self._run, name='audit-sink', daemon=True)
+            self.thread.start()
+
+    def _run(self):
+        interval = getattr(settings, 'AUDIT_FLUSH_INTERVAL_MS', 500) / 1000
+        while True:
+            self.wakeup.wait(interval)
+            self.wakeup.clear()
+            close_old_connections()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Audit sink failed")
+
+
+audit_sink = AuditSink()
+record_audit = audit_sink.record
+
+
+@atexit.register
+def _flush_on_exit():
+    try:
+        audit_sink.flush()
+    finally:
+        connections.close_all()
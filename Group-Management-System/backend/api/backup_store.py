@@ -0,0 +1,339 @@
+"""
+Content-addressed, deduplicated backup store.
+
+Layout under BACKUP_DIR:
+
+    chunks/ab/ab12...ef.gz    one compressed chunk, named by the SHA-256 of its raw bytes
+    manifests/<id>.json       files of one backup, each as an ordered list of chunk hashes
+    index.json                {sha256: {size, stored, codec, refs}}
+
+A chunk is written once no matter how many backups contain it, so a backup
+only adds the chunks that changed since the last one. Binary files (SQLite
+snapshots, media) are cut into fixed BACKUP_CHUNK_SIZE chunks, which line
+up with database pages; text dumps are cut at content-defined line
+boundaries so an inserted row only changes the chunk around it.
+
+`refs` counts the manifests using a chunk. Adding a backup increments the
+counts before its manifest is written and removing one deletes the
+manifest before decrementing, so a crash can only leak chunks, never drop
+one still in use; `rebuild_index` recounts from the manifests.
+"""
+from django.conf import settings
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import timedelta
+import fcntl
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import zlib
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+
+class ChunkError(Exception):
+    pass
+
+
+def _compress(data):
+    if zstandard is not None:
+        return 'zst', zstandard.ZstdCompressor(level=getattr(settings, 'BACKUP_ZSTD_LEVEL', 3)).compress(data)
+    return 'gz', gzip.compress(data, compresslevel=getattr(settings, 'BACKUP_GZIP_LEVEL', 6), mtime=0)
+
+
+def _decompress(codec, data):
+    if codec == 'zst':
+        if zstandard is None:
+            raise ChunkError('zstandard is needed to read this backup')
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+
+def fixed_chunks(f, chunk_size):
+    while chunk := f.read(chunk_size):
+        yield chunk
+
+
+def line_chunks(f, chunk_size):
+    """
+    Content-defined chunks of whole lines.
+
+    After at least chunk_size / 2 bytes a chunk ends at the first line whose
+    CRC is a multiple of 256, so boundaries move with the content instead of
+    with byte offsets. No chunk grows past 4 * chunk_size.
+    """
+    lines, size = [], 0
+    for line in f:
+        lines.append(line)
+        size += len(line)
+        if size >= chunk_size * 4 or (size >= chunk_size // 2 and zlib.crc32(line) % 256 == 0):
+            yield b''.join(lines)
+            lines, size = [], 0
+    if lines:
+        yield b''.join(lines)
+
+
+class ChunkStore:
+
+    def __init__(self, root):
+        self.root = root
+        self.lock = threading.Lock()
+
+    def _path(self, *parts):
+        return os.path.join(self.root, *parts)
+
+    def chunk_path(self, sha, codec):
+        return self._path('chunks', sha[:2], f'{sha}.{codec}')
+
+    # ---- index ----
+
+    @contextmanager
+    def _locked(self):
+        """Exclusive lock on the index, across threads and processes"""
+        os.makedirs(self.root, exist_ok=True)
+        with self.lock, open(self._path('index.lock'), 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def load_index(self):
+        try:
+            with open(self._path('index.json')) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def _save_index(self, index):
+        path = self._path('index.json')
+        with open(f'{path}.tmp', 'w') as f:
+            json.dump(index, f, separators=(',', ':'))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(f'{path}.tmp', path)
+
+    # ---- writing ----
+
+    def put_chunk(self, data, known):
+        """Store data unless a chunk with its hash exists. Returns (sha, codec, stored size or 0 if deduplicated)"""
+        sha = hashlib.sha256(data).hexdigest()
+        if sha in known:
+            return sha, known[sha]['codec'], 0
+        codec, packed = _compress(data)
+        path = self.chunk_path(sha, codec)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+            with open(tmp_path, 'wb') as f:
+                f.write(packed)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        known[sha] = {'size': len(data), 'stored': len(packed), 'codec': codec, 'refs': 0}
+        return sha, codec, len(packed)
+
+    def put_file(self, chunks, entry, known, on_chunk=None):
+        """Store an iterable of chunks as one file entry of a manifest; fills in size/sha256/chunks"""
+        whole = hashlib.sha256()
+        entry.update(size=0, stored=0, chunks=[])
+        for data in chunks:
+            whole.update(data)
+            sha, codec, stored = self.put_chunk(data, known)
+            entry['chunks'].append(sha)
+            entry['size'] += len(data)
+            entry['stored'] += stored
+            if on_chunk:
+                on_chunk(len(data))
+        entry['sha256'] = whole.hexdigest()
+        return entry
+
+    def add_backup(self, manifest, known):
+        """Reference the manifest's chunks and publish it. `known` holds the index entries of new chunks"""
+        with self._locked():
+            index = self.load_index()
+            for sha in {sha for entry in manifest['files'] for sha in entry['chunks']}:
+                if sha not in index:
+                    if not os.path.exists(self.chunk_path(sha, known[sha]['codec'])):
+                        raise ChunkError(f'Chunk {sha} was removed while the backup ran')
+                    index[sha] = dict(known[sha], refs=0)
+                index[sha]['refs'] += 1
+            self._save_index(index)
+
+            os.makedirs(self._path('manifests'), exist_ok=True)
+            path = self._path('manifests', f"{manifest['id']}.json")
+            with open(f'{path}.tmp', 'w') as f:
+                json.dump(manifest, f, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(f'{path}.tmp', path)
+        return manifest
+
+    # ---- reading ----
+
+    def manifests(self):
+        """All manifests, oldest first"""
+        try:
+            names = sorted(os.listdir(self._path('manifests')))
+        except FileNotFoundError:
+            return []
+        return [self.manifest(name[:-len('.json')]) for name in names if name.endswith('.json')]
+
+    def manifest(self, backup_id):
+        with open(self._path('manifests', f'{backup_id}.json')) as f:
+            return json.load(f)
+
+    def read_chunk(self, sha, codec):
+        """Raw bytes of a chunk, checked against its hash"""
+        try:
+            with open(self.chunk_path(sha, codec), 'rb') as f:
+                data = _decompress(codec, f.read())
+        except (OSError, EOFError, zlib.error) as e:
+            raise ChunkError(f'Chunk {sha} unreadable: {e}')
+        if hashlib.sha256(data).hexdigest() != sha:
+            raise ChunkError(f'Chunk {sha} is corrupt')
+        return data
+
+    def verify(self, manifest, workers=None):
+        """
+        Check every chunk of a backup in parallel. Returns {sha: error} for the bad ones.
+
+        Decompression and hashing release the GIL, so threads scale with cores.
+        """
+        index = self.load_index()
+        hashes = {sha for entry in manifest['files'] for sha in entry['chunks']}
+        workers = workers or getattr(settings, 'BACKUP_VERIFY_WORKERS', None) or os.cpu_count() or 4
+
+        def check(sha):
+            if sha not in index:
+                return sha, 'missing from index'
+            try:
+                self.read_chunk(sha, index[sha]['codec'])
+            except ChunkError as e:
+                return sha, str(e)
+            return sha, None
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return {sha: error for sha, error in pool.map(check, hashes) if error}
+
+    def restore_file(self, entry, dest_path, index=None):
+        """Reassemble one file entry at dest_path, checking each chunk and the whole-file hash"""
+        index = index or self.load_index()
+        os.makedirs(os.path.dirname(dest_path) or '.', exist_ok=True)
+        whole = hashlib.sha256()
+        tmp_path = f'{dest_path}.restore'
+        with open(tmp_path, 'wb') as out:
+            for sha in entry['chunks']:
+                data = self.read_chunk(sha, index[sha]['codec'])
+                whole.update(data)
+                out.write(data)
+        if whole.hexdigest() != entry['sha256']:
+            os.remove(tmp_path)
+            raise ChunkError(f"{entry['name']} does not match its checksum")
+        os.replace(tmp_path, dest_path)
+
+    def restore(self, manifest, target_dir, workers=None):
+        """
+        Verify a backup, then write its files under target_dir in parallel.
+
+        The database lands at target_dir/<name> and media files under
+        target_dir/media/. Nothing is written if any chunk fails verification.
+        Returns the restored paths.
+        """
+        bad = self.verify(manifest, workers)
+        if bad:
+            raise ChunkError(f"Backup {manifest['id']} has {len(bad)} bad chunks: {sorted(bad.items())[:5]}")
+
+        index = self.load_index()
+        target_dir = os.path.realpath(target_dir)
+        jobs = []
+        for entry in manifest['files']:
+            base = os.path.join(target_dir, 'media') if entry['type'] == 'media' else target_dir
+            dest = os.path.realpath(os.path.join(base, entry['name']))
+            if not dest.startswith(target_dir + os.sep):
+                raise ChunkError(f"Refusing to restore {entry['name']} outside {target_dir}")
+            jobs.append((entry, dest))
+
+        workers = workers or getattr(settings, 'BACKUP_VERIFY_WORKERS', None) or os.cpu_count() or 4
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(lambda job: self.restore_file(job[0], job[1], index), jobs))
+        return [dest for _, dest in jobs]
+
+    # ---- removal ----
+
+    def remove_backup(self, backup_id):
+        """Drop a manifest and the chunks no other backup references. Returns bytes freed"""
+        with self._locked():
+            manifest = self.manifest(backup_id)
+            os.remove(self._path('manifests', f'{backup_id}.json'))
+
+            index = self.load_index()
+            freed = 0
+            for sha in {sha for entry in manifest['files'] for sha in entry['chunks']}:
+                chunk = index.get(sha)
+                if chunk is None:
+                    continue
+                chunk['refs'] -= 1
+                if chunk['refs'] <= 0:
+                    freed += self._delete_chunk(sha, chunk)
+                    del index[sha]
+            self._save_index(index)
+        logger.info(f"Removed backup {backup_id}, freed {freed} bytes")
+        return freed
+
+    def _delete_chunk(self, sha, chunk):
+        try:
+            os.remove(self.chunk_path(sha, chunk['codec']))
+        except FileNotFoundError:
+            return 0
+        return chunk['stored']
+
+    def prune(self, days, keep_latest=1):
+        """Remove backups older than `days`, always keeping the newest keep_latest. Returns removed ids"""
+        cutoff = time.time() - timedelta(days=days).total_seconds()
+        backups = self.manifests()
+        removed = []
+        for manifest in backups[:max(len(backups) - keep_latest, 0)]:
+            if manifest['created'] < cutoff:
+                self.remove_backup(manifest['id'])
+                removed.append(manifest['id'])
+        return removed
+
+    def rebuild_index(self, grace_seconds=24 * 60 * 60):
+        """
+        Recount references from the manifests and delete chunk files nothing references.
+
+        Unreferenced files younger than grace_seconds are kept: they may belong
+        to a backup that is still being written.
+        """
+        with self._locked():
+            old = self.load_index()
+            index = {}
+            for manifest in self.manifests():
+                for sha in {sha for entry in manifest['files'] for sha in entry['chunks']}:
+                    if sha in index:
+                        index[sha]['refs'] += 1
+                    elif sha in old:
+                        index[sha] = dict(old[sha], refs=1)
+                    else:
+                        logger.error(f"Backup {manifest['id']} references unknown chunk {sha}")
+
+            freed = 0
+            for dirpath, _, filenames in os.walk(self._path('chunks')):
+                for name in filenames:
+                    sha = name.partition('.')[0]
+                    path = os.path.join(dirpath, name)
+                    if sha not in index and os.path.getmtime(path) < time.time() - grace_seconds:
+                        freed += os.path.getsize(path)
+                        os.remove(path)
+            self._save_index(index)
+        return freed
@@ -0,0 +1,538 @@
+"""
+Online backups run as background jobs.
+
+SQLite is copied with the incremental backup API (sqlite3.Connection.backup):
+BACKUP_PAGES_PER_STEP pages are copied per step with BACKUP_STEP_SLEEP_MS
+between steps, so the source is only read-locked for one short step at a
+time and writers keep going. A write through another connection restarts
+the copy; after BACKUP_MAX_RESTARTS restarts it is taken in a single step
+so a busy database still gets backed up. PostgreSQL is dumped by pg_dump
+and chunked from its stdout as it streams.
+
+Everything goes into the deduplicated api.backup_store.ChunkStore, so a
+backup only stores the chunks that changed since the previous one, and
+media files whose size and mtime are unchanged are not even re-read.
+Backups older than backup.retentionDays are pruned after each run.
+
+Job progress is written to <backup dir>/jobs/<job id>.json so any worker can
+answer the status endpoint, not just the one running the backup. A running
+job records its owner (host and PID) and saves a heartbeat every
+BACKUP_JOB_HEARTBEAT_SECONDS; one whose owner exited or whose heartbeat is
+older than BACKUP_JOB_STALE_SECONDS is marked failed, so a crashed worker
+does not block backups forever. New jobs are created under a lock file, so
+two workers cannot both start one.
+"""
+from django.conf import settings
+from django.db import close_old_connections, connections
+from django.utils import timezone
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+import fcntl
+import json
+import logging
+import os
+import secrets
+import socket
+import sqlite3
+import subprocess
+import tempfile
+import threading
+import time
+
+from .backup_store import ChunkStore, fixed_chunks, line_chunks
+from .system_settings import system_settings
+
+logger = logging.getLogger(__name__)
+
+
+def backup_dir():
+    return getattr(settings, 'BACKUP_DIR', os.path.join(settings.BASE_DIR, 'backups'))
+
+
+def backup_store():
+    return ChunkStore(backup_dir())
+
+
+def backup_settings():
+    """The backup section of the super admin settings"""
+    return system_settings.section('backup')
+
+
+def _retention_days():
+    return system_settings.get('backup', 'retentionDays', getattr(settings, 'BACKUP_RETENTION_DAYS', 30))
+
+
+def _chunk_size():
+    return getattr(settings, 'BACKUP_CHUNK_SIZE', 256 * 1024)
+
+
+def _jobs_dir():
+    return os.path.join(backup_dir(), 'jobs')
+
+
+def _job_path(job_id):
+    return os.path.join(_jobs_dir(), f'{job_id}.json')
+
+
+def _write_json(path, data):
+    """Write via a temp file and rename, so readers never see half a file"""
+    tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def get_job(job_id):
+    """Status dict of a job, or None if there is no such job"""
+    if not job_id or not all(c.isalnum() or c == '_' for c in job_id):
+        return None
+    try:
+        with open(_job_path(job_id)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def recent_jobs(limit=10):
+    try:
+        names = sorted(os.listdir(_jobs_dir()), reverse=True)
+    except FileNotFoundError:
+        return []
+    jobs = (get_job(name[:-len('.json')]) for name in names if name.endswith('.json'))
+    return [job for job in jobs if job is not None][:limit]
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _abandoned(job):
+    """Why a queued or running job can no longer finish, or None while its owner is alive"""
+    owner = job.get('owner') or {}
+    if owner.get('host') == socket.gethostname() and owner.get('pid') and not _pid_alive(owner['pid']):
+        return f"worker process {owner['pid']} exited"
+    stale_after = getattr(settings, 'BACKUP_JOB_STALE_SECONDS', 120)
+    heartbeat = datetime.fromisoformat(job.get('heartbeat_at') or job['created_at'])
+    if timezone.now() - heartbeat > timedelta(seconds=stale_after):
+        return f"no heartbeat for {stale_after} seconds"
+    return None
+
+
+def running_job():
+    """The queued or running job, if any; abandoned ones are marked failed on the way"""
+    for job in recent_jobs():
+        if job['status'] not in ('queued', 'running'):
+            continue
+        reason = _abandoned(job)
+        if reason is None:
+            return job
+        logger.warning(f"Backup {job['id']} abandoned: {reason}")
+        job.update(status='failed', phase='failed', error=f'Abandoned: {reason}', finished_at=timezone.now().isoformat())
+        _write_json(_job_path(job['id']), job)
+    return None
+
+
+class BackupRunning(Exception):
+    """create_job() found another backup queued or running"""
+
+    def __init__(self, job):
+        super().__init__(f"Backup {job['id']} is already running")
+        self.job = job
+
+
+@contextmanager
+def _jobs_lock():
+    """Exclusive lock around check-and-create, across threads and processes"""
+    os.makedirs(_jobs_dir(), exist_ok=True)
+    with open(os.path.join(_jobs_dir(), 'jobs.lock'), 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def create_job(backup_type='manual', **kwargs):
+    """A new queued BackupJob; raises BackupRunning if another job is queued or running"""
+    with _jobs_lock():
+        running = running_job()
+        if running:
+            raise BackupRunning(running)
+        return BackupJob(backup_type, **kwargs)
+
+
+class BackupJob:
+    """One backup run; `update` persists progress for the status endpoint"""
+
+    def __init__(self, backup_type='manual', user_id=None, ip_address='127.0.0.1', max_bytes_per_second=None):
+        self.timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        self.id = f'{self.timestamp}_{secrets.token_hex(4)}'
+        self.user_id = user_id
+        self.ip_address = ip_address
+        self.max_bytes_per_second = max_bytes_per_second
+        self.throttled_bytes = 0
+        self.throttle_start = None
+        self.lock = threading.RLock()
+        self.done = threading.Event()
+        self.state = {
+            'id': self.id,
+            'type': backup_type,
+            'status': 'queued',
+            'phase': 'queued',
+            'progress': 0,
+            'bytes_read': 0,
+            'bytes_stored': 0,
+            'created_at': timezone.now().isoformat(),
+            'heartbeat_at': None,
+            'owner': {'host': socket.gethostname(), 'pid': os.getpid()},
+            'started_at': None,
+            'finished_at': None,
+            'error': None,
+            'backup': None,
+        }
+        os.makedirs(_jobs_dir(), exist_ok=True)
+        self._save()
+
+    def update(self, **fields):
+        with self.lock:
+            self.state.update(fields)
+            self._save()
+
+    def count(self, nbytes):
+        """Add nbytes to bytes_read, saving at most twice a second"""
+        self.state['bytes_read'] += nbytes
+        if time.monotonic() - self.last_save >= 0.5:
+            self._save()
+        self.throttle(nbytes)
+
+    def throttle(self, nbytes):
+        """Sleep as needed to keep the average rate under max_bytes_per_second"""
+        if not self.max_bytes_per_second:
+            return
+        now = time.monotonic()
+        if self.throttle_start is None:
+            self.throttle_start = now
+        self.throttled_bytes += nbytes
+        ahead = self.throttled_bytes / self.max_bytes_per_second - (now - self.throttle_start)
+        if ahead > 0:
+            time.sleep(ahead)
+
+    def beat(self):
+        """Save the job every BACKUP_JOB_HEARTBEAT_SECONDS until it is done, even during a long step"""
+        while not self.done.wait(getattr(settings, 'BACKUP_JOB_HEARTBEAT_SECONDS', 10)):
+            self._save()
+
+    def _save(self):
+        with self.lock:
+            self.last_save = time.monotonic()
+            self.state['heartbeat_at'] = timezone.now().isoformat()
+            _write_json(_job_path(self.id), self.state)
+
+    def audit(self, success, metadata):
+        """RecoveryLog entry for the run; needs a user, so unattended runs only log"""
+        if self.user_id is None:
+            return
+        from .audit import record_audit
+        from .models import RecoveryLog
+        record_audit(RecoveryLog, user=self.user_id, method=f"{self.state['type']}_backup", success=success,
+                     ip_address=self.ip_address, metadata=metadata)
+
+
+class _BackupRestarted(Exception):
+    pass
+
+
+def _sqlite_backup(job, db_path, store, known):
+    pages_per_step = getattr(settings, 'BACKUP_PAGES_PER_STEP', 256)
+    step_sleep = getattr(settings, 'BACKUP_STEP_SLEEP_MS', 20) / 1000
+    max_restarts = getattr(settings, 'BACKUP_MAX_RESTARTS', 3)
+    seen = {'remaining': None, 'restarts': 0, 'reported': 0.0}
+
+    def progress(status, remaining, total):
+        # A write through another connection restarts the copy from the first page
+        if seen['remaining'] is not None and remaining > seen['remaining']:
+            seen['restarts'] += 1
+            if seen['restarts'] > max_restarts:
+                raise _BackupRestarted()
+        seen['remaining'] = remaining
+
+        now = time.monotonic()
+        if total and now - seen['reported'] >= 0.5:
+            seen['reported'] = now
+            job.update(progress=round(50 * (total - remaining) / total, 1))
+        # Sleeping here runs between steps, while no lock is held on the source
+        if remaining and step_sleep:
+            time.sleep(step_sleep)
+        job.throttle(step_bytes)
+
+    fd, snapshot_path = tempfile.mkstemp(suffix='.sqlite3', dir=backup_dir())
+    os.close(fd)
+    try:
+        db_path = str(db_path)
+        # Test databases are shared-cache memory URIs
+        source = sqlite3.connect(db_path, uri=db_path.startswith('file:'))
+        snapshot = sqlite3.connect(snapshot_path)
+        try:
+            step_bytes = pages_per_step * source.execute('PRAGMA page_size').fetchone()[0]
+            job.update(phase='copying')
+            try:
+                source.backup(snapshot, pages=pages_per_step, progress=progress)
+            except _BackupRestarted:
+                # Writes keep outpacing the stepped copy: take it in one step instead
+                logger.warning(f"Backup {job.id} restarted {seen['restarts']} times, copying in a single step")
+                job.update(phase='copying (single step)')
+                source.backup(snapshot)
+        finally:
+            snapshot.close()
+            source.close()
+
+        job.update(phase='storing', progress=50)
+        entry = {'type': 'database', 'name': 'db.sqlite3'}
+        with open(snapshot_path, 'rb') as f:
+            return store.put_file(fixed_chunks(f, _chunk_size()), entry, known, on_chunk=job.count)
+    finally:
+        os.remove(snapshot_path)
+
+
+def _postgres_backup(job, db_settings, store, known):
+    cmd = [
+        'pg_dump', '--no-password',
+        '-h', str(db_settings.get('HOST') or 'localhost'),
+        '-p', str(db_settings.get('PORT') or '5432'),
+        '-U', str(db_settings['USER']),
+        '-d', str(db_settings['NAME']),
+    ]
+    env = dict(os.environ)
+    if db_settings.get('PASSWORD'):
+        env['PGPASSWORD'] = db_settings['PASSWORD']
+
+    job.update(phase='dumping')
+    entry = {'type': 'database', 'name': 'db.sql'}
+    # stderr goes to a file so a chatty pg_dump cannot block on a full pipe
+    with tempfile.TemporaryFile() as stderr, \
+            subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=stderr, env=env) as dump:
+        store.put_file(line_chunks(dump.stdout, _chunk_size()), entry, known, on_chunk=job.count)
+        if dump.wait() != 0:
+            stderr.seek(0)
+            message = stderr.read().decode(errors='replace').strip()
+            raise RuntimeError(f'pg_dump exited with {dump.returncode}: {message}')
+    return entry
+
+
+def _media_backup(job, store, known, previous):
+    """One entry per file under MEDIA_ROOT; files with unchanged size and mtime reuse the previous chunks"""
+    unchanged = {
+        entry['name']: entry for entry in (previous or {}).get('files', []) if entry['type'] == 'media'
+    }
+    entries = []
+    for dirpath, dirnames, filenames in os.walk(settings.MEDIA_ROOT):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            path = os.path.join(dirpath, filename)
+            stat = os.stat(path)
+            name = os.path.relpath(path, settings.MEDIA_ROOT)
+            old = unchanged.get(name)
+            if old and old['size'] == stat.st_size and old['mtime_ns'] == stat.st_mtime_ns \
+                    and all(sha in known for sha in old['chunks']):
+                entries.append(dict(old, stored=0))
+                continue
+            entry = {'type': 'media', 'name': name, 'mtime_ns': stat.st_mtime_ns}
+            with open(path, 'rb') as f:
+                entries.append(store.put_file(fixed_chunks(f, _chunk_size()), entry, known, on_chunk=job.count))
+    return entries
+
+
+def _update_last_backup(timestamp):
+    system_settings.update('backup', lastBackup=timestamp)
+
+
+def _summary(manifest):
+    """Manifest without the chunk lists, for the job status and the audit log"""
+    media = [entry for entry in manifest['files'] if entry['type'] == 'media']
+    return {
+        'id': manifest['id'],
+        'timestamp': manifest['timestamp'],
+        'type': manifest['type'],
+        'size': manifest['size'],
+        'stored': manifest['stored'],
+        'files': [
+            {'type': entry['type'], 'name': entry['name'], 'size': entry['size'], 'stored': entry['stored']}
+            for entry in manifest['files'] if entry['type'] != 'media'
+        ],
+        'media_files': len(media),
+    }
+
+
+def run_backup(job):
+    """Back up the database and MEDIA_ROOT for job, in the calling thread. Returns the backup summary"""
+    store = backup_store()
+    # Dispatch on the vendor: ENGINE may name a wrapper such as api.postgres_backend
+    connection = connections['default']
+    db_settings = connection.settings_dict
+    job.update(status='running', phase='starting', started_at=timezone.now().isoformat())
+    threading.Thread(target=job.beat, name=f'backup-heartbeat-{job.id}', daemon=True).start()
+
+    try:
+        os.makedirs(backup_dir(), exist_ok=True)
+        known = store.load_index()
+        previous = (store.manifests() or [None])[-1]
+
+        if connection.vendor == 'sqlite':
+            files = [_sqlite_backup(job, db_settings['NAME'], store, known)]
+        elif connection.vendor == 'postgresql':
+            files = [_postgres_backup(job, db_settings, store, known)]
+        else:
+            raise RuntimeError(f"Unsupported database engine: {db_settings['ENGINE']}")
+
+        if hasattr(settings, 'MEDIA_ROOT') and os.path.exists(settings.MEDIA_ROOT):
+            job.update(phase='media', progress=80)
+            files.extend(_media_backup(job, store, known, previous))
+
+        manifest = store.add_backup({
+            'id': job.id,
+            'timestamp': job.timestamp,
+            'type': job.state['type'],
+            'created': time.time(),
+            'chunk_size': _chunk_size(),
+            'size': sum(entry['size'] for entry in files),
+            'stored': sum(entry['stored'] for entry in files),
+            'files': files,
+        }, known)
+        backup_info = _summary(manifest)
+        _update_last_backup(job.timestamp)
+
+        job.update(phase='pruning', progress=95, bytes_stored=manifest['stored'])
+        pruned = store.prune(_retention_days())
+    except Exception as e:
+        job.done.set()
+        logger.exception(f"Backup {job.id} failed")
+        job.update(status='failed', phase='failed', error=str(e), finished_at=timezone.now().isoformat())
+        job.audit(False, {'job': job.id, 'error': str(e)})
+        _record_history(job)
+        raise
+
+    job.done.set()
+    job.update(status='succeeded', phase='done', progress=100, backup=backup_info, pruned=pruned,
+               finished_at=timezone.now().isoformat())
+    job.audit(True, backup_info)
+    _record_history(job, backup_info)
+    logger.info(f"Backup {job.id} finished: {backup_info['size']} bytes, {backup_info['stored']} new")
+    return backup_info
+
+
+def _history_path():
+    return os.path.join(backup_dir(), 'history.ndjson')
+
+
+def _record_history(job, backup_info=None):
+    """Append one line per run to history.ndjson, for capacity planning"""
+    started = datetime.fromisoformat(job.state['started_at'])
+    finished = datetime.fromisoformat(job.state['finished_at'])
+    duration = max((finished - started).total_seconds(), 0.001)
+    entry = {
+        'id': job.id,
+        'type': job.state['type'],
+        'status': job.state['status'],
+        'started_at': job.state['started_at'],
+        'duration_seconds': round(duration, 3),
+        'bytes_read': job.state['bytes_read'],
+        'bytes_stored': job.state['bytes_stored'],
+        'throughput_bytes_per_second': round(job.state['bytes_read'] / duration),
+        'size': backup_info['size'] if backup_info else None,
+        'pruned': len(job.state.get('pruned') or []),
+    }
+    try:
+        with open(_history_path(), 'a') as history:
+            history.write(json.dumps(entry) + '\n')
+    except OSError:
+        logger.exception("Could not record backup history")
+
+
+def backup_history(limit=50):
+    """The latest runs from history.ndjson, newest first"""
+    try:
+        with open(_history_path()) as history:
+            lines = history.readlines()[-limit:]
+    except FileNotFoundError:
+        return []
+    return [json.loads(line) for line in reversed(lines) if line.strip()]
+
+
+def last_scheduled_run():
+    """Start of the latest scheduled run (failed ones included, so they are not retried in a loop)"""
+    try:
+        with open(_history_path()) as history:
+            lines = history.readlines()
+    except FileNotFoundError:
+        return None
+    for line in reversed(lines):
+        if line.strip():
+            entry = json.loads(line)
+            if entry['type'] == 'scheduled':
+                return datetime.fromisoformat(entry['started_at'])
+    return None
+
+
+def scheduled_slot(config, now=None):
+    """
+    The latest scheduled start at or before now, in local time.
+
+    backupTime (HH:MM) is read in TIME_ZONE. The frequency decides which of
+    those daily slots count, see backup_due.
+    """
+    now = timezone.localtime(now)
+    hour, minute = (int(part) for part in str(config.get('backupTime') or '02:00').split(':')[:2])
+    slot = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if slot > now:
+        slot -= timedelta(days=1)
+    return slot
+
+
+def backup_due(config, last_run, now=None):
+    """
+    Whether a scheduled backup should start now.
+
+    It is due within BACKUP_SCHEDULE_WINDOW_MINUTES after the slot, so a
+    scheduler that was down over night does not start a backup at peak time.
+    Daily runs once per slot, weekly once at least 7 days after the last run,
+    and monthly at the first slot of each month.
+    """
+    if not config.get('autoBackup'):
+        return False
+    now = timezone.localtime(now)
+    slot = scheduled_slot(config, now)
+    if now - slot > timedelta(minutes=getattr(settings, 'BACKUP_SCHEDULE_WINDOW_MINUTES', 120)):
+        return False
+    if last_run is None:
+        return True
+
+    last_run = timezone.localtime(last_run)
+    frequency = config.get('backupFrequency', 'daily')
+    if frequency == 'weekly':
+        return last_run < slot - timedelta(days=6)
+    if frequency == 'monthly':
+        return (last_run.year, last_run.month) < (slot.year, slot.month)
+    return last_run < slot
+
+
+def _run_in_thread(job):
+    close_old_connections()
+    try:
+        run_backup(job)
+    except Exception:
+        pass  # already logged and recorded on the job
+    finally:
+        close_old_connections()
+
+
+def start_backup(backup_type='manual', user=None, ip_address='127.0.0.1'):
+    """Start a backup job in a daemon thread and return it at once; raises BackupRunning if one is running"""
+    job = create_job(backup_type, user_id=user.pk if user is not None else None, ip_address=ip_address)
+    threading.Thread(target=_run_in_thread, args=(job,), name=f'backup-{job.id}', daemon=True).start()
+    return job
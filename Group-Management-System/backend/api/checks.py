@@ -0,0 +1,64 @@
+"""
+System checks for state that has to be shared by all worker processes.
+
+Lockout counters, throttle buckets and similar state live in Django cache
+aliases. A process-local backend (LocMemCache) silently gives every
+gunicorn worker its own copy, so with WEB_CONCURRENCY > 1 each alias below
+must point at a shared backend (file-based on one host, Redis/Memcached
+across hosts). The throttle buckets additionally need an atomic add(),
+which rules out the file-based backend for RATELIMIT_CACHE_ALIAS.
+"""
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+import os
+
+from .ratelimit import has_atomic_add, is_shared_cache
+
+# (setting naming the alias, its default, what breaks when it is per worker)
+SHARED_STATE_CACHES = (
+    ('RATELIMIT_CACHE_ALIAS', 'default', 'admin lockouts and login/reset throttles are counted per worker'),
+    ('SESSION_CACHE_ALIAS', 'default', 'api.sessions reads every session from the database'),
+    ('REPLICA_STICKY_CACHE_ALIAS', 'default', 'signed-in users never read from the replica'),
+)
+
+
+def worker_count():
+    """Worker processes per host, as gunicorn reads it from WEB_CONCURRENCY"""
+    try:
+        return int(os.environ.get('WEB_CONCURRENCY', 1))
+    except ValueError:
+        return 1
+
+
+@register(Tags.caches)
+def check_shared_caches(app_configs, **kwargs):
+    if worker_count() <= 1:
+        return []
+    warnings = []
+    for setting, default, consequence in SHARED_STATE_CACHES:
+        if setting == 'REPLICA_STICKY_CACHE_ALIAS' and 'replica' not in settings.DATABASES:
+            continue
+        alias = getattr(settings, setting, default)
+        if not is_shared_cache(alias):
+            warnings.append(Warning(
+                f"The '{alias}' cache ({setting}) is process-local with {worker_count()} workers: {consequence}.",
+                hint="Point it at a shared backend, e.g. Redis or Memcached; FileBasedCache on one host "
+                     "also works except for RATELIMIT_CACHE_ALIAS (api.W002).",
+                obj=alias,
+                id='api.W001',
+            ))
+    return warnings
+
+
+@register(Tags.caches)
+def check_throttle_cache(app_configs, **kwargs):
+    alias = getattr(settings, 'RATELIMIT_CACHE_ALIAS', 'default')
+    if has_atomic_add(alias):
+        return []
+    return [Warning(
+        f"The '{alias}' cache (RATELIMIT_CACHE_ALIAS) has no atomic add(): "
+        f"concurrent requests can both take a throttle bucket's lock and exceed its rate.",
+        hint="Use LocMemCache, RedisCache or a Memcached backend for the ratelimit alias.",
+        obj=alias,
+        id='api.W002',
+    )]
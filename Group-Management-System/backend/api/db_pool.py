@@ -0,0 +1,205 @@
+"""
+Per-process database connection pool, used by api.postgres_backend.
+
+Django keeps one connection per thread, so with threaded workers either
+every request pays connect + TLS + auth (CONN_MAX_AGE=0) or every thread
+pins a connection of its own (CONN_MAX_AGE>0). The pool sits under
+Django's connection handling: "closing" a connection hands it back, and
+opening one takes an idle connection when there is one. At most
+DB_POOL_SIZE connections are open per process and per alias; a thread
+that finds them all checked out waits up to DB_POOL_TIMEOUT seconds.
+
+Connections older than DB_POOL_MAX_AGE are closed on return, and a
+connection idle longer than DB_POOL_PING_AFTER seconds is pinged with
+SELECT 1 before it is handed out; one that fails is replaced (a reconnect).
+
+Counters (checkouts, waits, reconnects, ...) are per process; pool_stats()
+returns them with the connections opened per alias, pooled or not.
+"""
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from collections import Counter, deque
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ConnectionPool:
+    """
+    Driver-agnostic pool of DB-API connections.
+
+    `ping(conn)` raises on a dead connection and `reset(conn)` returns it to
+    an idle, out-of-transaction state (raising if it can't).
+    """
+
+    def __init__(self, size, timeout, max_age, ping_after, ping, reset):
+        self.size = size
+        self.timeout = timeout
+        self.max_age = max_age
+        self.ping_after = ping_after
+        self.ping = ping
+        self.reset = reset
+        self.cond = threading.Condition()
+        self.idle = deque()  # (connection, created, returned)
+        self.created = {}    # id(connection) -> creation time, for checked out connections
+        self.open = 0
+        self.pid = os.getpid()
+        self.stats = Counter()
+
+    def _after_fork(self):
+        # Sockets inherited from the parent belong to it; drop them without closing
+        if self.pid != os.getpid():
+            self.idle.clear()
+            self.created.clear()
+            self.open = 0
+            self.stats = Counter()
+            self.pid = os.getpid()
+
+    def checkout(self, connect):
+        """A connection from the pool, or a new one from connect() while under DB_POOL_SIZE"""
+        waited = None
+        with self.cond:
+            self._after_fork()
+            while True:
+                while self.idle:
+                    conn, created, returned = self.idle.pop()
+                    if time.monotonic() - created > self.max_age:
+                        self._discard(conn, 'expired')
+                        continue
+                    if time.monotonic() - returned > self.ping_after:
+                        try:
+                            self.ping(conn)
+                        except Exception:
+                            self._discard(conn, 'reconnects')
+                            continue
+                    self.created[id(conn)] = created
+                    self.stats['checkouts'] += 1
+                    self.stats['reused'] += 1
+                    self._count_wait(waited)
+                    return conn
+                if self.open < self.size:
+                    self.open += 1
+                    break
+                if waited is None:
+                    waited = time.monotonic()
+                    self.stats['waits'] += 1
+                remaining = self.timeout - (time.monotonic() - waited)
+                if remaining <= 0 or not self.cond.wait(remaining):
+                    self.stats['timeouts'] += 1
+                    self._count_wait(waited)
+                    raise PoolTimeout(f'No connection free after {self.timeout}s ({self.size} in use)')
+            self._count_wait(waited)
+
+        try:
+            conn = connect()
+        except Exception:
+            with self.cond:
+                self.open -= 1
+                self.cond.notify()
+            raise
+        with self.cond:
+            self.created[id(conn)] = time.monotonic()
+            self.stats['checkouts'] += 1
+            self.stats['connects'] += 1
+        return conn
+
+    def checkin(self, conn):
+        """Take a connection back; broken, expired or unresettable ones are closed"""
+        with self.cond:
+            if self.pid != os.getpid():
+                return
+            created = self.created.pop(id(conn), 0.0)
+        try:
+            self.reset(conn)
+        except Exception:
+            with self.cond:
+                self._discard(conn, 'broken')
+                self.cond.notify()
+            return
+        with self.cond:
+            if time.monotonic() - created > self.max_age:
+                self._discard(conn, 'expired')
+            else:
+                self.idle.append((conn, created, time.monotonic()))
+            self.cond.notify()
+
+    def _discard(self, conn, reason):
+        """Close a connection the pool gives up on; called with the lock held"""
+        self.open -= 1
+        self.stats[reason] += 1
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _count_wait(self, waited):
+        if waited is not None:
+            self.stats['wait_ms'] += round((time.monotonic() - waited) * 1000)
+
+    def close_all(self):
+        with self.cond:
+            while self.idle:
+                self._discard(self.idle.pop()[0], 'closed')
+
+    def snapshot(self):
+        with self.cond:
+            return {
+                'size': self.size,
+                'open': self.open,
+                'idle': len(self.idle),
+                'in_use': self.open - len(self.idle),
+                **{key: self.stats[key] for key in (
+                    'checkouts', 'reused', 'connects', 'waits', 'wait_ms', 'timeouts',
+                    'reconnects', 'expired', 'broken',
+                )},
+            }
+
+
+pools = {}
+_pools_lock = threading.Lock()
+connections_opened = Counter()
+
+
+def get_pool(alias, ping, reset):
+    with _pools_lock:
+        if alias not in pools:
+            pools[alias] = ConnectionPool(
+                size=getattr(settings, 'DB_POOL_SIZE', 4),
+                timeout=getattr(settings, 'DB_POOL_TIMEOUT', 10),
+                max_age=getattr(settings, 'DB_POOL_MAX_AGE', 600),
+                ping_after=getattr(settings, 'DB_POOL_PING_AFTER', 30),
+                ping=ping,
+                reset=reset,
+            )
+        return pools[alias]
+
+
+@receiver(connection_created)
+def count_connection(sender, connection, **kwargs):
+    # Pooled connections count each checkout, since Django "connects" on every one
+    connections_opened[connection.alias] += 1
+
+
+def pool_stats():
+    """{alias: counters} for this process"""
+    stats = {}
+    for alias in connections:
+        entry = {
+            'vendor': connections[alias].vendor,
+            'conn_max_age': connections.settings[alias].get('CONN_MAX_AGE', 0),
+            'health_checks': connections.settings[alias].get('CONN_HEALTH_CHECKS', False),
+            'connections_opened': connections_opened[alias],
+        }
+        if alias in pools:
+            entry['pool'] = pools[alias].snapshot()
+        stats[alias] = entry
+    return stats
@@ -0,0 +1,315 @@
+"""
+Logical dump and restore of the api models.
+
+A dump is a directory with one gzip NDJSON stream per model plus
+manifest.json. Each stream starts with a header line holding the column
+names; every following line is one row as a JSON array, read with
+values_list so no model instances are built while dumping.
+
+Restore loads the models in dependency levels: every model of a level only
+references models of earlier levels (or itself), so the models of one level
+are loaded in parallel threads, each with its own connection and
+transaction, with bulk_create batches. Django creates foreign keys
+DEFERRABLE INITIALLY DEFERRED, so rows may reference rows later in the same
+stream; check_constraints runs the deferred checks once per table before
+commit, as loaddata does. SQLite allows one writer at a time, so there the
+models of a level are loaded one after another. A restore with flush runs
+the delete and every load in one transaction on one connection, so a
+failed load leaves the previous data in place; it is not parallel.
+"""
+from django.apps import apps
+from django.conf import settings
+from django.core.management.color import no_style
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections, connection, connections, transaction
+from django.db.models import Q
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from datetime import datetime, timezone as dt_timezone
+import gzip
+import hashlib
+import json
+import logging
+import os
+import time
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from .invalidation import TOPICS, bus
+
+logger = logging.getLogger(__name__)
+
+# Stored as strings in JSON; converted back with field.to_python on load
+TEXT_ENCODED_TYPES = ('DateTimeField', 'DateField', 'TimeField', 'DecimalField', 'DurationField', 'UUIDField')
+
+
+class DumpError(Exception):
+    pass
+
+
+def dumped_models():
+    """
+    The api models and their auto-created M2M tables.
+
+    User.groups and User.user_permissions are left out: they point at
+    auth rows whose ids depend on the order migrations ran in, and roles
+    are carried by User.role anyway.
+    """
+    skipped = {'api.User_groups', 'api.User_user_permissions'}
+    return [
+        model for model in apps.get_app_config('api').get_models(include_auto_created=True)
+        if model._meta.label not in skipped
+    ]
+
+
+def dependency_levels(models):
+    """Group models so each only references models in earlier groups (self references allowed)"""
+    remaining = {model: {
+        field.related_model for field in model._meta.concrete_fields
+        if field.is_relation and field.related_model is not model and field.related_model in models
+    } for model in models}
+    levels, done = [], set()
+    while remaining:
+        level = [model for model, deps in remaining.items() if deps <= done]
+        if not level:
+            raise DumpError(f'Circular dependency between {sorted(m._meta.label for m in remaining)}')
+        level.sort(key=lambda model: model._meta.label)
+        levels.append(level)
+        done.update(level)
+        for model in level:
+            del remaining[model]
+    return levels
+
+
+def _encode(row):
+    if orjson is not None:
+        return orjson.dumps(row, default=DjangoJSONEncoder().default) + b'\n'
+    return json.dumps(row, cls=DjangoJSONEncoder, separators=(',', ':')).encode() + b'\n'
+
+
+def _stream_name(model):
+    return f'{model._meta.label_lower}.ndjson.gz'
+
+
+def dump(directory, batch_size=None, using='default'):
+    """
+    Write every model to directory. Returns the manifest.
+
+    All tables are read in one transaction (REPEATABLE READ on PostgreSQL),
+    so the dump is a consistent snapshot. `using` may name the read replica
+    to keep the export off the primary.
+    """
+    batch_size = batch_size or getattr(settings, 'DUMP_BATCH_SIZE', 2000)
+    level = getattr(settings, 'DUMP_GZIP_LEVEL', 3)
+    os.makedirs(directory, exist_ok=True)
+    started = time.monotonic()
+    manifest = {
+        'created': datetime.now(dt_timezone.utc).isoformat(),
+        'vendor': connections[using].vendor,
+        'models': {},
+    }
+
+    with transaction.atomic(using=using):
+        if connections[using].vendor == 'postgresql':
+            with connections[using].cursor() as cursor:
+                cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY')
+        for model in dumped_models():
+            columns = [field.attname for field in model._meta.concrete_fields]
+            path = os.path.join(directory, _stream_name(model))
+            rows = 0
+            digest = hashlib.sha256()
+            with gzip.open(path, 'wb', compresslevel=level) as stream:
+                header = _encode(columns)
+                stream.write(header)
+                digest.update(header)
+                for row in model._base_manager.using(using).order_by('pk').values_list(*columns).iterator(chunk_size=batch_size):
+                    line = _encode(row)
+                    stream.write(line)
+                    digest.update(line)
+                    rows += 1
+            manifest['models'][model._meta.label] = {
+                'file': _stream_name(model),
+                'rows': rows,
+                'sha256': digest.hexdigest(),
+            }
+
+    manifest['seconds'] = round(time.monotonic() - started, 3)
+    with open(os.path.join(directory, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def _read_rows(path):
+    """(columns, row iterator) of one stream"""
+    stream = gzip.open(path, 'rb')
+    columns = json.loads(stream.readline())
+
+    def rows():
+        with stream:
+            for line in stream:
+                yield orjson.loads(line) if orjson is not None else json.loads(line)
+    return columns, rows()
+
+
+def _bulk_insert(model, fields, objs, conn):
+    """
+    bulk_create's insert path with raw=True: like loaddata, values are stored
+    as dumped, so auto_now/auto_now_add fields keep their original times.
+    """
+    step = conn.ops.bulk_batch_size(fields, objs) or len(objs)
+    for start in range(0, len(objs), step):
+        model._base_manager._insert(objs[start:start + step], fields=fields, using=conn.alias, raw=True)
+    return len(objs)
+
+
+def _load_model(model, path, batch_size, worker=True):
+    """Load one stream in its own transaction; a worker thread uses and then closes its own connection"""
+    if worker:
+        close_old_connections()
+    conn = connections['default']
+    started = time.monotonic()
+    try:
+        columns, rows = _read_rows(path)
+        fields = [model._meta.get_field(column) for column in columns]
+        for field, column in zip(fields, columns):
+            if field.attname != column:
+                raise DumpError(f'{model._meta.label} has no column {column}')
+        converters = [
+            (index, field.to_python) for index, field in enumerate(fields)
+            if field.get_internal_type() in TEXT_ENCODED_TYPES
+        ]
+
+        loaded = 0
+        with transaction.atomic(using=conn.alias):
+            with conn.constraint_checks_disabled():
+                batch = []
+                for row in rows:
+                    for index, to_python in converters:
+                        if row[index] is not None:
+                            row[index] = to_python(row[index])
+                    batch.append(model(**dict(zip(columns, row))))
+                    if len(batch) >= batch_size:
+                        loaded += _bulk_insert(model, fields, batch, conn)
+                        batch = []
+                if batch:
+                    loaded += _bulk_insert(model, fields, batch, conn)
+            # Deferred foreign key checks for the whole table, before commit
+            conn.check_constraints(table_names=[model._meta.db_table])
+        return model._meta.label, loaded, time.monotonic() - started
+    finally:
+        if worker:
+            conn.close()
+
+
+def _verify_stream(args):
+    directory, entry = args
+    digest = hashlib.sha256()
+    with gzip.open(os.path.join(directory, entry['file']), 'rb') as stream:
+        while block := stream.read(1024 * 1024):
+            digest.update(block)
+    return entry['file'], digest.hexdigest() == entry['sha256']
+
+
+def referencing_models(models):
+    """
+    (model, foreign keys) of every model outside `models` that references them.
+
+    These are the skipped M2M tables and contrib models such as
+    admin.LogEntry, which points at api.User.
+    """
+    dumped = set(models)
+    referencing = []
+    for model in apps.get_models(include_auto_created=True):
+        if model in dumped:
+            continue
+        fields = [field for field in model._meta.concrete_fields if field.is_relation and field.related_model in dumped]
+        if fields:
+            referencing.append((model, fields))
+    return referencing
+
+
+def _flush(levels):
+    """Delete the rows of the dumped models, referencing tables first"""
+    # Rows elsewhere that point at dumped rows would fail the deferred FK
+    # checks (or dangle on SQLite), so they go too
+    for model, fields in referencing_models([model for level in levels for model in level]):
+        points_at_dump = Q()
+        for field in fields:
+            points_at_dump |= Q(**{f'{field.attname}__isnull': False})
+        model._base_manager.filter(points_at_dump)._raw_delete(connection.alias)
+    for level in reversed(levels):
+        for model in level:
+            model._base_manager.all()._raw_delete(connection.alias)
+
+
+def _load_levels(directory, manifest, levels, batch_size, workers, stdout):
+    def path(model):
+        return os.path.join(directory, manifest['models'][model._meta.label]['file'])
+
+    loaded = {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for level in levels:
+            if workers == 1:
+                results = [_load_model(model, path(model), batch_size, worker=False) for model in level]
+            else:
+                # The next level references this one, so it waits for all of it
+                results = list(pool.map(lambda model: _load_model(model, path(model), batch_size), level))
+            for label, rows, seconds in results:
+                loaded[label] = rows
+                if stdout:
+                    stdout.write(f"{label}: {rows} rows in {seconds:.2f}s")
+    return loaded
+
+
+def restore(directory, batch_size=None, workers=None, flush=False, stdout=None):
+    """
+    Load a dump written by dump() into the (empty) database. Returns {model label: rows}.
+
+    With flush=True the existing rows of the dumped models, and the rows of
+    other apps referencing them (e.g. admin log entries), are deleted first,
+    in the same transaction as the load.
+    """
+    with open(os.path.join(directory, 'manifest.json')) as f:
+        manifest = json.load(f)
+    batch_size = batch_size or getattr(settings, 'RESTORE_BATCH_SIZE', 2000)
+    if connection.vendor == 'sqlite':
+        workers = 1
+    workers = workers or getattr(settings, 'RESTORE_WORKERS', None) or min(8, os.cpu_count() or 4)
+
+    models = [model for model in dumped_models() if model._meta.label in manifest['models']]
+    missing = set(manifest['models']) - {model._meta.label for model in models}
+    if missing:
+        raise DumpError(f'Dump has models this project does not: {sorted(missing)}')
+
+    with ThreadPoolExecutor(max_workers=min(8, os.cpu_count() or 4)) as pool:
+        for file, ok in pool.map(_verify_stream, [(directory, manifest['models'][m._meta.label]) for m in models]):
+            if not ok:
+                raise DumpError(f"{file} does not match its checksum")
+
+    levels = dependency_levels(models)
+    if flush:
+        # Worker threads commit on their own connections, outside the flush transaction
+        workers = 1
+    else:
+        not_empty = [model._meta.label for model in models if model._base_manager.exists()]
+        if not_empty:
+            raise DumpError(f'Tables are not empty (use flush): {not_empty}')
+
+    with transaction.atomic() if flush else nullcontext():
+        if flush:
+            _flush(levels)
+        loaded = _load_levels(directory, manifest, levels, batch_size, workers, stdout)
+
+    # Raw inserts send no signals, so drop every worker's local caches here
+    bus.bump(*TOPICS)
+
+    # bulk_create with explicit ids does not move PostgreSQL sequences
+    sequence_sql = connection.ops.sequence_reset_sql(no_style(), models)
+    if sequence_sql:
+        with connection.cursor() as cursor:
+            for sql in sequence_sql:
+                cursor.execute(sql)
+    return loaded
@@ -0,0 +1,189 @@
+"""
+Per-view query and timing statistics, collected by QueryInstrumentationMiddleware.
+
+For every request the middleware wraps each database connection with
+an execute_wrapper that counts queries, sums their time and fingerprints
+their SQL (literals and IN lists collapsed), so a query run once per row
+shows up as one fingerprint with a high count: the N+1 signature. The
+renderer reports JSON encoding time through note_render().
+
+Results are aggregated per view in fixed-bucket histograms, in memory and
+per process. Nothing is collected unless QUERY_INSTRUMENTATION is on.
+"""
+from django.conf import settings
+from django.db import connections
+from bisect import bisect_left
+from collections import Counter
+from contextlib import ExitStack
+from functools import lru_cache
+import logging
+import re
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+QUERY_BOUNDS = (1, 2, 5, 10, 20, 50, 100, 200)
+MS_BOUNDS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+BYTES_BOUNDS = (1024, 10 * 1024, 100 * 1024, 1024 * 1024, 10 * 1024 * 1024)
+TOP_DUPLICATES = 5
+
+_IN_LIST = re.compile(r'\((?:\s*%s\s*,)+\s*%s\s*\)')
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+
+_current = threading.local()
+_lock = threading.Lock()
+_views = {}
+
+
+@lru_cache(maxsize=4096)
+def fingerprint(sql):
+    """SQL with literals replaced by ? and IN lists of any length by (...)"""
+    sql = _IN_LIST.sub('(...)', sql)
+    sql = _STRING.sub('?', sql)
+    return _NUMBER.sub('?', sql)
+
+
+class Histogram:
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def percentile(self, fraction):
+        """Upper bound of the bucket holding the percentile, capped at the max seen"""
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= fraction * self.count:
+                return round(min(self.bounds[index], self.max) if index < len(self.bounds) else self.max, 2)
+        return 0
+
+    def snapshot(self):
+        labels = [f'<={bound}' for bound in self.bounds] + [f'>{self.bounds[-1]}']
+        return {
+            'mean': round(self.total / self.count, 2) if self.count else 0,
+            'p50': self.percentile(0.5),
+            'p95': self.percentile(0.95),
+            'max': round(self.max, 2),
+            'buckets': {label: count for label, count in zip(labels, self.counts) if count},
+        }
+
+
+class ViewStats:
+
+    def __init__(self):
+        self.requests = 0
+        self.over_budget = 0
+        self.queries = Histogram(QUERY_BOUNDS)
+        self.db_ms = Histogram(MS_BOUNDS)
+        self.render_ms = Histogram(MS_BOUNDS)
+        self.total_ms = Histogram(MS_BOUNDS)
+        self.response_bytes = Histogram(BYTES_BOUNDS)
+        # fingerprint -> requests in which it ran more than once
+        self.duplicates = Counter()
+
+    def snapshot(self):
+        return {
+            'requests': self.requests,
+            'over_budget': self.over_budget,
+            'queries': self.queries.snapshot(),
+            'db_ms': self.db_ms.snapshot(),
+            'render_ms': self.render_ms.snapshot(),
+            'total_ms': self.total_ms.snapshot(),
+            'response_bytes': self.response_bytes.snapshot(),
+            'duplicate_queries': [
+                {'sql': sql, 'requests': count} for sql, count in self.duplicates.most_common(TOP_DUPLICATES)
+            ],
+        }
+
+
+class RequestRecorder:
+    """Collects the queries and render time of one request; a context manager around the view"""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.render_seconds = 0.0
+        self.fingerprints = Counter()
+        self.stack = ExitStack()
+
+    def __enter__(self):
+        for conn in connections.all():
+            self.stack.enter_context(conn.execute_wrapper(self))
+        _current.recorder = self
+        return self
+
+    def __exit__(self, *exc_info):
+        _current.recorder = None
+        self.stack.close()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_seconds += time.perf_counter() - started
+            self.queries += 1
+            self.fingerprints[fingerprint(sql)] += 1
+
+    def repeated(self):
+        return [(sql, count) for sql, count in self.fingerprints.most_common(TOP_DUPLICATES) if count > 1]
+
+
+def note_render(seconds):
+    """Called by the renderer; counts only while a request is being recorded"""
+    recorder = getattr(_current, 'recorder', None)
+    if recorder is not None:
+        recorder.render_seconds += seconds
+
+
+def query_budget(view):
+    return getattr(settings, 'QUERY_BUDGETS', {}).get(view, getattr(settings, 'QUERY_BUDGET', 30))
+
+
+def record(view, recorder, total_seconds, response_bytes):
+    budget = query_budget(view)
+    repeated = recorder.repeated()
+    with _lock:
+        stats = _views.setdefault(view, ViewStats())
+        stats.requests += 1
+        stats.queries.add(recorder.queries)
+        stats.db_ms.add(recorder.db_seconds * 1000)
+        stats.render_ms.add(recorder.render_seconds * 1000)
+        stats.total_ms.add(total_seconds * 1000)
+        if response_bytes is not None:
+            stats.response_bytes.add(response_bytes)
+        stats.duplicates.update(sql for sql, _ in repeated)
+        if recorder.queries > budget:
+            stats.over_budget += 1
+
+    if recorder.queries > budget:
+        logger.warning(
+            f"{view} ran {recorder.queries} queries (budget {budget}) taking {recorder.db_seconds * 1000:.1f} ms; "
+            f"repeated: {'; '.join(f'{count}x {sql[:200]}' for sql, count in repeated) or 'none'}"
+        )
+
+
+def view_stats():
+    """{view name: stats}, most queries first"""
+    with _lock:
+        snapshot = {view: stats.snapshot() for view, stats in _views.items()}
+    return dict(sorted(
+        snapshot.items(), key=lambda item: item[1]['queries']['mean'] * item[1]['requests'], reverse=True
+    ))
+
+
+def reset_view_stats():
+    with _lock:
+        _views.clear()
@@ -0,0 +1,214 @@
+"""
+Cross-worker invalidation for process-local caches, without Redis.
+
+Each cache topic ('catalog', 'students', ...) has a version counter that
+writers bump once their transaction commits (api.signals does it for the
+models behind each topic). All bumps of one transaction are published
+together by a single on_commit callback, so a bulk import that saves
+thousands of rows writes each counter once. Every worker re-reads the counters at most every
+CACHE_VERSION_CHECK_MS and a LocalCache whose topics moved drops its
+entries, so caches are at most that stale across workers and never stale
+in the worker that wrote.
+
+CACHE_VERSION_BACKEND picks where the counters live:
+
+    'db'    the CacheVersion table; one small query per worker per interval,
+            works across hosts
+    'file'  8-byte slots in an mmap'd file (CACHE_VERSION_FILE); reads are
+            memory loads, for single-host deployments
+"""
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError, transaction
+from django.db.models import F
+import fcntl
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+
+logger = logging.getLogger(__name__)
+
+CATALOG = 'catalog'        # Domain, Topic, Faculty
+SELECTIONS = 'selections'  # GroupSelection
+STUDENTS = 'students'      # Student
+SETTINGS = 'settings'      # system_settings.json
+TOPICS = (CATALOG, SELECTIONS, STUDENTS, SETTINGS)
+
+
+class DatabaseVersions:
+
+    def read(self):
+        from .models import CacheVersion
+        return dict(CacheVersion.objects.values_list('name', 'version'))
+
+    def bump(self, names):
+        from .models import CacheVersion
+        for name in sorted(names):
+            if CacheVersion.objects.filter(name=name).update(version=F('version') + 1):
+                continue
+            try:
+                with transaction.atomic():
+                    CacheVersion.objects.create(name=name, version=1)
+            except IntegrityError:
+                # Another worker created it first
+                CacheVersion.objects.filter(name=name).update(version=F('version') + 1)
+
+
+class FileVersions:
+    """
+    Counters in a shared memory-mapped file, one little-endian u64 per slot.
+
+    Names are hashed to slots; two names sharing a slot only cost an extra
+    invalidation. Writers serialise on flock, readers never lock: aligned
+    8-byte loads do not tear.
+    """
+
+    slots = 512
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.map = None
+
+    def _slot(self, name):
+        return zlib.crc32(name.encode()) % self.slots * 8
+
+    def _mapped(self):
+        if self.map is None:
+            with self.lock:
+                if self.map is None:
+                    os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+                    fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+                    try:
+                        fcntl.flock(fd, fcntl.LOCK_EX)
+                        if os.fstat(fd).st_size < self.slots * 8:
+                            os.ftruncate(fd, self.slots * 8)
+                        fcntl.flock(fd, fcntl.LOCK_UN)
+                        self.map = mmap.mmap(fd, self.slots * 8)
+                    finally:
+                        os.close(fd)
+        return self.map
+
+    def read(self):
+        versions = self._mapped()
+        return {name: struct.unpack_from('<Q', versions, self._slot(name))[0] for name in TOPICS}
+
+    def bump(self, names):
+        versions = self._mapped()
+        with open(self.path, 'rb') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                for name in names:
+                    offset = self._slot(name)
+                    struct.pack_into('<Q', versions, offset, struct.unpack_from('<Q', versions, offset)[0] + 1)
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+class _PendingBump:
+    """The topics bumped in the current transaction; registered once with on_commit"""
+
+    def __init__(self, bus):
+        self.bus = bus
+        self.names = set()
+
+    def __call__(self):
+        self.bus.publish(self.names)
+
+
+class InvalidationBus:
+
+    def __init__(self):
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.store = None
+        self.versions = {}
+        self.next_check = 0.0
+
+    def backend(self):
+        if self.store is None:
+            if getattr(settings, 'CACHE_VERSION_BACKEND', 'db') == 'file':
+                self.store = FileVersions(getattr(
+                    settings, 'CACHE_VERSION_FILE', os.path.join(settings.BASE_DIR, 'cache_versions.bin')
+                ))
+            else:
+                self.store = DatabaseVersions()
+        return self.store
+
+    def version(self, name):
+        """The last seen version of a topic; re-read from the backend at most every CACHE_VERSION_CHECK_MS"""
+        if time.monotonic() >= self.next_check:
+            self.refresh()
+        return self.versions.get(name, 0)
+
+    def refresh(self):
+        with self.lock:
+            try:
+                self.versions = self.backend().read()
+            except DatabaseError:
+                # Unmigrated database: keep serving, caches just stay per worker
+                logger.warning("Could not read cache versions", exc_info=True)
+            self.next_check = time.monotonic() + getattr(settings, 'CACHE_VERSION_CHECK_MS', 500) / 1000
+
+    def bump(self, *names):
+        """Publish new versions once the current transaction commits (immediately outside one)"""
+        conn = transaction.get_connection()
+        if not conn.in_atomic_block:
+            self.publish(names)
+            return
+        pending = getattr(self.local, 'pending', None)
+        # A rolled back (savepoint) block drops its callbacks, and a commit runs them
+        if pending is None or not any(entry[1] is pending for entry in conn.run_on_commit):
+            pending = self.local.pending = _PendingBump(self)
+            transaction.on_commit(pending)
+        pending.names.update(names)
+
+    def publish(self, names):
+        try:
+            self.backend().bump(names)
+        except DatabaseError:
+            logger.warning(f"Could not bump cache versions {names}", exc_info=True)
+        # This worker sees its own writes without waiting for the interval
+        self.next_check = 0.0
+
+
+bus = InvalidationBus()
+
+
+class LocalCache:
+    """
+    A per-process dict of computed values, emptied whenever one of its topics is bumped.
+
+        catalog_cache = LocalCache(CATALOG)
+        data = catalog_cache.get_or_set('domains', lambda: ...)
+    """
+
+    def __init__(self, *topics, max_entries=1000):
+        self.topics = topics
+        self.max_entries = max_entries
+        self.data = {}
+        self.stamp = None
+
+    def _check(self):
+        stamp = tuple(bus.version(topic) for topic in self.topics)
+        if stamp != self.stamp:
+            self.data = {}
+            self.stamp = stamp
+
+    def get_or_set(self, key, compute):
+        self._check()
+        try:
+            return self.data[key]
+        except KeyError:
+            pass
+        value = compute()
+        if len(self.data) >= self.max_entries:
+            self.data = {}
+        self.data[key] = value
+        return value
+
+    def clear(self):
+        self.data = {}
@@ -0,0 +1,190 @@
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+from datetime import timedelta
+import logging
+import secrets
+import threading
+import time
+
+from .models import OutboxEmail
+
+logger = logging.getLogger(__name__)
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def enqueue_email(subject, message, recipient_list, from_email=None):
+    """Queue an email for the background sender; same arguments as send_mail"""
+    email = OutboxEmail.objects.create(
+        subject=subject,
+        body=message,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        to=list(recipient_list),
+    )
+    if _setting('EMAIL_OUTBOX_ASYNC', True):
+        transaction.on_commit(sender.wake)
+    else:
+        send_pending()
+    return email
+
+
+def _claim(batch_size):
+    """Mark up to batch_size due emails as ours; a crashed sender's claims expire after the lease"""
+    now = timezone.now()
+    token = secrets.token_hex(16)
+    due = OutboxEmail.objects.filter(status__in=('pending', 'sending'), next_attempt_at__lte=now)
+    due_ids = list(due.order_by('next_attempt_at').values_list('pk', flat=True)[:batch_size])
+    if not due_ids:
+        return []
+
+    # Re-checking next_attempt_at skips rows another sender claimed in the meantime
+    due.filter(pk__in=due_ids).update(
+        status='sending',
+        claim_token=token,
+        attempts=F('attempts') + 1,
+        next_attempt_at=now + timedelta(seconds=_setting('EMAIL_OUTBOX_LEASE_SECONDS', 300)),
+    )
+    return list(OutboxEmail.objects.filter(claim_token=token, status='sending'))
+
+
+def _retry_delay(attempts):
+    base = _setting('EMAIL_OUTBOX_RETRY_BASE_SECONDS', 30)
+    return timedelta(seconds=min(base * 2 ** (attempts - 1), _setting('EMAIL_OUTBOX_RETRY_MAX_SECONDS', 3600)))
+
+
+def send_pending(connection=None, batch_size=None):
+    """Deliver one batch of due emails over a single backend connection. Returns (sent, failed)"""
+    batch = _claim(batch_size or _setting('EMAIL_OUTBOX_BATCH_SIZE', 50))
+    if not batch:
+        return 0, 0
+
+    own_connection = connection is None
+    connection = connection or get_connection(fail_silently=False)
+    sent_ids, failed = [], 0
+    try:
+        connection.open()
+    except Exception as e:
+        for email in batch:
+            _record_failure(email, e)
+        return 0, len(batch)
+
+    try:
+        for index, email in enumerate(batch):
+            message = EmailMessage(email.subject, email.body, email.from_email, email.to, connection=connection)
+            try:
+                message.send()
+            except Exception as e:
+                failed += 1
+                _record_failure(email, e)
+                # The connection may be unusable after an SMTP error
+                connection.close()
+                try:
+                    connection.open()
+                except Exception as e:
+                    for rest in batch[index + 1:]:
+                        _record_failure(rest, e)
+                    failed += len(batch) - index - 1
+                    break
+            else:
+                sent_ids.append(email.pk)
+    finally:
+        if own_connection:
+            connection.close()
+        # Bodies carry OTPs and reset links; only the envelope is kept once delivered
+        OutboxEmail.objects.filter(pk__in=sent_ids).update(
+            status='sent', sent_at=timezone.now(), last_error='', body=''
+        )
+
+    logger.info(f"Outbox: sent {len(sent_ids)}, failed {failed}")
+    return len(sent_ids), failed
+
+
+def _record_failure(email, error):
+    gave_up = email.attempts >= _setting('EMAIL_OUTBOX_MAX_ATTEMPTS', 5)
+    OutboxEmail.objects.filter(pk=email.pk).update(
+        status='failed' if gave_up else 'pending',
+        next_attempt_at=timezone.now() + _retry_delay(email.attempts),
+        last_error=str(error)[:1000],
+    )
+    log = logger.error if gave_up else logger.warning
+    log(f"Outbox email {email.pk} to {email.to} failed (attempt {email.attempts}): {error}")
+
+
+def purge_outbox():
+    """
+    Delete sent rows after EMAIL_OUTBOX_SENT_RETENTION_DAYS and failed ones,
+    whose bodies are still there, after EMAIL_OUTBOX_FAILED_RETENTION_DAYS
+    """
+    now = timezone.now()
+    sent, _ = OutboxEmail.objects.filter(
+        status='sent', sent_at__lt=now - timedelta(days=_setting('EMAIL_OUTBOX_SENT_RETENTION_DAYS', 30))
+    ).delete()
+    failed, _ = OutboxEmail.objects.filter(
+        status='failed', created_at__lt=now - timedelta(days=_setting('EMAIL_OUTBOX_FAILED_RETENTION_DAYS', 7))
+    ).delete()
+    if sent or failed:
+        logger.info(f"Outbox: purged {sent} sent and {failed} failed emails")
+    return sent, failed
+
+
+def drain(connection=None):
+    """Send batches until nothing is due, reusing one connection throughout"""
+    own_connection = connection is None
+    connection = connection or get_connection(fail_silently=False)
+    totals = [0, 0]
+    try:
+        while True:
+            sent, failed = send_pending(connection)
+            totals[0] += sent
+            totals[1] += failed
+            if not sent and not failed:
+                return tuple(totals)
+    finally:
+        if own_connection:
+            connection.close()
+
+
+class _OutboxSender:
+    """Daemon thread that drains the outbox when woken and on every poll interval"""
+
+    purge_interval = 3600
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.thread = None
+        self.next_purge = 0
+
+    def wake(self):
+        self._ensure_thread()
+        self.wakeup.set()
+
+    def _ensure_thread(self):
+        if self.thread is not None and self.thread.is_alive():
+            return
+        with self.lock:
+            if self.thread is not None and self.thread.is_alive():
+                return
+            self.thread = threading.Thread(target=self._run, name='email-outbox', daemon=True)
+            self.thread.start()
+
+    def _run(self):
+        while True:
+            self.wakeup.wait(_setting('EMAIL_OUTBOX_POLL_SECONDS', 5))
+            self.wakeup.clear()
+            close_old_connections()
+            try:
+                drain()
+                if time.monotonic() >= self.next_purge:
+                    self.next_purge = time.monotonic() + self.purge_interval
+                    purge_outbox()
+            except Exception:
+                logger.exception("Outbox sender failed")
+
+
+sender = _OutboxSender()
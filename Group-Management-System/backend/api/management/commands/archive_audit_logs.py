@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from api.retention import archive_dir, archive_old_rows, retention_days
+
+
+class Command(BaseCommand):
+    help = 'Move AdminLoginLog/RecoveryLog rows past the retention period into compressed NDJSON archives'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help='Retention in days (default: AUDIT_RETENTION_DAYS)')
+        parser.add_argument('--chunk-size', type=int, help='Rows moved per delete')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the rows that would be archived')
+        
+    def handle(self, *args, **options):
+        days = options['days'] if options['days'] is not None else retention_days()
+        moved = archive_old_rows(days, options['chunk_size'], options['dry_run'])
+        
+        verb = 'Would archive' if options['dry_run'] else 'Archived'
+        for name, count in moved.items():
+            self.stdout.write(f"{verb} {count} {name} rows older than {days} days")
+        if not options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(f"✅ Archives in {archive_dir()}"))
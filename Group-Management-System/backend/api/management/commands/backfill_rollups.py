@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from api.analytics import backfill_rollups
+from datetime import datetime
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the hourly/daily ActivityRollup table from the raw log tables'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--since', type=str, help='Only rebuild buckets from this date on (YYYY-MM-DD); '
+                            'days before the audit retention cutoff are always kept')
+        
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            try:
+                since = timezone.make_aware(datetime.strptime(options['since'], '%Y-%m-%d'))
+            except ValueError:
+                raise CommandError('--since must be a date in YYYY-MM-DD format')
+        
+        created = backfill_rollups(since)
+        self.stdout.write(self.style.SUCCESS(f"✅ Rebuilt {created} rollup rows"))
@@ -0,0 +1,84 @@
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.conf import settings
+from django.utils import timezone
+from api.backups import (
+    BackupRunning, backup_due, backup_history, backup_settings, create_job, last_scheduled_run, run_backup,
+)
+import logging
+import os
+import shutil
+import subprocess
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Run backups at backup.backupTime per backup.backupFrequency, at low priority and bounded bandwidth'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Run a backup if one is due, then exit')
+        parser.add_argument('--now', action='store_true', help='Run a scheduled backup immediately, then exit')
+        parser.add_argument('--interval', type=float, default=getattr(settings, 'BACKUP_SCHEDULE_POLL_SECONDS', 60))
+        parser.add_argument('--history', type=int, nargs='?', const=20, help='Show the last N runs and exit')
+        
+    def handle(self, *args, **options):
+        if options['history'] is not None:
+            self.show_history(options['history'])
+            return
+        
+        self.lower_priority()
+        while True:
+            config = backup_settings()
+            if options['now'] or backup_due(config, last_scheduled_run()):
+                self.run(config)
+            if options['now'] or options['once']:
+                return
+            close_old_connections()
+            time.sleep(options['interval'])
+    
+    def lower_priority(self):
+        """Lowest CPU priority and best-effort/lowest I/O priority, inherited by pg_dump"""
+        try:
+            os.setpriority(os.PRIO_PROCESS, 0, getattr(settings, 'BACKUP_SCHEDULE_NICE', 19))
+        except (AttributeError, OSError) as e:
+            logger.warning(f"Could not lower CPU priority: {e}")
+        if shutil.which('ionice'):
+            result = subprocess.run(['ionice', '-c', '2', '-n', '7', '-p', str(os.getpid())], capture_output=True)
+            if result.returncode != 0:
+                logger.warning(f"Could not lower I/O priority: {result.stderr.decode(errors='replace').strip()}")
+    
+    def run(self, config):
+        try:
+            job = create_job('scheduled', max_bytes_per_second=getattr(settings, 'BACKUP_SCHEDULE_MAX_BYTES_PER_SECOND', None))
+        except BackupRunning as e:
+            self.stdout.write(f"Backup {e.job['id']} is still running, skipping this slot")
+            return
+        
+        self.stdout.write(f"{timezone.localtime():%Y-%m-%d %H:%M} starting {config.get('backupFrequency', 'daily')} backup {job.id}")
+        try:
+            info = run_backup(job)
+        except Exception as e:
+            self.stderr.write(f"Backup {job.id} failed: {e}")
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Backup {job.id}: {info['size']} bytes, {info['stored']} new, "
+            f"{len(job.state.get('pruned') or [])} old backups pruned"
+        ))
+    
+    def show_history(self, limit):
+        runs = backup_history(limit)
+        self.stdout.write(f"{'id':<26} {'type':<9} {'status':<9} {'seconds':>8} {'MB read':>9} {'MB new':>8} {'MB/s':>6}")
+        for run in runs:
+            self.stdout.write(
+                f"{run['id']:<26} {run['type']:<9} {run['status']:<9} {run['duration_seconds']:>8.1f} "
+                f"{run['bytes_read'] / 1e6:>9.1f} {run['bytes_stored'] / 1e6:>8.1f} "
+                f"{run['throughput_bytes_per_second'] / 1e6:>6.1f}"
+            )
+        succeeded = [run for run in runs if run['status'] == 'succeeded']
+        if succeeded:
+            growth = sum(run['bytes_stored'] for run in succeeded) / len(succeeded)
+            self.stdout.write(self.style.SUCCESS(
+                f"✅ {len(succeeded)} successful runs, {growth / 1e6:.1f} MB new data per run on average"
+            ))
@@ -0,0 +1,71 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.utils import load_backend
+from concurrent.futures import ThreadPoolExecutor
+from api.db_pool import connections_opened, pools
+import time
+
+
+class Command(BaseCommand):
+    help = 'Compare per-request cost of new, persistent and pooled PostgreSQL connections'
+
+    modes = (
+        ('new', 'django.db.backends.postgresql', {'CONN_MAX_AGE': 0}),
+        ('persistent', 'django.db.backends.postgresql', {'CONN_MAX_AGE': 600, 'CONN_HEALTH_CHECKS': True}),
+        ('pool', 'api.postgres_backend', {'CONN_MAX_AGE': 0}),
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--threads', type=int, default=4, help='Request threads, as in a gthread worker')
+        parser.add_argument('--query', type=str, default='SELECT 1')
+
+    def handle(self, *args, **options):
+        base_settings = connections.settings['default']
+        if not base_settings['ENGINE'].endswith('postgresql') and base_settings['ENGINE'] != 'api.postgres_backend':
+            raise CommandError('Needs PostgreSQL: run with RENDER=1 and DATABASE_URL pointing at a local server')
+
+        n, threads = options['requests'], options['threads']
+        self.stdout.write(f"{n} requests on {threads} threads, query: {options['query']}\n")
+        header = f"{'mode':<12}{'ms/req':>9}{'p99 ms':>9}{'req/s':>9}{'connects':>10}"
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+
+        for label, engine, overrides in self.modes:
+            alias = f'bench-{label}'
+            settings_dict = {**base_settings, 'ENGINE': engine, **overrides}
+            backend = load_backend(engine)
+
+            def worker(count):
+                conn = backend.DatabaseWrapper(settings_dict, alias)
+                latencies = []
+                for _ in range(count):
+                    start = time.perf_counter()
+                    # What request_started/request_finished do around every request
+                    conn.close_if_unusable_or_obsolete()
+                    with conn.cursor() as cursor:
+                        cursor.execute(options['query'])
+                        cursor.fetchall()
+                    conn.close_if_unusable_or_obsolete()
+                    latencies.append(time.perf_counter() - start)
+                conn.close()
+                return latencies
+
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=threads) as pool:
+                results = pool.map(worker, [n // threads] * threads)
+                latencies = sorted(latency for result in results for latency in result)
+            elapsed = time.perf_counter() - start
+
+            connects = pools[alias].snapshot()['connects'] if alias in pools else connections_opened[alias]
+            self.stdout.write(
+                f"{label:<12}"
+                f"{sum(latencies) / len(latencies) * 1000:>9.2f}"
+                f"{latencies[int(len(latencies) * 0.99)] * 1000:>9.2f}"
+                f"{len(latencies) / elapsed:>9.0f}"
+                f"{connects:>10}"
+            )
+            if alias in pools:
+                pools[alias].close_all()
+
+        self.stdout.write(self.style.SUCCESS("✅ Benchmark finished"))
@@ -0,0 +1,101 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from django.utils.text import compress_string
+from rest_framework.renderers import JSONRenderer
+from api.renderers import FastJSONRenderer, orjson
+import decimal
+import time
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+class Command(BaseCommand):
+    help = 'Benchmark JSON render time and bytes on the wire for the big admin payloads'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=2000)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        repeat = options['repeat']
+
+        payloads = {
+            'admin/all-groups': self.all_groups_payload(rows),
+            'admin/all-students': self.all_students_payload(rows),
+            'selection-queue': self.selection_queue_payload(rows),
+        }
+
+        self.stdout.write(f"orjson: {'yes' if orjson else 'no'}, brotli: {'yes' if brotli else 'no'}")
+        self.stdout.write(f"rows={rows} repeat={repeat}\n")
+
+        header = f"{'endpoint':<22}{'renderer':<12}{'ms/render':>10}{'raw':>11}{'gzip':>10}{'br':>10}"
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+
+        for name, data in payloads.items():
+            for label, renderer in (('stdlib', JSONRenderer()), ('fast', FastJSONRenderer())):
+                start = time.perf_counter()
+                for _ in range(repeat):
+                    body = renderer.render(data)
+                elapsed = (time.perf_counter() - start) / repeat * 1000
+
+                gzip_size = len(compress_string(body))
+                br_size = len(brotli.compress(body, quality=5)) if brotli else '-'
+                self.stdout.write(
+                    f"{name:<22}{label:<12}{elapsed:>10.2f}{len(body):>11}{gzip_size:>10}{br_size:>10}"
+                )
+
+    def all_groups_payload(self, rows):
+        now = timezone.now()
+        groups = []
+        for i in range(rows):
+            groups.append({
+                'group_id': f'3f0c2a7e-9b1d-4c55-8e21-{i:012d}',
+                'size': 4,
+                'created_at': now,
+                'is_complete': bool(i % 2),
+                'leader': {'name': f'Student {i * 4}', 'roll_number': f'CS2024{i * 4:04d}'},
+                'members': [
+                    {'name': f'Student {i * 4 + m}', 'roll_number': f'CS2024{i * 4 + m:04d}'}
+                    for m in range(4)
+                ],
+                'selection': {
+                    'faculty': f'Faculty {i % 40}',
+                    'domain': f'Domain {i % 8}',
+                    'topic': f'Topic {i % 60}',
+                    'submitted_at': now,
+                    'is_approved': False,
+                },
+            })
+        return {'success': True, 'total_groups': rows, 'groups': groups}
+
+    def all_students_payload(self, rows):
+        students = []
+        for i in range(rows):
+            students.append({
+                'id': i,
+                'name': f'Student {i}',
+                'roll_number': f'CS2024{i:04d}',
+                'email': f'CS2024{i:04d}@college.edu',
+                'is_verified': True,
+                'username': f'CS2024{i:04d}',
+                'group': {'group_id': f'3f0c2a7e-9b1d-4c55-8e21-{i // 4:012d}', 'is_leader': i % 4 == 0},
+                'is_group_leader': i % 4 == 0,
+                'score': decimal.Decimal('7.25'),
+            })
+        return {'success': True, 'total_students': rows, 'students': students}
+
+    def selection_queue_payload(self, rows):
+        now = timezone.now()
+        queue = [{
+            'position': i + 1,
+            'group_id': f'3f0c2a7e-9b1d-4c55-8e21-{i:012d}',
+            'submitted_at': now,
+            'faculty': f'Faculty {i % 40}',
+            'domain': f'Domain {i % 8}',
+        } for i in range(rows)]
+        return {'success': True, 'queue': queue, 'total': rows}
@@ -0,0 +1,59 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from api.models import User
+from api.sessions import SessionStore
+import time
+
+
+class Command(BaseCommand):
+    help = 'Compare per-request DB round-trips for authenticated GETs across session engines'
+
+    engines = (
+        ('db', 'django.contrib.sessions.backends.db'),
+        ('cached_db', 'django.contrib.sessions.backends.cached_db'),
+        ('api.sessions', 'api.sessions'),
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--path', type=str, default='/api/domains/')
+
+    def handle(self, *args, **options):
+        n = options['requests']
+        path = options['path']
+
+        header = f"{'engine':<16}{'session q/req':>14}{'total q/req':>12}{'ms/req':>9}"
+        self.stdout.write(f"{n} authenticated GET {path}\n")
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+
+        if not SessionStore.cache_enabled():
+            self.stdout.write(
+                "Note: the 'sessions' cache is process-local, so api.sessions reads through the database; "
+                "set SESSION_CACHE_BACKEND to a shared backend to measure the cache path\n"
+            )
+
+        # Everything runs in a transaction that is rolled back at the end
+        with transaction.atomic():
+            user = User.objects.create_user(username='bench-session-user', password=None, role='admin')
+
+            for label, engine in self.engines:
+                with override_settings(SESSION_ENGINE=engine, ALLOWED_HOSTS=['*']):
+                    client = Client()
+                    client.force_login(user)
+                    client.get(path)  # warm the cache
+
+                    start = time.perf_counter()
+                    with CaptureQueriesContext(connection) as ctx:
+                        for _ in range(n):
+                            client.get(path)
+                    elapsed = (time.perf_counter() - start) / n * 1000
+
+                session_queries = sum(1 for q in ctx.captured_queries if 'django_session' in q['sql'])
+                self.stdout.write(
+                    f"{label:<16}{session_queries / n:>14.2f}{len(ctx.captured_queries) / n:>12.2f}{elapsed:>9.2f}"
+                )
+
+            transaction.set_rollback(True)
@@ -0,0 +1,118 @@
+from django.core.management.base import BaseCommand
+from multiprocessing import get_context
+from api.sqlite_profile import apply_pragmas, sqlite_pragmas
+import os
+import sqlite3
+import tempfile
+import time
+
+SCHEMA = (
+    'CREATE TABLE faculty (id INTEGER PRIMARY KEY, current_groups INTEGER NOT NULL, max_groups INTEGER NOT NULL)',
+    'CREATE TABLE selection (id INTEGER PRIMARY KEY, faculty_id INTEGER NOT NULL, worker INTEGER NOT NULL, '
+    'submitted_at REAL NOT NULL)',
+)
+
+
+def _run_worker(path, pragmas, begin, seconds, worker, reader):
+    """One gunicorn-like worker: FCFS-style read-then-write transactions, or plain reads, for `seconds`"""
+    # Django's connection settings: autocommit mode, Python's default 5 s timeout
+    conn = sqlite3.connect(path, timeout=5, isolation_level=None)
+    apply_pragmas(conn, pragmas)
+    committed = locked = 0
+    latencies = []
+    deadline = time.monotonic() + seconds
+    faculty_id = worker % 10 + 1
+    while time.monotonic() < deadline:
+        start = time.perf_counter()
+        try:
+            if reader:
+                conn.execute('SELECT faculty_id, COUNT(*) FROM selection GROUP BY faculty_id').fetchall()
+            else:
+                conn.execute(begin)
+                try:
+                    current, maximum = conn.execute(
+                        'SELECT current_groups, max_groups FROM faculty WHERE id = ?', (faculty_id,)
+                    ).fetchone()
+                    if current < maximum:
+                        conn.execute('UPDATE faculty SET current_groups = current_groups + 1 WHERE id = ?', (faculty_id,))
+                        conn.execute(
+                            'INSERT INTO selection (faculty_id, worker, submitted_at) VALUES (?, ?, ?)',
+                            (faculty_id, worker, time.time())
+                        )
+                    conn.execute('COMMIT')
+                except sqlite3.Error:
+                    if conn.in_transaction:
+                        conn.execute('ROLLBACK')
+                    raise
+        except sqlite3.OperationalError as e:
+            if 'locked' not in str(e):
+                raise
+            locked += 1
+            continue
+        committed += 1
+        latencies.append(time.perf_counter() - start)
+    conn.close()
+    return reader, committed, locked, latencies
+
+
+def _percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+class Command(BaseCommand):
+    help = 'Compare concurrent SQLite write throughput with Django defaults and the api.sqlite_profile tuning'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=8, help='Processes running write transactions')
+        parser.add_argument('--readers', type=int, default=2, help='Processes running read queries')
+        parser.add_argument('--seconds', type=float, default=5.0)
+        parser.add_argument('--dir', type=str, help='Where to create the scratch databases (default: a temp dir)')
+
+    def handle(self, *args, **options):
+        profiles = (
+            ('default', {}, 'BEGIN'),
+            ('tuned', sqlite_pragmas(), 'BEGIN IMMEDIATE'),
+        )
+        writers, readers, seconds = options['writers'], options['readers'], options['seconds']
+        self.stdout.write(f"{writers} writers + {readers} readers for {seconds:g}s per profile\n")
+
+        header = (
+            f"{'profile':<10}{'writes/s':>10}{'locked':>9}{'write p50':>11}{'write p99':>11}{'reads/s':>10}"
+        )
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+
+        with tempfile.TemporaryDirectory(dir=options['dir']) as directory:
+            for label, pragmas, begin in profiles:
+                path = os.path.join(directory, f'{label}.sqlite3')
+                conn = sqlite3.connect(path, isolation_level=None)
+                apply_pragmas(conn, pragmas)
+                for statement in SCHEMA:
+                    conn.execute(statement)
+                conn.executemany(
+                    'INSERT INTO faculty (id, current_groups, max_groups) VALUES (?, 0, ?)',
+                    [(i, 10 ** 9) for i in range(1, 11)]
+                )
+                conn.close()
+
+                jobs = [(path, pragmas, begin, seconds, worker, False) for worker in range(writers)]
+                jobs += [(path, pragmas, begin, seconds, worker, True) for worker in range(readers)]
+                with get_context('fork').Pool(len(jobs)) as pool:
+                    results = pool.starmap(_run_worker, jobs)
+
+                writes = [r for r in results if not r[0]]
+                reads = [r for r in results if r[0]]
+                latencies = [latency for r in writes for latency in r[3]]
+                self.stdout.write(
+                    f"{label:<10}"
+                    f"{sum(r[1] for r in writes) / seconds:>10.0f}"
+                    f"{sum(r[2] for r in writes):>9}"
+                    f"{_percentile(latencies, 0.5) * 1000:>9.2f}ms"
+                    f"{_percentile(latencies, 0.99) * 1000:>9.2f}ms"
+                    f"{sum(r[1] for r in reads) / seconds:>10.0f}"
+                )
+
+        self.stdout.write(self.style.SUCCESS("✅ Benchmark finished"))
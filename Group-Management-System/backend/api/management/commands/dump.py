@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from django.conf import settings
+from datetime import datetime
+import os
+
+from api.dumps import dump
+
+
+class Command(BaseCommand):
+    help = 'Write every api model as a compressed NDJSON stream (restore with the restore command)'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('directory', nargs='?', help='Output directory (default: <BACKUP_DIR>/dumps/<timestamp>)')
+        parser.add_argument('--batch-size', type=int, help='Rows fetched per query')
+        parser.add_argument('--database', default='default', help="Alias to read from, e.g. 'replica'")
+        
+    def handle(self, *args, **options):
+        directory = options['directory'] or os.path.join(
+            getattr(settings, 'BACKUP_DIR', os.path.join(settings.BASE_DIR, 'backups')),
+            'dumps', datetime.now().strftime('%Y%m%d_%H%M%S'),
+        )
+        manifest = dump(directory, options['batch_size'], options['database'])
+        
+        rows = sum(entry['rows'] for entry in manifest['models'].values())
+        for label, entry in manifest['models'].items():
+            self.stdout.write(f"{label}: {entry['rows']} rows")
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Dumped {rows} rows of {len(manifest['models'])} models to {directory} in {manifest['seconds']:.1f}s"
+        ))
@@ -0,0 +1,59 @@
+from django.core.management.base import BaseCommand, CommandError
+import os
+import time
+
+from api.backup_store import ChunkError
+from api.backups import backup_store
+
+
+class Command(BaseCommand):
+    help = 'Verify a backup from the chunk store and write its files to a directory'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('backup_id', nargs='?', help='Backup id (default: the latest backup)')
+        parser.add_argument('--target', help='Directory to restore into (default: <BACKUP_DIR>/restore/<id>)')
+        parser.add_argument('--workers', type=int, help='Threads verifying and writing chunks')
+        parser.add_argument('--verify-only', action='store_true', help='Check checksums without writing files')
+        parser.add_argument('--list', action='store_true', help='List the stored backups')
+        
+    def handle(self, *args, **options):
+        store = backup_store()
+        manifests = store.manifests()
+        
+        if options['list']:
+            for manifest in manifests:
+                self.stdout.write(
+                    f"{manifest['id']}  {manifest['type']:<9} {manifest['size']:>12} bytes  "
+                    f"{manifest['stored']:>12} new  {len(manifest['files'])} files"
+                )
+            return
+        
+        if not manifests:
+            raise CommandError('No backups in the store')
+        try:
+            manifest = store.manifest(options['backup_id']) if options['backup_id'] else manifests[-1]
+        except FileNotFoundError:
+            raise CommandError(f"Backup {options['backup_id']} not found")
+        
+        started = time.monotonic()
+        try:
+            if options['verify_only']:
+                bad = store.verify(manifest, options['workers'])
+                if bad:
+                    for sha, error in sorted(bad.items()):
+                        self.stderr.write(f"{sha}: {error}")
+                    raise CommandError(f"{len(bad)} bad chunks in backup {manifest['id']}")
+                self.stdout.write(self.style.SUCCESS(
+                    f"✅ Backup {manifest['id']} verified in {time.monotonic() - started:.1f}s"
+                ))
+                return
+            
+            target = options['target'] or os.path.join(store.root, 'restore', manifest['id'])
+            paths = store.restore(manifest, target, options['workers'])
+        except ChunkError as e:
+            raise CommandError(str(e))
+        
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Restored {len(paths)} files of backup {manifest['id']} to {target} "
+            f"in {time.monotonic() - started:.1f}s"
+        ))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.conf import settings
+from api.mailer import drain, purge_outbox
+import time
+
+
+class Command(BaseCommand):
+    help = 'Deliver queued outbox emails (once, or continuously with --loop)'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Keep polling the outbox')
+        parser.add_argument('--interval', type=float, default=getattr(settings, 'EMAIL_OUTBOX_POLL_SECONDS', 5))
+        
+    def handle(self, *args, **options):
+        next_purge = 0
+        while True:
+            sent, failed = drain()
+            if time.monotonic() >= next_purge:
+                purge_outbox()
+                next_purge = time.monotonic() + 3600
+            if sent or failed or not options['loop']:
+                self.stdout.write(self.style.SUCCESS(f"✅ Sent {sent} emails, {failed} failed"))
+            if not options['loop']:
+                return
+            close_old_connections()
+            time.sleep(options['interval'])
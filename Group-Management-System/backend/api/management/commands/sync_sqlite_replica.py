@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from api.routers import REPLICA, replica_configured
+import sqlite3
+import time
+
+
+class Command(BaseCommand):
+    help = 'Copy the SQLite primary into the SQLite replica (SQLITE_REPLICA_PATH), once or every --interval seconds'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, help='Keep syncing with this many seconds between copies')
+
+    def handle(self, *args, **options):
+        if not replica_configured():
+            raise CommandError('No replica database: set SQLITE_REPLICA_PATH')
+        primary, replica = connections['default'], connections[REPLICA]
+        if primary.vendor != 'sqlite' or replica.vendor != 'sqlite':
+            raise CommandError('Both databases must be SQLite; PostgreSQL replicas use streaming replication')
+
+        while True:
+            started = time.monotonic()
+            source = sqlite3.connect(str(primary.settings_dict['NAME']))
+            target = sqlite3.connect(str(replica.settings_dict['NAME']), timeout=30)
+            try:
+                source.backup(target)
+            finally:
+                target.close()
+                source.close()
+            self.stdout.write(f"Synced replica in {time.monotonic() - started:.2f}s")
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
+
+        self.stdout.write(self.style.SUCCESS(f"✅ Replica at {replica.settings_dict['NAME']}"))
@@ -1,23 +1,44 @@
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
 from django.utils import timezone
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_string
 from django.contrib.auth import logout
 from django.http import JsonResponse
 from .models import AdminLoginLog
+from .ratelimit import admin_lockout_limiter, client_ip
+from .instrumentation import RequestRecorder, record
+from .routers import pin_to_primary, replica_configured, request_wrote, start_request
 import hashlib
 import hmac
+import time
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
 
 class AdminSecurityMiddleware:
     """
     Middleware for enhanced admin security
+
+    Failed logins per IP are counted in a cache-backed sliding window
+    (api.ratelimit); AdminLoginLog is only read once to warm the counters
+    after a cold start.
     """
     
+    seed_key = 'rl:admin-lockout:seeded'
+    
     def __init__(self, get_response):
         self.get_response = get_response
-        self.max_attempts = 5
-        self.lockout_time = 30  # minutes
+        self.limiter = admin_lockout_limiter()
+        self.max_attempts = self.limiter.limit
+        self.lockout_time = self.limiter.window // 60  # minutes
+        self.path_prefixes = tuple(getattr(settings, 'ADMIN_SECURITY_PATH_PREFIXES', ('/admin/',)))
         
     def __call__(self, request):
         # Check if it's an admin endpoint
-        if request.path.startswith('/admin/'):
+        if request.path.startswith(self.path_prefixes):
             # Check for brute force attempts
             ip = self.get_client_ip(request)
             
@@ -39,19 +60,152 @@ class AdminSecurityMiddleware:
         return self.get_response(request)
     
     def get_client_ip(self, request):
-        x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-        if x_forwarded_for:
-            ip = x_forwarded_for.split(',')[0]
-        else:
-            ip = request.META.get('REMOTE_ADDR')
-        return ip
+        return client_ip(request)
     
-    def is_ip_locked(self, ip):
-        # Check recent failed attempts
+    def warm_from_db(self):
+        """Seed the counters from recent failures once per cache lifetime"""
+        if self.limiter.cache.get(self.seed_key):
+            return
         recent_failures = AdminLoginLog.objects.filter(
-            ip_address=ip,
             success=False,
-            timestamp__gte=timezone.now() - timezone.timedelta(minutes=self.lockout_time)
-        ).count()
+            timestamp__gte=timezone.now() - timezone.timedelta(seconds=self.limiter.window)
+        ).values_list('ip_address', 'timestamp')
+        self.limiter.seed((ip, ts.timestamp()) for ip, ts in recent_failures)
+        self.limiter.cache.set(self.seed_key, True, None)
+    
+    def is_ip_locked(self, ip):
+        self.warm_from_db()
+        return self.limiter.is_limited(ip)
+
+
+class ResponseCompressionMiddleware:
+    """
+    Compress API responses with brotli or gzip, whichever the client prefers.
+
+    Only non-streaming responses above COMPRESSION_MIN_SIZE bytes with a
+    compressible content type are touched; brotli is used only when the
+    optional `brotli` package is installed.
+
+    Responses of the views named in COMPRESSION_EXCLUDE_VIEWS (tokens, OTP
+    verification, reset tokens, paper keys) are never compressed: their
+    size would leak the secret to a BREACH-style attacker, and brotli has
+    no equivalent of gzip's random header padding.
+    """
+
+    compressible_types = ('application/json', 'text/', 'application/javascript')
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.min_size = getattr(settings, 'COMPRESSION_MIN_SIZE', 1024)
+        self.brotli_quality = getattr(settings, 'COMPRESSION_BROTLI_QUALITY', 5)
+        self.exclude_views = frozenset(getattr(settings, 'COMPRESSION_EXCLUDE_VIEWS', ()))
+
+    def __call__(self, request):
+        response = self.get_response(request)
+
+        if response.streaming or response.has_header('Content-Encoding'):
+            return response
+
+        match = request.resolver_match
+        if match is not None and match.url_name in self.exclude_views:
+            return response
+
+        content_type = response.get('Content-Type', '')
+        if not content_type.startswith(self.compressible_types):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+
+        if len(response.content) < self.min_size:
+            return response
+
+        encoding = self.negotiate(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding == 'br':
+            compressed = brotli.compress(response.content, quality=self.brotli_quality)
+        elif encoding == 'gzip':
+            compressed = compress_string(response.content, max_random_bytes=100)
+        else:
+            return response
+
+        # Return the compressed content only if it's actually shorter.
+        if len(compressed) >= len(response.content):
+            return response
+
+        response.content = compressed
+        response.headers['Content-Length'] = str(len(compressed))
+        response.headers['Content-Encoding'] = encoding
+
+        # A strong ETag no longer matches the encoded bytes.
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+
+        return response
+
+    def negotiate(self, accept_encoding):
+        """Pick 'br' or 'gzip' from an Accept-Encoding header, honouring q-values"""
+        weights = {}
+        for part in accept_encoding.split(','):
+            coding, _, params = part.strip().partition(';')
+            coding = coding.strip().lower()
+            if not coding:
+                continue
+            q = 1.0
+            params = params.strip()
+            if params.startswith('q='):
+                try:
+                    q = float(params[2:])
+                except ValueError:
+                    q = 0.0
+            weights[coding] = q
+
+        candidates = ['gzip']
+        if brotli is not None:
+            candidates.insert(0, 'br')
+
+        best, best_q = None, 0.0
+        for coding in candidates:
+            q = weights.get(coding, weights.get('*', 0.0))
+            if q > best_q:
+                best, best_q = coding, q
+        return best
+
+
+class ReplicaStickinessMiddleware:
+    """Pins a user's reads to the primary for sticky_seconds() after a request of theirs wrote (api.routers)"""
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+    
+    def __call__(self, request):
+        start_request()
+        response = self.get_response(request)
+        # DRF copies the user it authenticated onto the Django request
+        user = getattr(request, 'user', None)
+        if request_wrote() and replica_configured() and user is not None and user.is_authenticated:
+            pin_to_primary(user.pk)
+        return response
+
+
+class QueryInstrumentationMiddleware:
+    """
+    Per-view query count, DB time, duplicate queries, render time and response
+    size (api.instrumentation). Opt-in: removed unless QUERY_INSTRUMENTATION is on.
+    """
+    
+    def __init__(self, get_response):
+        if not getattr(settings, 'QUERY_INSTRUMENTATION', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+    
+    def __call__(self, request):
+        started = time.perf_counter()
+        with RequestRecorder() as recorder:
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - started
         
-        return recent_failures >= self.max_attempts
\ No newline at end of file
+        match = request.resolver_match
+        view = match.view_name if match is not None else 'unresolved'
+        size = None if response.streaming else len(response.content)
+        record(view, recorder, elapsed, size)
+        return response
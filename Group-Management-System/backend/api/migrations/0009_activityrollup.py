@@ -0,0 +1,31 @@
+# Generated by Django 4.2 on 2026-10-19 16:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_add_production_superuser'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActivityRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('granularity', models.CharField(choices=[('hour', 'Hourly'), ('day', 'Daily')], max_length=10)),
+                ('period_start', models.DateTimeField()),
+                ('logins', models.IntegerField(default=0)),
+                ('successful_logins', models.IntegerField(default=0)),
+                ('group_creations', models.IntegerField(default=0)),
+                ('selections', models.IntegerField(default=0)),
+                ('recoveries', models.IntegerField(default=0)),
+                ('failed_recoveries', models.IntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['-period_start'],
+                'unique_together': {('granularity', 'period_start')},
+            },
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.2 on 2026-10-19 16:39
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_otpcode'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='adminloginlog',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AlterField(
+            model_name='recoverylog',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
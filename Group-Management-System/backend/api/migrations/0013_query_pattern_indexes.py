@@ -0,0 +1,61 @@
+# Generated by Django 4.2 on 2026-10-19 16:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_audit_event_timestamps'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='adminloginlog',
+            index=models.Index(fields=['timestamp'], name='adminlog_timestamp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='adminloginlog',
+            index=models.Index(fields=['ip_address', 'success', 'timestamp'], name='adminlog_ip_success_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='adminloginlog',
+            index=models.Index(condition=models.Q(('success', False)), fields=['timestamp'], name='adminlog_failed_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='faculty',
+            index=models.Index(condition=models.Q(('is_available', True)), fields=['current_groups'], name='faculty_available_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='groupselection',
+            index=models.Index(fields=['faculty', 'submitted_at'], name='selection_faculty_fcfs_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='groupselection',
+            index=models.Index(fields=['domain', 'submitted_at'], name='selection_domain_fcfs_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recoverylog',
+            index=models.Index(fields=['timestamp'], name='recoverylog_timestamp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='topic',
+            index=models.Index(condition=models.Q(('is_available', True)), fields=['domain'], name='topic_available_domain_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['email'], name='user_email_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['phone_number'], name='user_phone_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['recovery_email'], name='user_recovery_email_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['recovery_phone'], name='user_recovery_phone_idx'),
+        ),
+    ]
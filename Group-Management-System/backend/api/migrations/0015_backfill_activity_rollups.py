@@ -0,0 +1,46 @@
+from django.db import migrations
+from django.db.models import Count, Q
+from django.db.models.functions import TruncDay, TruncHour
+
+
+def backfill(apps, schema_editor):
+    # Rollups were only written for activity after 0009; rebuild them all.
+    # Frozen copy of api.analytics.backfill_rollups() at this point: no audit
+    # rows had been archived yet, so every day can still be rebuilt.
+    ActivityRollup = apps.get_model('api', 'ActivityRollup')
+    sources = (
+        (apps.get_model('api', 'AdminLoginLog'), 'timestamp', {
+            'logins': Count('id'),
+            'successful_logins': Count('id', filter=Q(success=True)),
+        }),
+        (apps.get_model('api', 'Group'), 'created_at', {'group_creations': Count('id')}),
+        (apps.get_model('api', 'GroupSelection'), 'selected_at', {'selections': Count('id')}),
+        (apps.get_model('api', 'RecoveryLog'), 'timestamp', {
+            'recoveries': Count('id'),
+            'failed_recoveries': Count('id', filter=Q(success=False)),
+        }),
+    )
+
+    ActivityRollup.objects.all().delete()
+    for granularity, trunc in (('hour', TruncHour), ('day', TruncDay)):
+        buckets = {}
+        for model, field, counters in sources:
+            rows = model.objects.annotate(bucket=trunc(field)).values('bucket').annotate(**counters)
+            for row in rows:
+                buckets.setdefault(row.pop('bucket'), {}).update(row)
+        ActivityRollup.objects.bulk_create(
+            [ActivityRollup(granularity=granularity, period_start=bucket, **counts)
+             for bucket, counts in buckets.items()],
+            batch_size=500
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_cache_versions'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
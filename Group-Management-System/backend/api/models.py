@@ -1,8 +1,14 @@
+from django.conf import settings
 from django.contrib.auth.hashers import check_password, make_password
 from django.db import models
+from django.db.models import Q
 from django.contrib.auth.models import AbstractUser
+from django.utils import timezone
+from django.utils.crypto import salted_hmac
+from .ratelimit import SlidingWindowLimiter
 import uuid
 import hashlib
+import hmac
 import os
 
 class User(AbstractUser):
@@ -84,22 +90,89 @@ class User(AbstractUser):
         verbose_name='user permissions',
     )
     
+    class Meta(AbstractUser.Meta):
+        # Password-reset lookups by email/phone
+        indexes = [
+            models.Index(fields=['email'], name='user_email_idx'),
+            models.Index(fields=['phone_number'], name='user_phone_idx'),
+            models.Index(fields=['recovery_email'], name='user_recovery_email_idx'),
+            models.Index(fields=['recovery_phone'], name='user_recovery_phone_idx'),
+        ]
+    
+    BACKUP_CODE_ITERATIONS = 100000
+    
+    @staticmethod
+    def backup_code_tags(code):
+        """Keyed lookup tags for a code: one per SECRET_KEY (current and fallbacks)"""
+        secrets = [settings.SECRET_KEY, *getattr(settings, 'SECRET_KEY_FALLBACKS', [])]
+        return [
+            salted_hmac('api.User.backup_codes', code, secret=secret, algorithm='sha256').hexdigest()[:32]
+            for secret in secrets
+        ]
+    
+    @classmethod
+    def _hash_backup_code(cls, code, salt):
+        return hashlib.pbkdf2_hmac('sha256', code.encode(), salt.encode(), cls.BACKUP_CODE_ITERATIONS).hex()
+    
     def set_backup_codes(self, codes):
+        """Store codes as 'tag$salt$hash'; the tag locates a code without hashing"""
         hashed_codes = []
         for code in codes:
             salt = os.urandom(32).hex()
-            hashed = hashlib.pbkdf2_hmac('sha256', code.encode(), salt.encode(), 100000).hex()
-            hashed_codes.append(f"{salt}${hashed}")
+            hashed = self._hash_backup_code(code, salt)
+            hashed_codes.append(f"{self.backup_code_tags(code)[0]}${salt}${hashed}")
         self.backup_codes = hashed_codes
+    
+    @staticmethod
+    def legacy_backup_code_limiter():
+        """Scans of untagged backup codes per user, BACKUP_CODE_LEGACY_SCANS per hour"""
+        return SlidingWindowLimiter(
+            'backup-code-legacy', limit=getattr(settings, 'BACKUP_CODE_LEGACY_SCANS', 5), window=3600
+        )
+    
+    def _find_backup_code(self, codes, code):
+        """Return the stored entry matching code, running at most one slow hash for tagged entries"""
+        tags = set(self.backup_code_tags(code))
+        legacy = []
+        for stored in codes:
+            parts = stored.split('$')
+            if len(parts) == 3:
+                if parts[0] in tags:
+                    return stored if hmac.compare_digest(self._hash_backup_code(code, parts[1]), parts[2]) else None
+            else:
+                legacy.append(stored)
         
-    def verify_backup_code(self, code):
-        for stored in self.backup_codes:
+        # Codes issued before tagging have to be hashed one by one; they
+        # disappear once regenerated. Cap the scans so wrong guesses can't
+        # cost N slow hashes each without limit
+        if not legacy:
+            return None
+        limiter = self.legacy_backup_code_limiter()
+        if limiter.is_limited(self.pk):
+            return None
+        limiter.hit(self.pk)
+        for stored in legacy:
             salt, hashed = stored.split('$')
-            test_hash = hashlib.pbkdf2_hmac('sha256', code.encode(), salt.encode(), 100000).hex()
-            if test_hash == hashed:
-                self.backup_codes.remove(stored)
-                self.save()
+            if hmac.compare_digest(self._hash_backup_code(code, salt), hashed):
+                return stored
+        return None
+    
+    def verify_backup_code(self, code):
+        """Verify and consume a backup code with a conditional single-column update"""
+        codes = list(self.backup_codes)
+        for _ in range(3):
+            stored = self._find_backup_code(codes, code)
+            if stored is None:
+                return False
+            
+            remaining = [c for c in codes if c != stored]
+            if User.objects.filter(pk=self.pk, backup_codes=codes).update(backup_codes=remaining):
+                self.backup_codes = remaining
                 return True
+            
+            # Another request changed the codes first; re-read and retry
+            codes = User.objects.values_list('backup_codes', flat=True).get(pk=self.pk)
+        
         return False
     
     def __str__(self):
@@ -128,6 +201,10 @@ class Faculty(models.Model):
     current_groups = models.IntegerField(default=0)
     is_available = models.BooleanField(default=True)
     
+    class Meta:
+        # Partial: the ORM filters booleans as a bare column, which a composite index can't match
+        indexes = [models.Index(fields=['current_groups'], condition=Q(is_available=True), name='faculty_available_idx')]
+    
     def __str__(self):
         return self.name
 
@@ -173,6 +250,9 @@ class Topic(models.Model):
     current_groups = models.IntegerField(default=0)
     is_available = models.BooleanField(default=True)
     
+    class Meta:
+        indexes = [models.Index(fields=['domain'], condition=Q(is_available=True), name='topic_available_domain_idx')]
+    
     def __str__(self):
         return self.name
 
@@ -191,6 +271,11 @@ class GroupSelection(models.Model):
     
     class Meta:
         ordering = ['submitted_at']  # Oldest first = FCFS
+        # Per-faculty/per-domain queues, already in FCFS order
+        indexes = [
+            models.Index(fields=['faculty', 'submitted_at'], name='selection_faculty_fcfs_idx'),
+            models.Index(fields=['domain', 'submitted_at'], name='selection_domain_fcfs_idx'),
+        ]
     
     def __str__(self):
         return f"Selection for Group {self.group.group_id}"
@@ -201,11 +286,17 @@ class AdminLoginLog(models.Model):
     ip_address = models.GenericIPAddressField()
     user_agent = models.TextField(blank=True)
     success = models.BooleanField(default=False)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    timestamp = models.DateTimeField(default=timezone.now)  # event time, rows may be written later by api.audit
     two_factor_used = models.BooleanField(default=False)
     
     class Meta:
         ordering = ['-timestamp']
+        indexes = [
+            models.Index(fields=['timestamp'], name='adminlog_timestamp_idx'),
+            models.Index(fields=['ip_address', 'success', 'timestamp'], name='adminlog_ip_success_ts_idx'),
+            # Lockout warm-up only reads recent failures
+            models.Index(fields=['timestamp'], condition=Q(success=False), name='adminlog_failed_ts_idx'),
+        ]
 
 
 class RecoveryLog(models.Model):
@@ -226,11 +317,12 @@ class RecoveryLog(models.Model):
     ip_address = models.GenericIPAddressField()
     user_agent = models.TextField(blank=True)
     success = models.BooleanField(default=False)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    timestamp = models.DateTimeField(default=timezone.now)
     metadata = models.JSONField(default=dict, blank=True)
     
     class Meta:
         ordering = ['-timestamp']
+        indexes = [models.Index(fields=['timestamp'], name='recoverylog_timestamp_idx')]
 
 
 class SuperAdminBiometric(models.Model):
@@ -278,4 +370,89 @@ class SelectionQueue(models.Model):
     processed = models.BooleanField(default=False)
     
     class Meta:
-        ordering = ['requested_at']
\ No newline at end of file
+        ordering = ['requested_at']
+
+class ActivityRollup(models.Model):
+    """Pre-aggregated activity counters per hour/day, maintained by api.signals"""
+    GRANULARITY_CHOICES = (
+        ('hour', 'Hourly'),
+        ('day', 'Daily'),
+    )
+    
+    granularity = models.CharField(max_length=10, choices=GRANULARITY_CHOICES)
+    period_start = models.DateTimeField()
+    logins = models.IntegerField(default=0)
+    successful_logins = models.IntegerField(default=0)
+    group_creations = models.IntegerField(default=0)
+    selections = models.IntegerField(default=0)
+    recoveries = models.IntegerField(default=0)
+    failed_recoveries = models.IntegerField(default=0)
+    
+    class Meta:
+        unique_together = ['granularity', 'period_start']
+        ordering = ['-period_start']
+    
+    def __str__(self):
+        return f"{self.granularity} rollup @ {self.period_start}"
+
+
+class OutboxEmail(models.Model):
+    """Queued outgoing email, delivered by api.mailer's background sender"""
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('sending', 'Sending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    )
+    
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=255)
+    to = models.JSONField(default=list)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.IntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    claim_token = models.CharField(max_length=32, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['created_at']
+        indexes = [models.Index(fields=['status', 'next_attempt_at'])]
+    
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.to)} ({self.status})"
+
+
+class OTPCode(models.Model):
+    """One-time code per user and purpose, used by api.otp_utils when the cache is unavailable"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='otp_codes')
+    purpose = models.CharField(max_length=30)
+    code_hash = models.CharField(max_length=64)
+    attempts = models.IntegerField(default=0)
+    expires_at = models.DateTimeField()
+    
+    class Meta:
+        unique_together = ['user', 'purpose']
+    
+    def __str__(self):
+        return f"{self.purpose} OTP for {self.user_id}"
+
+
+class CacheVersion(models.Model):
+    """Version counter per cache topic, bumped on writes; api.invalidation drops local caches when it moves"""
+    name = models.CharField(max_length=50, primary_key=True)
+    version = models.BigIntegerField(default=0)
+    
+    def __str__(self):
+        return f"{self.name} v{self.version}"
+
+
+class RevokedToken(models.Model):
+    """Rotated refresh token ids and logged-out session ids; api.tokens refuses them until they expire"""
+    token_id = models.CharField(max_length=32, primary_key=True)
+    expires_at = models.DateTimeField(db_index=True)
+    
+    def __str__(self):
+        return f"{self.token_id} until {self.expires_at}"
@@ -1,18 +1,28 @@
-import random
+import secrets
 import string
 from datetime import datetime, timedelta
 from django.utils import timezone
-from django.core.mail import send_mail
+from django.utils.crypto import salted_hmac
 from django.conf import settings
+from django.core.cache import caches
+from django.db.models import F
+import hmac
+import logging
 import pyotp
 import requests
 
+from .mailer import enqueue_email
+from .models import OTPCode
+from .ratelimit import is_shared_cache
+
+logger = logging.getLogger(__name__)
+
 def generate_otp(length=6):
     """Generate a numeric OTP"""
-    return ''.join(random.choices(string.digits, k=length))
+    return ''.join(secrets.choice(string.digits) for _ in range(length))
 
 def send_otp_email(email, otp, user_type):
-    """Send OTP via email"""
+    """Queue the OTP email; api.mailer delivers it in the background"""
     subject = f'Password Reset OTP - GroupFlow'
     message = f"""
     Hello,
@@ -28,7 +38,7 @@ def send_otp_email(email, otp, user_type):
     Thanks,
     GroupFlow Team
     """
-    send_mail(subject, message, settings.DEFAULT_FROM_EMAIL, [email])
+    enqueue_email(subject, message, [email])
 
 def send_otp_sms(phone, otp):
     """Send OTP via SMS using Twilio (or any SMS service)"""
@@ -45,15 +55,123 @@ def send_otp_sms(phone, otp):
     # )
     return True
 
-def verify_otp(user, otp):
-    """Verify OTP against user's stored OTP"""
-    if not user.otp_secret or not user.otp_created_at:
-        return False
-    
-    # Check if OTP expired (10 minutes)
-    expiry_time = user.otp_created_at + timedelta(minutes=10)
-    if timezone.now() > expiry_time:
+def _code_hash(user_id, purpose, otp):
+    return salted_hmac('api.otp_utils', f'{user_id}:{purpose}:{otp}', algorithm='sha256').hexdigest()
+
+
+class CacheOTPStore:
+    """OTPs in the cache: expiry is the cache TTL and attempts are an atomic counter"""
+
+    def __init__(self, alias):
+        self.cache = caches[alias]
+
+    def _key(self, user_id, purpose):
+        return f'otp:{purpose}:{user_id}'
+
+    def save(self, user_id, purpose, code_hash, ttl):
+        key = self._key(user_id, purpose)
+        self.cache.set(key, code_hash, ttl)
+        self.cache.set(f'{key}:attempts', 0, ttl)
+
+    def check(self, user_id, purpose, code_hash, max_attempts):
+        key = self._key(user_id, purpose)
+        stored = self.cache.get(key)
+        if stored is None:
+            return False
+        try:
+            attempts = self.cache.incr(f'{key}:attempts')
+        except ValueError:
+            attempts = max_attempts + 1
+        if attempts > max_attempts:
+            self.discard(user_id, purpose)
+            return False
+        return hmac.compare_digest(stored, code_hash)
+
+    def discard(self, user_id, purpose):
+        key = self._key(user_id, purpose)
+        self.cache.delete_many([key, f'{key}:attempts'])
+
+
+class DBOTPStore:
+    """OTPs in the narrow OTPCode table, so user rows are never written"""
+
+    def save(self, user_id, purpose, code_hash, ttl):
+        OTPCode.objects.update_or_create(
+            user_id=user_id, purpose=purpose,
+            defaults={'code_hash': code_hash, 'attempts': 0, 'expires_at': timezone.now() + timedelta(seconds=ttl)}
+        )
+
+    def check(self, user_id, purpose, code_hash, max_attempts):
+        live = OTPCode.objects.filter(user_id=user_id, purpose=purpose, expires_at__gt=timezone.now())
+        if not live.filter(attempts__lt=max_attempts).update(attempts=F('attempts') + 1):
+            live.delete()
+            return False
+        stored = live.values_list('code_hash', flat=True).first()
+        return stored is not None and hmac.compare_digest(stored, code_hash)
+
+    def discard(self, user_id, purpose):
+        OTPCode.objects.filter(user_id=user_id, purpose=purpose).delete()
+
+
+class OTPStore:
+    """
+    Issue and verify one-time codes without touching the User row.
+
+    OTP_STORE = 'db' (the default) keeps codes in the OTPCode table. 'cache'
+    keeps them in OTP_CACHE_ALIAS and falls back to the table whenever the
+    cache raises; it is only honoured when that cache is shared by all
+    workers, since a code issued by one worker must verify in another.
+    """
+
+    def __init__(self):
+        self.db = DBOTPStore()
+        self.warned = False
+
+    @property
+    def primary(self):
+        if getattr(settings, 'OTP_STORE', 'db') != 'cache':
+            return None
+        alias = getattr(settings, 'OTP_CACHE_ALIAS', 'default')
+        if not is_shared_cache(alias):
+            if not self.warned:
+                logger.warning(f"OTP_STORE='cache' needs a shared cache but '{alias}' is per process; using the database")
+                self.warned = True
+            return None
+        return CacheOTPStore(alias)
+
+    def _call(self, method, *args):
+        primary = self.primary
+        if primary is not None:
+            try:
+                return getattr(primary, method)(*args)
+            except Exception:
+                logger.warning(f"OTP cache unavailable, using the database for {method}", exc_info=True)
+        return getattr(self.db, method)(*args)
+
+    def issue(self, user_id, purpose, length=6):
+        """New code for user_id/purpose, replacing any previous one"""
+        otp = generate_otp(length)
+        ttl = getattr(settings, 'OTP_TTL_SECONDS', 600)
+        self._call('save', user_id, purpose, _code_hash(user_id, purpose, otp), ttl)
+        return otp
+
+    def verify(self, user_id, purpose, otp):
+        """True if otp matches; the code is single-use and dies after OTP_MAX_ATTEMPTS tries"""
+        if not otp:
+            return False
+        max_attempts = getattr(settings, 'OTP_MAX_ATTEMPTS', 5)
+        if self._call('check', user_id, purpose, _code_hash(user_id, purpose, str(otp)), max_attempts):
+            self.discard(user_id, purpose)
+            return True
         return False
-    
-    # Verify OTP
-    return user.otp_secret == otp
\ No newline at end of file
+
+    def discard(self, user_id, purpose):
+        self._call('discard', user_id, purpose)
+
+
+otp_store = OTPStore()
+
+
+def verify_otp(user, otp, purpose='password_reset'):
+    """Verify OTP against the code issued to user"""
+    return otp_store.verify(user.id, purpose, otp)
@@ -0,0 +1,41 @@
+from django.db.backends.postgresql import base
+from django.db.backends.postgresql.psycopg_any import IsolationLevel
+
+from api.db_pool import get_pool
+
+
+def _ping(conn):
+    with conn.cursor() as cursor:
+        cursor.execute('SELECT 1')
+
+
+def _reset(conn):
+    """Back to idle and autocommit, or raise so the pool drops it"""
+    if conn.closed or getattr(conn, 'broken', False):
+        raise base.Database.InterfaceError('connection is closed')
+    if conn.info.transaction_status != base.Database.pq.TransactionStatus.IDLE:
+        conn.rollback()
+    conn.autocommit = True
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    PostgreSQL backend whose connections come from api.db_pool.
+
+    Use it with CONN_MAX_AGE = 0: each request then checks a connection out
+    and hands it back when Django closes it, so threads share DB_POOL_SIZE
+    connections instead of each opening its own.
+    """
+
+    def get_new_connection(self, conn_params):
+        pool = get_pool(self.alias, _ping, _reset)
+        # The parent sets this while connecting; reused connections skip that
+        self.isolation_level = IsolationLevel(
+            self.settings_dict['OPTIONS'].get('isolation_level', IsolationLevel.READ_COMMITTED)
+        )
+        return pool.checkout(lambda: super(DatabaseWrapper, self).get_new_connection(conn_params))
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                get_pool(self.alias, _ping, _reset).checkin(self.connection)
@@ -0,0 +1,119 @@
+from django.conf import settings
+from django.core.cache import caches
+import math
+import time
+
+# Backends whose entries live in one process; state kept in them is per worker
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def is_shared_cache(alias):
+    """True when every worker process sees the same entries in caches[alias]"""
+    return settings.CACHES[alias]['BACKEND'] not in PROCESS_LOCAL_CACHES
+
+
+# Backends whose add() is atomic, which TokenBucketThrottle's per-bucket lock
+# relies on. FileBasedCache's add() is a separate read and write, so two
+# workers can both take the lock.
+ATOMIC_ADD_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.redis.RedisCache',
+    'django.core.cache.backends.memcached.PyMemcacheCache',
+    'django.core.cache.backends.memcached.PyLibMCCache',
+    'django_redis.cache.RedisCache',
+)
+
+
+def has_atomic_add(alias):
+    """True when caches[alias].add() can serve as a lock"""
+    return settings.CACHES[alias]['BACKEND'] in ATOMIC_ADD_CACHES
+
+
+def client_ip(request):
+    """
+    The address the request came from, as DRF's throttles see it.
+
+    X-Forwarded-For is client supplied except for the entries appended by
+    our own proxies, so with NUM_PROXIES = n the n-th entry from the right
+    is used, and REMOTE_ADDR when NUM_PROXIES is 0.
+    """
+    remote_addr = request.META.get('REMOTE_ADDR')
+    num_proxies = settings.REST_FRAMEWORK.get('NUM_PROXIES') or 0
+    xff = request.META.get('HTTP_X_FORWARDED_FOR')
+    if num_proxies and xff:
+        addrs = [addr.strip() for addr in xff.split(',')]
+        return addrs[-min(num_proxies, len(addrs))]
+    return remote_addr
+
+
+class SlidingWindowLimiter:
+    """
+    Per-identifier event counter over a sliding window, kept in the Django cache.
+
+    The window is split into fixed buckets; each event increments the bucket
+    for "now" and the count is the sum of the buckets still inside the
+    window. Increments are atomic on the locmem backend; the file-based
+    backend may lose an increment under concurrent writers, which is fine
+    for lockout heuristics.
+    """
+
+    def __init__(self, name, limit, window, buckets=10, cache_alias=None):
+        self.name = name
+        self.limit = limit
+        self.window = window
+        self.bucket_seconds = max(int(window // buckets), 1)
+        self.buckets = math.ceil(window / self.bucket_seconds)
+        self.cache = caches[cache_alias or getattr(settings, 'RATELIMIT_CACHE_ALIAS', 'default')]
+
+    def _bucket(self, now=None):
+        return int((time.time() if now is None else now) // self.bucket_seconds)
+
+    def _key(self, ident, bucket):
+        return f'rl:{self.name}:{ident}:{bucket}'
+
+    def _timeout(self):
+        return self.window + self.bucket_seconds
+
+    def hit(self, ident, now=None, amount=1):
+        """Record `amount` events for ident"""
+        key = self._key(ident, self._bucket(now))
+        if self.cache.add(key, amount, self._timeout()):
+            return
+        try:
+            self.cache.incr(key, amount)
+        except ValueError:
+            # Bucket expired between add() and incr()
+            self.cache.add(key, amount, self._timeout())
+
+    def count(self, ident, now=None):
+        """Events recorded for ident inside the window"""
+        current = self._bucket(now)
+        keys = [self._key(ident, bucket) for bucket in range(current - self.buckets + 1, current + 1)]
+        return sum(self.cache.get_many(keys).values())
+
+    def is_limited(self, ident, now=None):
+        return self.count(ident, now) >= self.limit
+
+    def seed(self, events, now=None):
+        """Overwrite the counters from (ident, unix_timestamp) pairs, e.g. read from the DB"""
+        oldest = self._bucket(now) - self.buckets + 1
+        counts = {}
+        for ident, timestamp in events:
+            bucket = self._bucket(timestamp)
+            if bucket >= oldest:
+                key = self._key(ident, bucket)
+                counts[key] = counts.get(key, 0) + 1
+        if counts:
+            self.cache.set_many(counts, self._timeout())
+
+
+def admin_lockout_limiter():
+    """Failed admin logins per IP, shared by AdminSecurityMiddleware and api.signals"""
+    return SlidingWindowLimiter(
+        'admin-lockout',
+        limit=getattr(settings, 'ADMIN_LOCKOUT_MAX_ATTEMPTS', 5),
+        window=getattr(settings, 'ADMIN_LOCKOUT_MINUTES', 30) * 60,
+    )
@@ -0,0 +1,59 @@
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils import encoders
+import time
+
+from .instrumentation import note_render
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - stdlib fallback
+    orjson = None
+
+
+_fallback_encoder = encoders.JSONEncoder()
+
+
+def _orjson_default(obj):
+    """Handle the types orjson does not know about (Decimal, timedelta, lazy strings...)"""
+    return _fallback_encoder.default(obj)
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    Drop-in replacement for DRF's JSONRenderer.
+
+    Uses orjson when it is installed and falls back to the stdlib encoder
+    otherwise. Datetimes are rendered exactly like DRF does ('Z' suffix for
+    UTC), Decimals become floats and anything else is delegated to DRF's
+    JSONEncoder, so both code paths produce the same payload.
+    """
+
+    if orjson is not None:
+        option = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        started = time.perf_counter()
+        try:
+            return self._render(data, accepted_media_type, renderer_context)
+        finally:
+            note_render(time.perf_counter() - started)
+
+    def _render(self, data, accepted_media_type, renderer_context):
+        if orjson is None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        if data is None:
+            return b''
+
+        renderer_context = renderer_context or {}
+        if self.get_indent(accepted_media_type, renderer_context) is not None:
+            # orjson only supports a fixed 2-space indent; pretty output is a
+            # debugging aid (browsable API) so the stdlib path is fine here.
+            return super().render(data, accepted_media_type, renderer_context)
+
+        ret = orjson.dumps(data, default=_orjson_default, option=self.option)
+
+        # Keep DRF's guarantee that the output is a strict javascript subset.
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
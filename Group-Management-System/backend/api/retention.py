@@ -0,0 +1,147 @@
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from datetime import timedelta, timezone as dt_timezone
+import glob
+import gzip
+import json
+import logging
+import os
+
+from .models import AdminLoginLog, RecoveryLog
+
+logger = logging.getLogger(__name__)
+
+# Columns written to the archive; user__username keeps cold rows readable after users are deleted
+ARCHIVED_MODELS = {
+    'adminloginlog': (AdminLoginLog, (
+        'id', 'user_id', 'user__username', 'ip_address', 'user_agent', 'success', 'timestamp', 'two_factor_used',
+    )),
+    'recoverylog': (RecoveryLog, (
+        'id', 'user_id', 'user__username', 'requested_by_id', 'method', 'ip_address', 'user_agent', 'success',
+        'timestamp', 'metadata',
+    )),
+}
+
+
+def archive_dir():
+    return getattr(settings, 'AUDIT_ARCHIVE_DIR', os.path.join(settings.BASE_DIR, 'audit_archive'))
+
+
+def retention_days():
+    """AUDIT_RETENTION_DAYS; independent of backup.retentionDays, which only prunes backups"""
+    return getattr(settings, 'AUDIT_RETENTION_DAYS', 90)
+
+
+def _archive_path(name, month):
+    return os.path.join(archive_dir(), f'{name}-{month}.ndjson.gz')
+
+
+def _append(path, rows):
+    """Append rows as a new gzip member; readers see members concatenated"""
+    with gzip.open(path, 'at', encoding='utf-8') as archive:
+        for row in rows:
+            archive.write(json.dumps(row, cls=DjangoJSONEncoder) + '\n')
+    with open(path, 'rb') as f:
+        os.fsync(f.fileno())
+
+
+def archive_old_rows(days=None, chunk_size=None, dry_run=False):
+    """
+    Move audit rows older than `days` into monthly gzip NDJSON files.
+
+    Each chunk is appended and fsync'd before its rows are deleted, so a crash
+    can only duplicate rows in the archive (readers drop duplicate ids), never
+    lose them. Returns {model name: rows archived}.
+    """
+    days = retention_days() if days is None else days
+    chunk_size = chunk_size or getattr(settings, 'AUDIT_ARCHIVE_CHUNK_SIZE', 1000)
+    cutoff = timezone.now() - timedelta(days=days)
+    os.makedirs(archive_dir(), exist_ok=True)
+
+    moved = {}
+    for name, (model, columns) in ARCHIVED_MODELS.items():
+        stale = model.objects.filter(timestamp__lt=cutoff)
+        if dry_run:
+            moved[name] = stale.count()
+            continue
+
+        moved[name] = 0
+        while True:
+            rows = list(stale.order_by('timestamp', 'id').values(*columns)[:chunk_size])
+            if not rows:
+                break
+
+            by_month = {}
+            for row in rows:
+                month = row['timestamp'].astimezone(dt_timezone.utc).strftime('%Y-%m')
+                by_month.setdefault(month, []).append(row)
+            for month, month_rows in by_month.items():
+                _append(_archive_path(name, month), month_rows)
+
+            with transaction.atomic():
+                model.objects.filter(id__in=[row['id'] for row in rows]).delete()
+            moved[name] += len(rows)
+
+        logger.info(f"Archived {moved[name]} {name} rows older than {cutoff:%Y-%m-%d}")
+    return moved
+
+
+def _read_archive(name, start, end):
+    """
+    Archived rows of one model in [start, end), newest first.
+
+    Files are split by UTC month, the timezone rows are stored in, so they
+    are read newest month first and only one month is held in memory; month
+    files outside the range are skipped.
+    """
+    first = start.astimezone(dt_timezone.utc).strftime('%Y-%m') if start is not None else None
+    last = end.astimezone(dt_timezone.utc).strftime('%Y-%m') if end is not None else None
+    seen = set()
+    for path in sorted(glob.glob(_archive_path(name, '*')), reverse=True):
+        month = os.path.basename(path)[len(name) + 1:len(name) + 8]
+        if (first and month < first) or (last and month > last):
+            continue
+        rows = []
+        with gzip.open(path, 'rt', encoding='utf-8') as archive:
+            for line in archive:
+                row = json.loads(line)
+                if row['id'] in seen:
+                    continue
+                seen.add(row['id'])
+                row['timestamp'] = parse_datetime(row['timestamp'])
+                if (start is None or row['timestamp'] >= start) and (end is None or row['timestamp'] < end):
+                    rows.append(row)
+        rows.sort(key=lambda row: row['timestamp'], reverse=True)
+        yield from rows
+
+
+def audit_rows(name, start=None, end=None, limit=None, **filters):
+    """
+    Audit rows of one model in [start, end), newest first, from the table and the archives.
+
+    Rows have the ARCHIVED_MODELS columns whichever side they come from.
+    `filters` are exact matches on those columns. Only the monthly archive
+    files overlapping the range are opened, and none once `limit` rows
+    have been found.
+    """
+    model, columns = ARCHIVED_MODELS[name]
+    hot = model.objects.filter(**filters)
+    if start is not None:
+        hot = hot.filter(timestamp__gte=start)
+    if end is not None:
+        hot = hot.filter(timestamp__lt=end)
+    hot = hot.order_by('-timestamp').values(*columns)
+    rows = list(hot[:limit] if limit else hot)
+
+    if limit is None or len(rows) < limit:
+        hot_ids = {row['id'] for row in rows}
+        for row in _read_archive(name, start, end):
+            if row['id'] in hot_ids or any(row.get(key) != value for key, value in filters.items()):
+                continue
+            rows.append(row)
+            if limit and len(rows) >= limit:
+                break
+    return rows
@@ -0,0 +1,186 @@
+"""
+Read replica routing.
+
+Writes and, by default, reads go to 'default'. Views decorated with
+@read_replica (heavy admin listings, analytics, exports) read from the
+'replica' alias when it is configured, except:
+
+    - after the request itself wrote: the rest of it reads the primary
+    - for sticky_seconds() after a user's write, so users see their own
+      changes (tracked in the REPLICA_STICKY_CACHE_ALIAS cache)
+    - for every signed-in user when that cache is per process and there
+      are several workers: a pin set by one worker would not reach the
+      others, so read-your-writes could not be kept
+    - while the replica lags more than REPLICA_MAX_LAG_SECONDS, re-measured
+      at most every REPLICA_LAG_CHECK_SECONDS
+
+Locally, point SQLITE_REPLICA_PATH at a second SQLite file and keep it in
+step with `manage.py sync_sqlite_replica`.
+"""
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DatabaseError, connections
+from contextlib import contextmanager
+from functools import wraps
+import logging
+import os
+import threading
+import time
+
+from .checks import worker_count
+from .ratelimit import is_shared_cache
+
+logger = logging.getLogger(__name__)
+
+REPLICA = 'replica'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_state = threading.local()
+_lag = {'seconds': 0.0, 'checked': 0.0}
+_lag_lock = threading.Lock()
+
+
+def replica_configured():
+    return REPLICA in settings.DATABASES
+
+
+def _sqlite_mtime(path):
+    """Last change of a SQLite database, including commits still in its WAL"""
+    return max((os.path.getmtime(p) for p in (path, f'{path}-wal') if os.path.exists(p)), default=0.0)
+
+
+def measure_lag():
+    """Seconds the replica is behind the primary"""
+    replica = connections[REPLICA]
+    if replica.vendor == 'postgresql':
+        with replica.cursor() as cursor:
+            # An idle primary ages the replay timestamp without any lag
+            cursor.execute(
+                "SELECT CASE WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() "
+                "THEN 0 ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+            )
+            return float(cursor.fetchone()[0] or 0)
+    if replica.vendor == 'sqlite':
+        primary_name = str(connections['default'].settings_dict['NAME'])
+        replica_name = str(replica.settings_dict['NAME'])
+        if not os.path.exists(replica_name):
+            return float('inf')
+        primary, synced = _sqlite_mtime(primary_name), _sqlite_mtime(replica_name)
+        return 0.0 if primary <= synced else time.time() - synced
+    return 0.0
+
+
+def replica_lag():
+    """measure_lag(), cached per process; infinite when the replica can't be reached"""
+    now = time.monotonic()
+    if now - _lag['checked'] >= getattr(settings, 'REPLICA_LAG_CHECK_SECONDS', 5):
+        with _lag_lock:
+            if now - _lag['checked'] >= getattr(settings, 'REPLICA_LAG_CHECK_SECONDS', 5):
+                try:
+                    _lag['seconds'] = measure_lag()
+                except (DatabaseError, OSError):
+                    logger.warning("Replica lag check failed, reading from the primary", exc_info=True)
+                    _lag['seconds'] = float('inf')
+                _lag['checked'] = now
+    return _lag['seconds']
+
+
+def _sticky_alias():
+    return getattr(settings, 'REPLICA_STICKY_CACHE_ALIAS', 'default')
+
+
+def _sticky_cache():
+    return caches[_sticky_alias()]
+
+
+def sticky_seconds():
+    """
+    REPLICA_STICKY_SECONDS, but never less than REPLICA_MAX_LAG_SECONDS + REPLICA_LAG_CHECK_SECONDS.
+
+    The replica is used while its last measured lag is under the maximum,
+    and that measurement can be a whole check interval old, so a write
+    may take that long to reach it.
+    """
+    floor = getattr(settings, 'REPLICA_MAX_LAG_SECONDS', 10) + getattr(settings, 'REPLICA_LAG_CHECK_SECONDS', 5)
+    return max(getattr(settings, 'REPLICA_STICKY_SECONDS', None) or 0, floor)
+
+
+def pins_shared():
+    """Whether a pin set by this worker is seen by all of them"""
+    return worker_count() <= 1 or is_shared_cache(_sticky_alias())
+
+
+def _sticky_key(user_id):
+    return f'replica:pin:{user_id}'
+
+
+def pin_to_primary(user_id):
+    _sticky_cache().set(_sticky_key(user_id), True, sticky_seconds())
+
+
+def start_request():
+    _state.wrote = False
+
+
+def request_wrote():
+    return getattr(_state, 'wrote', False)
+
+
+def _same_database():
+    """True when 'replica' points at the primary itself, as a test mirror does"""
+    primary, replica = connections['default'].settings_dict, connections[REPLICA].settings_dict
+    return all(str(primary.get(key)) == str(replica.get(key)) for key in ('ENGINE', 'NAME', 'HOST', 'PORT'))
+
+
+def replica_allowed(user=None):
+    if not replica_configured() or _same_database():
+        return False
+    if user is not None and user.is_authenticated:
+        if not pins_shared() or _sticky_cache().get(_sticky_key(user.pk)):
+            return False
+    return replica_lag() <= getattr(settings, 'REPLICA_MAX_LAG_SECONDS', 10)
+
+
+@contextmanager
+def replica_reads():
+    """Send reads in this block to the replica, until the block writes"""
+    previous = getattr(_state, 'replica', False), getattr(_state, 'wrote', False)
+    _state.replica, _state.wrote = True, False
+    try:
+        yield
+    finally:
+        wrote = _state.wrote
+        _state.replica = previous[0]
+        _state.wrote = previous[1] or wrote
+
+
+def read_replica(view):
+    """Read-only view decorator; place it under @api_view/@permission_classes"""
+    @wraps(view)
+    def wrapped(request, *args, **kwargs):
+        if request.method not in SAFE_METHODS or not replica_allowed(request.user):
+            return view(request, *args, **kwargs)
+        with replica_reads():
+            return view(request, *args, **kwargs)
+    return wrapped
+
+
+class ReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        if getattr(_state, 'replica', False) and not getattr(_state, 'wrote', False):
+            return REPLICA
+        return None
+
+    def db_for_write(self, model, **hints):
+        _state.wrote = True
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Same data on both aliases
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica gets its schema through replication
+        return db != REPLICA
+
@@ -1,6 +1,23 @@
 from rest_framework import serializers
 from .models import User, Student, Faculty, Group, GroupMember, Domain, Topic, GroupSelection
 
+
+class EagerLoadingMixin:
+    """
+    Serializers declare the relations they read; views call setup_eager_loading()
+    on their queryset so serializing N objects costs a constant number of queries.
+    """
+    select_related_fields = ()
+    prefetch_related_fields = ()
+
+    @classmethod
+    def setup_eager_loading(cls, queryset):
+        if cls.select_related_fields:
+            queryset = queryset.select_related(*cls.select_related_fields)
+        if cls.prefetch_related_fields:
+            queryset = queryset.prefetch_related(*cls.prefetch_related_fields)
+        return queryset
+
 class StudentSerializer(serializers.ModelSerializer):
     class Meta:
         model = Student
@@ -18,7 +35,10 @@ class GroupMemberSerializer(serializers.ModelSerializer):
         model = GroupMember
         fields = ['id', 'student', 'student_details', 'joined_at']
 
-class GroupSerializer(serializers.ModelSerializer):
+class GroupSerializer(EagerLoadingMixin, serializers.ModelSerializer):
+    select_related_fields = ('group_leader', 'selection__faculty', 'selection__domain', 'selection__topic')
+    prefetch_related_fields = ('members__student',)
+
     group_leader_details = StudentSerializer(source='group_leader', read_only=True)
     members = serializers.SerializerMethodField()
     selection_info = serializers.SerializerMethodField()
@@ -29,7 +49,11 @@ class GroupSerializer(serializers.ModelSerializer):
                   'size', 'created_at', 'is_complete', 'members', 'selection', 'selection_info']
     
     def get_members(self, obj):
-        members = GroupMember.objects.filter(group=obj).select_related('student__user')
+        # Reuse the prefetched members when the view declared the plan
+        if 'members' in getattr(obj, '_prefetched_objects_cache', {}):
+            members = obj.members.all()
+        else:
+            members = obj.members.select_related('student')
         return GroupMemberSerializer(members, many=True).data
     
     def get_selection_info(self, obj):
@@ -48,14 +72,19 @@ class DomainSerializer(serializers.ModelSerializer):
         model = Domain
         fields = ['id', 'name', 'description']
 
-class TopicSerializer(serializers.ModelSerializer):
+class TopicSerializer(EagerLoadingMixin, serializers.ModelSerializer):
+    select_related_fields = ('domain',)
+
     domain_name = serializers.CharField(source='domain.name', read_only=True)
     
     class Meta:
         model = Topic
         fields = ['id', 'name', 'domain', 'domain_name', 'description', 'max_groups', 'current_groups', 'is_available']
 
-class GroupSelectionSerializer(serializers.ModelSerializer):
+class GroupSelectionSerializer(EagerLoadingMixin, serializers.ModelSerializer):
+    select_related_fields = ('group__group_leader', 'faculty', 'domain', 'topic__domain')
+    prefetch_related_fields = ('group__members__student',)
+
     group_details = GroupSerializer(source='group', read_only=True)
     faculty_details = FacultySerializer(source='faculty', read_only=True)
     domain_details = DomainSerializer(source='domain', read_only=True)
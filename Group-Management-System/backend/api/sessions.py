@@ -0,0 +1,170 @@
+"""
+Cache-first session engine with write-behind to the database.
+
+Reads are served from SESSION_CACHE_ALIAS and only fall back to the
+django_session table on a miss. New sessions are inserted synchronously
+(so keys stay unique), while updates to existing sessions are written to
+the cache immediately and flushed to the database by a background thread
+every SESSION_WRITE_BEHIND_SECONDS, coalescing repeated writes to the same
+session. Set SESSION_WRITE_BEHIND_SECONDS = 0 to write through instead.
+
+The cache is only used when SESSION_CACHE_ALIAS is shared by all workers
+(api.ratelimit.is_shared_cache). With a process-local cache a logout in
+one worker would leave the session valid in the others' caches, so the
+store then reads, writes and deletes straight through the database.
+
+Use with SESSION_ENGINE = 'api.sessions'.
+"""
+from django.conf import settings
+from django.contrib.sessions.backends.cached_db import SessionStore as CachedDBStore
+from django.contrib.sessions.backends.db import SessionStore as DBStore
+from django.db import close_old_connections, connections, transaction
+from django.utils import timezone
+import atexit
+import logging
+import threading
+
+from .ratelimit import is_shared_cache
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'api.sessions'
+
+
+class _WriteBehindQueue:
+    """Latest pending (session_data, expire_date) per session key, flushed in one transaction"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.wakeup = threading.Event()
+        self.thread = None
+
+    def put(self, model, session_key, session_data, expire_date):
+        with self.lock:
+            self.pending[session_key] = (model, session_data, expire_date)
+        self._ensure_thread()
+
+    def get(self, session_key):
+        with self.lock:
+            return self.pending.get(session_key)
+
+    def discard(self, session_key):
+        with self.lock:
+            self.pending.pop(session_key, None)
+
+    def flush(self):
+        with self.lock:
+            batch, self.pending = self.pending, {}
+        if not batch:
+            return 0
+
+        try:
+            with transaction.atomic():
+                for session_key, (model, session_data, expire_date) in batch.items():
+                    # Only update: a session deleted meanwhile must not come back
+                    model.objects.filter(session_key=session_key).update(
+                        session_data=session_data, expire_date=expire_date
+                    )
+        except Exception:
+            logger.exception(f"Session write-behind failed, requeueing {len(batch)} sessions")
+            with self.lock:
+                for session_key, value in batch.items():
+                    self.pending.setdefault(session_key, value)
+            return 0
+        return len(batch)
+
+    def _ensure_thread(self):
+        if self.thread is not None and self.thread.is_alive():
+            return
+        with self.lock:
+            if self.thread is not None and self.thread.is_alive():
+                return
+            self.thread = threading.Thread(target=self._run, name='session-write-behind', daemon=True)
+            self.thread.start()
+
+    def _run(self):
+        interval = getattr(settings, 'SESSION_WRITE_BEHIND_SECONDS', 2)
+        while True:
+            self.wakeup.wait(interval)
+            self.wakeup.clear()
+            close_old_connections()
+            self.flush()
+
+
+write_behind = _WriteBehindQueue()
+
+
+@atexit.register
+def _flush_on_exit():
+    try:
+        write_behind.flush()
+    finally:
+        connections.close_all()
+
+
+class SessionStore(CachedDBStore):
+    cache_key_prefix = KEY_PREFIX
+
+    @staticmethod
+    def cache_enabled():
+        return is_shared_cache(settings.SESSION_CACHE_ALIAS)
+
+    def load(self):
+        if not self.cache_enabled():
+            return DBStore.load(self)
+        try:
+            data = self._cache.get(self.cache_key)
+        except Exception:
+            data = None
+        if data is not None:
+            return data
+
+        # The row decides whether the session still exists: a logout in
+        # another worker deletes it even while an update is queued here
+        s = self._get_session_from_db()
+        if not s:
+            return {}
+        pending = write_behind.get(self.session_key)
+        data = self.decode(pending[1] if pending is not None else s.session_data)
+        self._cache.set(self.cache_key, data, self.get_expiry_age(expiry=s.expire_date))
+        return data
+
+    def exists(self, session_key):
+        if not self.cache_enabled():
+            return DBStore.exists(self, session_key)
+        return super().exists(session_key)
+
+    def save(self, must_create=False):
+        if not self.cache_enabled():
+            return DBStore.save(self, must_create)
+        if self.session_key is None or must_create or not getattr(settings, 'SESSION_WRITE_BEHIND_SECONDS', 2):
+            return super().save(must_create)
+
+        data = self._get_session(no_load=must_create)
+        self._cache.set(self.cache_key, data, self.get_expiry_age())
+        write_behind.put(self.model, self.session_key, self.encode(data), self.get_expiry_date())
+
+    def delete(self, session_key=None):
+        write_behind.discard(session_key or self.session_key)
+        if not self.cache_enabled():
+            return DBStore.delete(self, session_key)
+        super().delete(session_key)
+
+    @classmethod
+    def clear_expired(cls, batch_size=None):
+        """Delete expired rows in small batches so the table is never locked for long"""
+        batch_size = batch_size or getattr(settings, 'SESSION_CLEANUP_BATCH_SIZE', 1000)
+        model = cls.get_model_class()
+        deleted = 0
+        while True:
+            keys = list(
+                model.objects.filter(expire_date__lt=timezone.now())
+                .values_list('session_key', flat=True)[:batch_size]
+            )
+            if not keys:
+                break
+            model.objects.filter(session_key__in=keys).delete()
+            deleted += len(keys)
+        logger.info(f"Cleared {deleted} expired sessions")
+        return deleted
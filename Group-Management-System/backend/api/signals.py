@@ -0,0 +1,59 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .analytics import record_activity_on_commit
+from .invalidation import CATALOG, SELECTIONS, STUDENTS, bus
+from .models import AdminLoginLog, Domain, Faculty, Group, GroupSelection, RecoveryLog, Student, Topic
+from .ratelimit import admin_lockout_limiter
+
+
+@receiver(post_save, sender=AdminLoginLog)
+def rollup_login(sender, instance, created, **kwargs):
+    if created:
+        record_activity_on_commit(instance.timestamp, logins=1, successful_logins=int(instance.success))
+
+
+@receiver(post_save, sender=AdminLoginLog)
+def count_failed_login(sender, instance, created, **kwargs):
+    if created and not instance.success:
+        admin_lockout_limiter().hit(instance.ip_address, instance.timestamp.timestamp())
+
+
+@receiver(post_save, sender=Group)
+def rollup_group_creation(sender, instance, created, **kwargs):
+    if created:
+        record_activity_on_commit(instance.created_at, group_creations=1)
+
+
+@receiver(post_save, sender=GroupSelection)
+def rollup_selection(sender, instance, created, **kwargs):
+    if created:
+        record_activity_on_commit(instance.selected_at, selections=1)
+
+
+@receiver(post_save, sender=RecoveryLog)
+def rollup_recovery(sender, instance, created, **kwargs):
+    if created:
+        record_activity_on_commit(instance.timestamp, recoveries=1, failed_recoveries=int(not instance.success))
+
+
+@receiver(post_save, sender=Domain)
+@receiver(post_delete, sender=Domain)
+@receiver(post_save, sender=Topic)
+@receiver(post_delete, sender=Topic)
+@receiver(post_save, sender=Faculty)
+@receiver(post_delete, sender=Faculty)
+def invalidate_catalog(sender, **kwargs):
+    bus.bump(CATALOG)
+
+
+@receiver(post_save, sender=GroupSelection)
+@receiver(post_delete, sender=GroupSelection)
+def invalidate_selections(sender, **kwargs):
+    bus.bump(SELECTIONS)
+
+
+@receiver(post_save, sender=Student)
+@receiver(post_delete, sender=Student)
+def invalidate_students(sender, **kwargs):
+    bus.bump(STUDENTS)
@@ -0,0 +1,27 @@
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    SQLite backend that can start a transaction with BEGIN IMMEDIATE.
+
+    Django's BEGIN is deferred: the write lock is taken at the first write.
+    Two transactions that read first and then write (the FCFS selection
+    checks the counts, then increments them) can then never both upgrade,
+    and SQLite fails one at once with "database is locked" instead of
+    waiting out busy_timeout. IMMEDIATE takes the write lock at BEGIN, so
+    writers queue on busy_timeout, and select_for_update, which SQLite
+    ignores, is backed by a real lock.
+
+    Only transactions opened by api.transactions.write_transaction() are
+    IMMEDIATE. A plain atomic() stays DEFERRED, so read-only transactions
+    (dumps, reports) never queue behind writers in WAL mode.
+    """
+
+    immediate = False
+
+    def _start_transaction_under_autocommit(self):
+        if self.immediate:
+            self.cursor().execute('BEGIN IMMEDIATE')
+        else:
+            super()._start_transaction_under_autocommit()
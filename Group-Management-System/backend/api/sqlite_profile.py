@@ -0,0 +1,47 @@
+"""
+Connection profile for SQLite deployments, applied on connection_created.
+
+    journal_mode=WAL        readers and the writer no longer block each other
+    busy_timeout            wait for the write lock instead of failing
+    synchronous=NORMAL      fsync at checkpoints rather than every commit;
+                            in WAL mode a power loss can drop the last
+                            commits but not corrupt the database
+    mmap_size, cache_size   keep the hot pages in memory
+    temp_store=MEMORY       sorts and temp indexes off disk
+
+SQLITE_PRAGMAS overrides single entries; a value of None skips the pragma.
+"""
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Applied in this order: busy_timeout first, switching to WAL needs the lock
+DEFAULT_PRAGMAS = {
+    'busy_timeout': 5000,
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,  # negative: KiB, so 64 MiB
+    'temp_store': 'MEMORY',
+}
+
+
+def sqlite_pragmas():
+    pragmas = {**DEFAULT_PRAGMAS, **getattr(settings, 'SQLITE_PRAGMAS', {})}
+    return {name: value for name, value in pragmas.items() if value is not None}
+
+
+def apply_pragmas(conn, pragmas):
+    """Run the pragmas on a DB-API sqlite3 connection"""
+    for name, value in pragmas.items():
+        conn.execute(f'PRAGMA {name} = {value}')
+
+
+@receiver(connection_created)
+def apply_sqlite_profile(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    apply_pragmas(connection.connection, sqlite_pragmas())
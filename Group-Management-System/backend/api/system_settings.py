@@ -0,0 +1,227 @@
+"""
+The super admin's system settings (system_settings.json), cached in-process.
+
+The file is parsed once and re-read only when its mtime, size or inode
+changes, and that is checked at most every SYSTEM_SETTINGS_CHECK_SECONDS,
+so `system_settings.get('features', 'maxGroupSize')` is a dict lookup and
+cheap enough for every request. Values are coerced to the type of their
+default, so a "4" saved by hand still reads as 4.
+
+Writes go to a temp file that is fsync'd and renamed over the original, so
+other workers see the old or the new file, never half of one. They also
+bump the 'settings' version on the invalidation bus, which makes the other
+workers re-check the file without waiting for the next interval.
+"""
+from django.conf import settings
+from contextlib import contextmanager
+from copy import deepcopy
+import fcntl
+import json
+import logging
+import os
+import threading
+import time
+
+from .invalidation import SETTINGS, bus
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SETTINGS = {
+    'general': {
+        'siteName': 'GroupFlow',
+        'siteUrl': 'http://localhost:3000',
+        'adminEmail': 'admin@groupflow.com',
+        'timezone': 'Asia/Kolkata',
+        'dateFormat': 'YYYY-MM-DD',
+        'timeFormat': '24h'
+    },
+    'security': {
+        'sessionTimeout': 30,
+        'maxLoginAttempts': 5,
+        'lockoutDuration': 15,
+        'passwordMinLength': 8,
+        'passwordRequireUppercase': True,
+        'passwordRequireLowercase': True,
+        'passwordRequireNumbers': True,
+        'passwordRequireSpecial': True,
+        'twoFactorRequired': False,
+        'sessionPerUser': True,
+        'ipWhitelist': []
+    },
+    'email': {
+        'smtpHost': 'smtp.gmail.com',
+        'smtpPort': 587,
+        'smtpUser': 'noreply@groupflow.com',
+        'smtpPassword': '',
+        'useTLS': True,
+        'fromEmail': 'noreply@groupflow.com',
+        'fromName': 'GroupFlow System'
+    },
+    'features': {
+        'allowStudentRegistration': True,
+        'allowFacultyRegistration': False,
+        'requireEmailVerification': True,
+        'requirePhoneVerification': False,
+        'maxGroupSize': 4,
+        'minGroupSize': 2,
+        'allowTopicSelection': True,
+        'maxGroupsPerTopic': 3,
+        'maxGroupsPerFaculty': 3
+    },
+    'backup': {
+        'autoBackup': True,
+        'backupFrequency': 'daily',
+        'backupTime': '02:00',
+        'retentionDays': 30,
+        'lastBackup': None
+    },
+    'notifications': {
+        'emailNotifications': True,
+        'smsNotifications': False,
+        'adminAlerts': True,
+        'securityAlerts': True,
+        'backupAlerts': True,
+        'dailyDigest': False
+    }
+}
+
+REQUIRED_SECTIONS = tuple(DEFAULT_SETTINGS)
+
+_MISSING = object()
+
+
+def _coerce(value, default):
+    """value converted to the type of default; the default if it does not convert"""
+    if value is None:
+        return default
+    if default is None:
+        return value
+    try:
+        if isinstance(default, bool):
+            if isinstance(value, str):
+                return value.strip().lower() in ('1', 'true', 'yes', 'on')
+            return bool(value)
+        if isinstance(default, int):
+            return int(value)
+        if isinstance(default, str):
+            return str(value)
+    except (TypeError, ValueError):
+        return default
+    return value if isinstance(value, type(default)) else default
+
+
+class SystemSettings:
+
+    def __init__(self, path=None):
+        self._path = path
+        self.lock = threading.Lock()
+        self.data = None
+        self.typed = {}
+        self.stamp = None
+        self.version = None
+        self.next_check = 0.0
+
+    @property
+    def path(self):
+        return self._path or getattr(settings, 'SYSTEM_SETTINGS_FILE', os.path.join(settings.BASE_DIR, 'system_settings.json'))
+
+    def _stat(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+    def _current(self):
+        """The parsed file, re-read if it changed since the last check"""
+        now = time.monotonic()
+        version = bus.version(SETTINGS)
+        if self.data is not None and now < self.next_check and version == self.version:
+            return self.data
+        with self.lock:
+            self.version = version
+            stamp = self._stat()
+            if self.data is None or stamp != self.stamp:
+                self._load(stamp)
+            self.next_check = now + getattr(settings, 'SYSTEM_SETTINGS_CHECK_SECONDS', 1)
+            return self.data
+
+    def _load(self, stamp):
+        data = None
+        if stamp is not None:
+            try:
+                with open(self.path) as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                logger.exception(f"Could not read {self.path}, using defaults")
+        self.data = data if isinstance(data, dict) else deepcopy(DEFAULT_SETTINGS)
+        self.typed = {}
+        self.stamp = stamp
+
+    def invalidate(self):
+        """Re-check the file on the next read"""
+        self.next_check = 0.0
+
+    def get(self, section, key, default=None):
+        """
+        One value, coerced to the type of its DEFAULT_SETTINGS entry.
+
+        A key missing from the file reads as `default`, or as its
+        DEFAULT_SETTINGS entry when no default is given.
+        """
+        data = self._current()
+        try:
+            value = self.typed[section, key]
+        except KeyError:
+            builtin = DEFAULT_SETTINGS.get(section, {}).get(key)
+            raw = (data.get(section) or {}).get(key)
+            value = _MISSING if raw is None else _coerce(raw, builtin if builtin is not None else default)
+            self.typed[section, key] = value
+        if value is _MISSING:
+            return default if default is not None else DEFAULT_SETTINGS.get(section, {}).get(key)
+        return value
+
+    def section(self, name):
+        return deepcopy(self._current().get(name) or DEFAULT_SETTINGS.get(name, {}))
+
+    def all(self):
+        return deepcopy(self._current())
+
+    def save(self, data):
+        """Replace the whole file atomically"""
+        with self._file_lock():
+            self._write(data)
+
+    def update(self, section, **values):
+        """Change some keys of one section; read-modify-write under a lock shared by all workers"""
+        with self._file_lock():
+            self.invalidate()
+            data = deepcopy(self._current())
+            data.setdefault(section, {}).update(values)
+            self._write(data)
+
+    @contextmanager
+    def _file_lock(self):
+        """Serialises writers across workers; readers never take it"""
+        with open(f'{self.path}.lock', 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _write(self, data):
+        tmp_path = f'{self.path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        bus.bump(SETTINGS)
+        with self.lock:
+            self.data = deepcopy(data)
+            self.typed = {}
+            self.stamp = self._stat()
+
+
+system_settings = SystemSettings()
@@ -1,3 +1,1688 @@
-from django.test import TestCase
+from django.db import DatabaseError, connection
+from django.db.models import F
+from django.http import HttpResponse
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from decimal import Decimal
+from unittest import mock
+import gzip
+import json
+import re
+import time
+import unittest
+import uuid
 
-# Create your tests here.
+from .models import (
+    User, Student, Faculty, Group, GroupMember, Domain, Topic, GroupSelection, AdminLoginLog, RecoveryLog
+)
+
+
+FAST_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+
+def create_selected_group(index, faculty, domain, topic, size=2):
+    """Create a group of `size` students with a selection for faculty/domain/topic"""
+    students = []
+    for m in range(size):
+        roll = f'CS{index:03d}{m}'
+        user = User.objects.create_user(username=roll, password=roll, roll_number=roll, role='student')
+        students.append(Student.objects.create(
+            user=user, roll_number=roll, name=f'Student {roll}', email=f'{roll}@college.edu'
+        ))
+
+    group = Group.objects.create(group_leader=students[0], size=size)
+    for student in students:
+        GroupMember.objects.create(group=group, student=student)
+
+    return GroupSelection.objects.create(group=group, faculty=faculty, domain=domain, topic=topic)
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class FacultyDashboardQueryCountTests(TestCase):
+    def setUp(self):
+        self.domain = Domain.objects.create(name='Machine Learning')
+        self.topic = Topic.objects.create(name='Vision', domain=self.domain, description='', max_groups=50)
+        faculty_user = User.objects.create_user(username='FAC001', password='FAC001', role='faculty')
+        self.faculty = Faculty.objects.create(user=faculty_user, name='Dr. Rao', email='rao@college.edu', max_groups=50)
+
+        self.client = APIClient()
+        self.client.force_authenticate(faculty_user)
+
+    def dashboard_query_count(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(f'/api/faculty-dashboard/{self.faculty.id}/')
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries), response.json()
+
+    def test_query_count_is_constant(self):
+        create_selected_group(0, self.faculty, self.domain, self.topic)
+        baseline, data = self.dashboard_query_count()
+        self.assertEqual(len(data), 1)
+
+        for i in range(1, 6):
+            create_selected_group(i, self.faculty, self.domain, self.topic, size=4)
+        queries, data = self.dashboard_query_count()
+
+        self.assertEqual(len(data), 6)
+        self.assertEqual(queries, baseline)
+
+    def test_payload_uses_prefetched_relations(self):
+        create_selected_group(0, self.faculty, self.domain, self.topic)
+        _, data = self.dashboard_query_count()
+
+        group = data[0]['group_details']
+        self.assertEqual(len(group['members']), 2)
+        self.assertEqual(group['group_leader_details']['roll_number'], 'CS0000')
+        self.assertEqual(group['selection_info']['faculty_name'], 'Dr. Rao')
+        self.assertEqual(data[0]['topic_details']['domain_name'], 'Machine Learning')
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class SelectionQueueTests(TestCase):
+    def setUp(self):
+        self.domain = Domain.objects.create(name='Machine Learning')
+        self.topic = Topic.objects.create(name='Vision', domain=self.domain, description='', max_groups=50)
+        faculty_user = User.objects.create_user(username='FAC001', password='FAC001', role='faculty')
+        self.faculty = Faculty.objects.create(user=faculty_user, name='Dr. Rao', email='rao@college.edu', max_groups=50)
+        self.selections = [create_selected_group(i, self.faculty, self.domain, self.topic) for i in range(5)]
+
+        self.client = APIClient()
+        self.client.force_authenticate(faculty_user)
+
+    def test_queue_position_breaks_ties_by_id(self):
+        from .views import _queue_position
+        GroupSelection.objects.update(submitted_at=timezone.now())
+        queue = GroupSelection.objects.all()
+        positions = [_queue_position(queue, s.submitted_at, s.id) for s in GroupSelection.objects.order_by('id')]
+        self.assertEqual(positions, [1, 2, 3, 4, 5])
+
+    def test_unpaginated_response_keeps_original_shape(self):
+        data = self.client.get('/api/selection-queue/').json()
+        self.assertEqual(data['total'], 5)
+        self.assertEqual(len(data['queue']), 5)
+        self.assertNotIn('page', data)
+        self.assertEqual([row['position'] for row in data['queue']], [1, 2, 3, 4, 5])
+        expected = self.selections[0].submitted_at.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]
+        self.assertEqual(data['queue'][0]['submitted_at'], expected)
+
+    def test_pages_continue_positions(self):
+        first = self.client.get('/api/selection-queue/', {'page_size': 2}).json()
+        last = self.client.get('/api/selection-queue/', {'page': 3, 'page_size': 2}).json()
+        self.assertEqual([row['position'] for row in first['queue']], [1, 2])
+        self.assertTrue(first['has_next'])
+        self.assertEqual(first['total'], 5)
+        self.assertEqual([row['group_id'] for row in last['queue']], [str(self.selections[4].group.group_id)])
+        self.assertEqual(last['queue'][0]['position'], 5)
+        self.assertFalse(last['has_next'])
+
+    def test_timestamps_have_one_format_in_every_mode(self):
+        expected = self.selections[4].submitted_at.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]
+        page = self.client.get('/api/selection-queue/', {'page': 3, 'page_size': 2}).json()
+        self.assertEqual(page['queue'][0]['submitted_at'], expected)
+        group_id = self.selections[4].group.group_id
+        position = self.client.get(f'/api/selection-queue/position/{group_id}/').json()
+        self.assertEqual(position['submitted_at'], expected)
+
+    def test_group_position_in_the_same_request(self):
+        group_id = self.selections[3].group.group_id
+        data = self.client.get('/api/selection-queue/', {'group_id': group_id}).json()
+        self.assertEqual(data['group_position'], 4)
+        data = self.client.get('/api/selection-queue/', {'group_id': 'missing'}).json()
+        self.assertIsNone(data['group_position'])
+
+    def test_invalid_parameters_are_rejected(self):
+        with self.assertLogs('django.request', 'WARNING'):
+            self.assertEqual(self.client.get('/api/selection-queue/', {'page': 'x'}).status_code, 400)
+            self.assertEqual(self.client.get('/api/selection-queue/', {'faculty_id': 'x'}).status_code, 400)
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class ActivityRollupTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(username='root', password='root', role='super_admin')
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def log_activity(self):
+        AdminLoginLog.objects.create(user=self.admin, ip_address='10.0.0.1', success=True)
+        AdminLoginLog.objects.create(user=self.admin, ip_address='10.0.0.1', success=False)
+        RecoveryLog.objects.create(user=self.admin, method='email', ip_address='10.0.0.1', success=False)
+
+    def rollup_rows(self):
+        from .models import ActivityRollup
+        return sorted(ActivityRollup.objects.values_list(
+            'granularity', 'period_start', 'logins', 'successful_logins', 'recoveries', 'failed_recoveries'
+        ))
+
+    def test_bumps_wait_for_commit(self):
+        from .analytics import rollup_totals
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.log_activity()
+            self.assertEqual(rollup_totals()['logins'], 0)
+        for callback in callbacks:
+            callback()
+        totals = rollup_totals()
+        self.assertEqual((totals['logins'], totals['successful_logins']), (2, 1))
+        self.assertEqual((totals['recoveries'], totals['failed_recoveries']), (1, 1))
+
+    def test_backfill_matches_live_rollups(self):
+        from .analytics import backfill_rollups
+        with self.captureOnCommitCallbacks(execute=True):
+            self.log_activity()
+        live = self.rollup_rows()
+        self.assertEqual(len(live), 2)  # one hourly, one daily bucket
+
+        with self.assertLogs('api.analytics', 'INFO'):
+            backfill_rollups()
+        self.assertEqual(self.rollup_rows(), live)
+
+    @override_settings(AUDIT_RETENTION_DAYS=30)
+    def test_backfill_keeps_days_older_than_the_audit_retention(self):
+        from .analytics import backfill_rollups, rollup_totals
+        from .models import ActivityRollup
+        old = timezone.now() - timezone.timedelta(days=45)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.log_activity()
+        # A login whose raw row archive_old_rows() has already moved out
+        ActivityRollup.objects.create(granularity='day', period_start=old, logins=1, successful_logins=1)
+
+        with self.assertLogs('api.analytics', 'INFO'):
+            backfill_rollups()
+        self.assertEqual(rollup_totals()['logins'], 3)
+        self.assertTrue(ActivityRollup.objects.filter(period_start=old).exists())
+
+    def test_dashboards_read_the_totals(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.log_activity()
+        stats = self.client.get('/api/super-admin/dashboard-stats/').json()
+        self.assertEqual(stats['pendingRecoveries'], 1)
+        analytics = self.client.get('/api/super-admin/analytics/').json()
+        self.assertEqual(analytics['activity']['totalLogins'], 1)
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class HistorySeriesTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(username='root', password='root', role='super_admin')
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_counts_per_bucket(self):
+        from .analytics import history_series
+        day = timezone.datetime(2024, 5, 1, tzinfo=timezone.utc)
+        for hours in (0, 1, 1, 5):
+            AdminLoginLog.objects.create(ip_address='10.0.0.1', success=True, timestamp=day + timezone.timedelta(hours=hours))
+
+        history = history_series(day, day + timezone.timedelta(hours=6), 'hour')
+        self.assertEqual(history['series']['logins'], [1, 2, 0, 0, 0, 1])
+        self.assertEqual(history['stats']['logins']['total'], 4)
+        self.assertEqual(history['stats']['logins']['max'], 2)
+
+    def test_oversized_range_is_rejected_before_building_buckets(self):
+        from . import analytics
+        start = timezone.datetime(1990, 1, 1, tzinfo=timezone.utc)
+        end = timezone.datetime(2030, 1, 1, tzinfo=timezone.utc)
+        with mock.patch.object(analytics.pd, 'period_range') as period_range:
+            with self.assertRaisesRegex(ValueError, 'Range too large'):
+                analytics.history_series(start, end, 'hour')
+        period_range.assert_not_called()
+
+        with self.assertLogs('django.request', 'WARNING'):
+            response = self.client.get('/api/super-admin/analytics/history/', {
+                'start': '1990-01-01', 'end': '2029-12-31', 'granularity': 'minute'
+            })
+        self.assertEqual(response.status_code, 400)
+
+
+class AdminLockoutTests(TestCase):
+    def setUp(self):
+        from django.core.cache import caches
+        from .ratelimit import admin_lockout_limiter
+        caches['ratelimit'].clear()
+        self.limiter = admin_lockout_limiter()
+        self.client = APIClient()
+
+    def lock_out(self, ip):
+        for _ in range(self.limiter.limit):
+            self.limiter.hit(ip)
+
+    def test_client_ip_ignores_forwarded_for_without_proxies(self):
+        from django.test import RequestFactory
+        from .ratelimit import client_ip
+        request = RequestFactory().get('/', REMOTE_ADDR='10.0.0.1', HTTP_X_FORWARDED_FOR='1.2.3.4')
+        with override_settings(REST_FRAMEWORK={'NUM_PROXIES': 0}):
+            self.assertEqual(client_ip(request), '10.0.0.1')
+
+    def test_client_ip_takes_the_entry_added_by_the_proxy(self):
+        from django.test import RequestFactory
+        from .ratelimit import client_ip
+        request = RequestFactory().get('/', REMOTE_ADDR='10.0.0.1', HTTP_X_FORWARDED_FOR='6.6.6.6, 203.0.113.7')
+        with override_settings(REST_FRAMEWORK={'NUM_PROXIES': 1}):
+            self.assertEqual(client_ip(request), '203.0.113.7')
+        with override_settings(REST_FRAMEWORK={'NUM_PROXIES': 5}):
+            self.assertEqual(client_ip(request), '6.6.6.6')
+
+    def test_locked_ip_cannot_dodge_with_forwarded_for(self):
+        self.lock_out('10.0.0.1')
+        with self.assertLogs('django.request', 'WARNING'):
+            response = self.client.get('/api/admin/list/', REMOTE_ADDR='10.0.0.1', HTTP_X_FORWARDED_FOR='1.2.3.4')
+        self.assertEqual(response.status_code, 403)
+        self.assertIn('Too many failed attempts', response.json()['error'])
+
+    def test_forwarded_for_cannot_lock_out_another_ip(self):
+        self.lock_out('203.0.113.7')
+        with self.assertLogs('django.request', 'WARNING'):
+            response = self.client.get('/api/admin/list/', REMOTE_ADDR='10.0.0.2', HTTP_X_FORWARDED_FOR='203.0.113.7')
+        self.assertNotIn('Too many failed attempts', response.content.decode())
+
+    def test_failures_expire_with_the_window(self):
+        now = time.time()
+        for _ in range(self.limiter.limit):
+            self.limiter.hit('10.0.0.3', now=now - self.limiter.window - self.limiter.bucket_seconds)
+        self.assertFalse(self.limiter.is_limited('10.0.0.3', now=now))
+        self.lock_out('10.0.0.3')
+        self.assertTrue(self.limiter.is_limited('10.0.0.3'))
+
+    def test_check_warns_about_per_worker_lockouts(self):
+        from .checks import check_shared_caches
+        with mock.patch.dict('os.environ', {'WEB_CONCURRENCY': '1'}):
+            self.assertEqual(check_shared_caches(None), [])
+        with mock.patch.dict('os.environ', {'WEB_CONCURRENCY': '4'}):
+            self.assertIn('api.W001', [warning.id for warning in check_shared_caches(None)])
+
+
+    def test_check_rejects_a_throttle_cache_without_atomic_add(self):
+        from .checks import check_throttle_cache
+        self.assertEqual(check_throttle_cache(None), [])
+        with override_settings(CACHES=shared_cache_settings('ratelimit', '/tmp/groupflow-ratelimit')):
+            self.assertEqual([warning.id for warning in check_throttle_cache(None)], ['api.W002'])
+
+
+class TokenBucketThrottleTests(TestCase):
+    def setUp(self):
+        from django.core.cache import caches
+        from django.test import RequestFactory
+        from .throttles import IPTokenBucketThrottle
+        caches['ratelimit'].clear()
+
+        class BurstOfFive(IPTokenBucketThrottle):
+            scope = 'test_burst'
+            rate = '5/min'
+
+        self.throttle_class = BurstOfFive
+        self.request = RequestFactory().post('/', REMOTE_ADDR='10.0.0.9')
+
+    def allowed(self):
+        return self.throttle_class().allow_request(self.request, None)
+
+    def test_burst_then_refill(self):
+        with self.assertLogs('api.throttles', 'WARNING') as logs:
+            self.assertEqual([self.allowed() for _ in range(6)], [True] * 5 + [False])
+        self.assertEqual(len(logs.output), 1)
+        throttle = self.throttle_class()
+        with mock.patch.object(throttle, 'timer', return_value=time.time() + 12):
+            self.assertTrue(throttle.allow_request(self.request, None))
+
+    def test_concurrent_requests_do_not_exceed_the_burst(self):
+        import threading
+        barrier = threading.Barrier(20)
+        results = []
+
+        def hit():
+            barrier.wait()
+            results.append(self.allowed())
+
+        from django.core.cache.backends.locmem import LocMemCache
+        original_get = LocMemCache.get
+
+        def slow_get(cache, *args, **kwargs):
+            # Widen the window between reading and refilling a bucket
+            value = original_get(cache, *args, **kwargs)
+            time.sleep(0.002)
+            return value
+
+        threads = [threading.Thread(target=hit) for _ in range(20)]
+        with mock.patch.object(LocMemCache, 'get', slow_get), self.assertLogs('api.throttles', 'WARNING'):
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(results.count(True), 5)
+
+    def test_contended_lock_throttles(self):
+        from django.core.cache import caches
+        throttle = self.throttle_class()
+        throttle.LOCK_WAIT = 0.01
+        caches['ratelimit'].add(f'{throttle.get_cache_key(self.request, None)}:lock', True, 1)
+        with self.assertLogs('api.throttles', 'WARNING'):
+            self.assertFalse(throttle.allow_request(self.request, None))
+        self.assertEqual(throttle.wait(), 0.01)
+
+    @override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+    def test_admin_login_keeps_the_shared_attempt_limit(self):
+        from rest_framework.test import APIRequestFactory
+        from .views import admin_login_view
+        for _ in range(11):
+            AdminLoginLog.objects.create(ip_address='10.0.0.8', success=False)
+        request = APIRequestFactory().post('/', {'username': 'x', 'password': 'y'}, REMOTE_ADDR='10.0.0.8')
+        self.assertEqual(admin_login_view(request).status_code, 429)
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class BackupCodeTests(TestCase):
+    def setUp(self):
+        from django.core.cache import caches
+        caches['ratelimit'].clear()
+        patcher = mock.patch.object(User, 'BACKUP_CODE_ITERATIONS', 10)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = User.objects.create_user(username='admin1', password='admin1', role='admin')
+        self.user.set_backup_codes(['AAAA-1111', 'BBBB-2222', 'CCCC-3333'])
+        self.user.save()
+
+    def test_code_is_consumed_once(self):
+        self.assertTrue(self.user.verify_backup_code('BBBB-2222'))
+        self.assertEqual(len(User.objects.get(pk=self.user.pk).backup_codes), 2)
+        self.assertFalse(self.user.verify_backup_code('BBBB-2222'))
+
+    def test_wrong_guess_runs_no_slow_hash(self):
+        with mock.patch.object(User, '_hash_backup_code', wraps=User._hash_backup_code) as slow_hash:
+            self.assertFalse(self.user.verify_backup_code('ZZZZ-9999'))
+            self.assertEqual(slow_hash.call_count, 0)
+            self.assertTrue(self.user.verify_backup_code('AAAA-1111'))
+            self.assertEqual(slow_hash.call_count, 1)
+
+    def test_concurrent_consumer_is_detected(self):
+        stale = User.objects.get(pk=self.user.pk)
+        self.assertTrue(self.user.verify_backup_code('AAAA-1111'))
+        # stale still holds the code the other request consumed
+        self.assertFalse(stale.verify_backup_code('AAAA-1111'))
+        self.assertTrue(stale.verify_backup_code('CCCC-3333'))
+        self.assertEqual(len(User.objects.get(pk=self.user.pk).backup_codes), 1)
+
+    def test_legacy_codes_verify_and_their_scans_are_capped(self):
+        salt = 'ab' * 32
+        self.user.backup_codes = [f"{salt}${User._hash_backup_code('LEGACY-01', salt)}"]
+        self.user.save()
+        limit = User.legacy_backup_code_limiter().limit
+
+        with mock.patch.object(User, '_hash_backup_code', wraps=User._hash_backup_code) as slow_hash:
+            for _ in range(limit + 3):
+                self.assertFalse(self.user.verify_backup_code('WRONG'))
+            self.assertEqual(slow_hash.call_count, limit)
+        self.assertFalse(self.user.verify_backup_code('LEGACY-01'))
+
+        from django.core.cache import caches
+        caches['ratelimit'].clear()
+        self.assertTrue(self.user.verify_backup_code('LEGACY-01'))
+
+
+def shared_cache_settings(alias, location):
+    """settings.CACHES with `alias` on a file-based cache, i.e. shared by all workers"""
+    from django.conf import settings
+    caches = {name: dict(config) for name, config in settings.CACHES.items()}
+    caches[alias] = {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': location}
+    return caches
+
+
+class CachedSessionTests(TestCase):
+    def setUp(self):
+        from .sessions import write_behind
+        self.addCleanup(write_behind.pending.clear)
+
+    def new_session(self):
+        from .sessions import SessionStore
+        session = SessionStore()
+        session['user'] = 1
+        session.create()
+        return session.session_key
+
+    def test_process_local_cache_reads_through_the_database(self):
+        from .sessions import SessionStore
+        key = self.new_session()
+        self.assertEqual(SessionStore(key).load(), {'user': 1})
+        # Logout handled by another worker
+        SessionStore(key).delete()
+        self.assertEqual(SessionStore(key).load(), {})
+
+    def test_process_local_cache_writes_through(self):
+        from django.contrib.sessions.models import Session
+        from .sessions import SessionStore, write_behind
+        key = self.new_session()
+        session = SessionStore(key)
+        session['user'] = 2
+        session.save()
+        self.assertEqual(write_behind.get(key), None)
+        self.assertEqual(Session.objects.get(session_key=key).get_decoded(), {'user': 2})
+
+    def test_shared_cache_writes_behind_and_logout_wins(self):
+        from django.contrib.sessions.models import Session
+        from django.core.cache import caches
+        import tempfile
+        from .sessions import SessionStore, write_behind
+
+        with tempfile.TemporaryDirectory() as location, \
+                override_settings(CACHES=shared_cache_settings('sessions', location)):
+            key = self.new_session()
+            session = SessionStore(key)
+            session['user'] = 3
+            session.save()
+            self.assertEqual(Session.objects.get(session_key=key).get_decoded(), {'user': 1})
+            self.assertEqual(SessionStore(key).load(), {'user': 3})
+
+            # Cache evicted: the queued update still wins over the stale row
+            caches['sessions'].clear()
+            self.assertEqual(SessionStore(key).load(), {'user': 3})
+            self.assertEqual(write_behind.flush(), 1)
+            self.assertEqual(Session.objects.get(session_key=key).get_decoded(), {'user': 3})
+
+            # Logout in another worker while this one has an update queued
+            session['user'] = 4
+            session.save()
+            Session.objects.filter(session_key=key).delete()
+            caches['sessions'].clear()
+            self.assertEqual(SessionStore(key).load(), {})
+            write_behind.flush()
+            self.assertFalse(Session.objects.filter(session_key=key).exists())
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class SignedTokenTests(TestCase):
+    def setUp(self):
+        from . import tokens
+        self.tokens = tokens
+        self.user = User.objects.create_user(username='CS0001', password='CS0001', role='student', roll_number='CS0001')
+        self.addCleanup(tokens.denylist.entries.clear)
+
+    def other_worker(self):
+        """Forget this process's denylist, as a fresh worker would"""
+        self.tokens.denylist.entries.clear()
+
+    def test_access_token_authenticates_with_one_query(self):
+        pair = self.tokens.issue_tokens(self.user)
+        with self.assertNumQueries(1):
+            user, claims = self.tokens.SignedTokenAuthentication().authenticate(
+                mock.Mock(META={'HTTP_AUTHORIZATION': f"Bearer {pair['access']}"})
+            )
+        self.assertEqual((user.pk, user.role), (self.user.pk, 'student'))
+        with self.assertRaises(self.tokens.TokenError):
+            self.tokens.decode_token(pair['access'], 'refresh')
+
+    def test_saving_request_user_keeps_values_changed_after_login(self):
+        pair = self.tokens.issue_tokens(self.user)
+        User.objects.filter(pk=self.user.pk).update(is_group_leader=True)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {pair['access']}")
+        response = client.post('/api/change-password/', {'new_password': 'Xk93!pqLm2'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.is_group_leader)
+        self.assertTrue(self.user.check_password('Xk93!pqLm2'))
+
+    def test_password_change_revokes_existing_tokens(self):
+        pair = self.tokens.issue_tokens(self.user)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {pair['access']}")
+        response = client.post('/api/change-password/', {'new_password': 'Xk93!pqLm2'}, format='json')
+        fresh = response.json()['tokens']
+
+        self.other_worker()
+        with self.assertLogs('django.request', 'WARNING'):
+            response = APIClient().post('/api/token/refresh/', {'refresh': pair['refresh']}, format='json')
+        self.assertEqual(response.status_code, 401)
+        with self.assertLogs('django.request', 'WARNING'):
+            self.assertEqual(client.post('/api/change-password/', {'new_password': 'Xk93!pqLm2'}).status_code, 401)
+        # A reset with another password ends the session issued by the change too
+        self.user.refresh_from_db()
+        self.user.set_password('Other!pass77')
+        self.user.save()
+        with self.assertRaisesRegex(self.tokens.TokenError, 'Password'):
+            self.tokens.refresh_tokens(fresh['refresh'])
+
+    def test_rotation_does_not_extend_the_login(self):
+        with mock.patch('api.tokens.time.time', return_value=1_000_000):
+            pair = self.tokens.issue_tokens(self.user)
+        from django.conf import settings
+        lifetime = settings.REFRESH_TOKEN_LIFETIME
+        with mock.patch('api.tokens.time.time', return_value=1_000_000 + lifetime - 60):
+            _, rotated = self.tokens.refresh_tokens(pair['refresh'])
+            claims = self.tokens.decode_token(rotated['refresh'], 'refresh')
+        self.assertEqual(claims['exp'], 1_000_000 + lifetime)
+        self.assertEqual(claims['auth_time'], 1_000_000)
+
+    def test_rotated_refresh_token_is_refused_in_every_worker(self):
+        pair = self.tokens.issue_tokens(self.user)
+        _, rotated = self.tokens.refresh_tokens(pair['refresh'])
+        self.other_worker()
+        with self.assertRaisesRegex(self.tokens.TokenError, 'revoked'):
+            self.tokens.refresh_tokens(pair['refresh'])
+        # The replay ends the whole login, including the newer token
+        self.other_worker()
+        with self.assertRaisesRegex(self.tokens.TokenError, 'revoked'):
+            self.tokens.refresh_tokens(rotated['refresh'])
+
+    def test_logout_revokes_refresh_tokens_in_every_worker(self):
+        pair = self.tokens.issue_tokens(self.user)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {pair['access']}")
+        self.assertEqual(client.post('/api/logout/').status_code, 200)
+
+        self.other_worker()
+        with self.assertLogs('django.request', 'WARNING'):
+            response = APIClient().post('/api/token/refresh/', {'refresh': pair['refresh']}, format='json')
+        self.assertEqual(response.status_code, 401)
+
+    def test_refresh_view_rotates(self):
+        pair = self.tokens.issue_tokens(self.user)
+        response = APIClient().post('/api/token/refresh/', {'refresh': pair['refresh']}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.json()['tokens']['refresh'], pair['refresh'])
+
+    def test_expired_revocations_are_purged(self):
+        from .models import RevokedToken
+        RevokedToken.objects.create(token_id='old', expires_at=timezone.now() - timezone.timedelta(seconds=1))
+        RevokedToken.objects.create(token_id='live', expires_at=timezone.now() + timezone.timedelta(hours=1))
+        with mock.patch.object(self.tokens, '_next_purge', [0.0]):
+            self.assertEqual(self.tokens.purge_revoked_tokens(), 1)
+        self.assertEqual(list(RevokedToken.objects.values_list('token_id', flat=True)), ['live'])
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS, EMAIL_OUTBOX_ASYNC=True, FRONTEND_URL='https://groupflow.college.edu/')
+class PasswordResetLinkTests(TestCase):
+    def test_link_points_at_the_frontend_url(self):
+        from django.core.cache import caches
+        from .models import OutboxEmail
+        caches['ratelimit'].clear()
+        user = User.objects.create_user(username='CS0001', password='CS0001', role='student', email='cs0001@college.edu')
+        response = APIClient().post('/api/forgot-password/', {'username_or_email': 'CS0001'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(f'https://groupflow.college.edu/reset-password/{user.id}/', OutboxEmail.objects.get().body)
+
+
+@override_settings(EMAIL_OUTBOX_ASYNC=True, EMAIL_OUTBOX_MAX_ATTEMPTS=2)
+class OutboxTests(TestCase):
+    def queue(self, n=1):
+        from .mailer import enqueue_email
+        return [enqueue_email('Your OTP', f'Code {i}', [f'user{i}@college.edu']) for i in range(n)]
+
+    def test_claims_do_not_overlap_and_leases_expire(self):
+        from .mailer import _claim
+        from .models import OutboxEmail
+        self.queue(3)
+        first, second = _claim(2), _claim(2)
+        self.assertEqual(len(first), 2)
+        self.assertEqual(len(second), 1)
+        self.assertFalse({e.pk for e in first} & {e.pk for e in second})
+        self.assertEqual(_claim(10), [])
+
+        # A sender that died holding its claims: they come back after the lease
+        OutboxEmail.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(len(_claim(10)), 3)
+
+    def test_send_clears_the_body(self):
+        from django.core import mail
+        from .mailer import drain
+        from .models import OutboxEmail
+        self.queue(2)
+        with self.assertLogs('api.mailer', 'INFO') as logs:
+            self.assertEqual(drain(), (2, 0))
+        self.assertIn('Outbox: sent 2, failed 0', logs.output[-1])
+        self.assertEqual(sorted(m.body for m in mail.outbox), ['Code 0', 'Code 1'])
+        self.assertEqual(set(OutboxEmail.objects.values_list('status', 'body')), {('sent', '')})
+
+    def test_failures_back_off_then_give_up(self):
+        from .mailer import send_pending
+        from .models import OutboxEmail
+        [email] = self.queue()
+        broken = mock.Mock()  # opens and closes fine; sending fails below
+
+        with mock.patch('django.core.mail.message.EmailMessage.send', side_effect=OSError('SMTP down')), \
+                self.assertLogs('api.mailer', 'WARNING'):
+            self.assertEqual(send_pending(connection=broken), (0, 1))
+            email.refresh_from_db()
+            self.assertEqual((email.status, email.attempts, email.last_error), ('pending', 1, 'SMTP down'))
+            self.assertGreater(email.next_attempt_at, timezone.now())
+            self.assertEqual(send_pending(connection=broken), (0, 0))  # not due yet
+
+            OutboxEmail.objects.update(next_attempt_at=timezone.now())
+            self.assertEqual(send_pending(connection=broken), (0, 1))
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), ('failed', 2))
+
+    def test_purge_by_retention(self):
+        from .mailer import purge_outbox
+        from .models import OutboxEmail
+        old = timezone.now() - timezone.timedelta(days=40)
+        sent, failed, recent = self.queue(3)
+        OutboxEmail.objects.filter(pk=sent.pk).update(status='sent', sent_at=old)
+        OutboxEmail.objects.filter(pk=failed.pk).update(status='failed', created_at=old)
+        OutboxEmail.objects.filter(pk=recent.pk).update(status='failed')
+        with self.assertLogs('api.mailer', 'INFO'):
+            self.assertEqual(purge_outbox(), (1, 1))
+        self.assertEqual(list(OutboxEmail.objects.values_list('pk', flat=True)), [recent.pk])
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS, OTP_MAX_ATTEMPTS=3)
+class OTPStoreTests(TestCase):
+    def setUp(self):
+        from .otp_utils import OTPStore
+        self.store = OTPStore()
+        self.user = User.objects.create_user(username='CS0001', password='CS0001', role='student')
+
+    def test_default_store_is_the_database(self):
+        from .models import OTPCode
+        otp = self.store.issue(self.user.pk, 'password_reset')
+        self.assertTrue(OTPCode.objects.filter(user=self.user, purpose='password_reset').exists())
+        self.assertTrue(self.store.verify(self.user.pk, 'password_reset', otp))
+        self.assertFalse(self.store.verify(self.user.pk, 'password_reset', otp))  # single use
+
+    def test_code_dies_after_max_attempts(self):
+        otp = self.store.issue(self.user.pk, 'password_reset')
+        wrong = '0' * 6 if otp != '0' * 6 else '1' * 6
+        for _ in range(3):
+            self.assertFalse(self.store.verify(self.user.pk, 'password_reset', wrong))
+        self.assertFalse(self.store.verify(self.user.pk, 'password_reset', otp))
+
+    def test_expired_code_is_refused(self):
+        from .models import OTPCode
+        otp = self.store.issue(self.user.pk, 'password_reset')
+        OTPCode.objects.update(expires_at=timezone.now())
+        self.assertFalse(self.store.verify(self.user.pk, 'password_reset', otp))
+
+    @override_settings(OTP_STORE='cache')
+    def test_process_local_cache_is_not_used(self):
+        from .models import OTPCode
+        with self.assertLogs('api.otp_utils', 'WARNING'):
+            self.assertIsNone(self.store.primary)
+        self.store.issue(self.user.pk, 'password_reset')
+        self.assertTrue(OTPCode.objects.exists())
+
+    def test_shared_cache_store(self):
+        import tempfile
+        from .models import OTPCode
+        with tempfile.TemporaryDirectory() as location, \
+                override_settings(OTP_STORE='cache', CACHES=shared_cache_settings('default', location)):
+            otp = self.store.issue(self.user.pk, 'password_reset')
+            self.assertFalse(OTPCode.objects.exists())
+            self.assertTrue(self.store.verify(self.user.pk, 'password_reset', otp))
+            self.assertFalse(self.store.verify(self.user.pk, 'password_reset', otp))
+
+
+class AuditSinkTests(TestCase):
+    def setUp(self):
+        import tempfile
+        from .audit import AuditSink
+        self.sink = AuditSink()
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.spool = f'{self.dir.name}/data/audit_spool.ndjson'
+
+    def buffer(self, n, success=False):
+        for i in range(n):
+            self.sink.buffer.append((AdminLoginLog, self.sink._entry(
+                AdminLoginLog, {'ip_address': f'10.0.0.{i + 1}', 'success': success}
+            )))
+
+    def test_flush_writes_rows_and_rollups(self):
+        from .models import ActivityRollup
+        self.buffer(3)
+        self.assertEqual(self.sink.flush(), 3)
+        self.assertEqual(AdminLoginLog.objects.count(), 3)
+        self.assertEqual(ActivityRollup.objects.get(granularity='hour').logins, 3)
+        self.assertEqual(self.sink.flush(), 0)
+
+    def test_any_write_failure_spools_and_replays(self):
+        import os
+        self.buffer(2)
+        with override_settings(AUDIT_SPOOL_PATH=self.spool):
+            # Not a DatabaseError: the batch must still survive
+            with mock.patch.object(self.sink, '_rollup', side_effect=RuntimeError('rollup bug')), \
+                    self.assertLogs('api.audit', 'ERROR'):
+                self.assertEqual(self.sink.flush(), 0)
+            self.assertEqual(AdminLoginLog.objects.count(), 0)
+            with open(self.spool) as spool:
+                self.assertEqual(len(spool.readlines()), 2)
+
+            self.buffer(1, success=True)
+            with self.assertLogs('api.audit', 'INFO') as logs:
+                self.assertEqual(self.sink.flush(), 3)
+            self.assertIn('Replaying 2 spooled audit entries', logs.output[0])
+        self.assertFalse(os.path.exists(self.spool))
+        self.assertEqual(AdminLoginLog.objects.filter(success=True).count(), 1)
+        self.assertEqual(AdminLoginLog.objects.count(), 3)
+
+    def test_spool_path_follows_the_data_dir(self):
+        with self.settings(AUDIT_DATA_DIR=self.dir.name):
+            from django.conf import settings
+            del settings.AUDIT_SPOOL_PATH
+            self.assertEqual(self.sink.spool_path, f'{self.dir.name}/audit_spool.ndjson')
+
+
+class AuditArchiveTests(TestCase):
+    def setUp(self):
+        import tempfile
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        archive_settings = override_settings(AUDIT_ARCHIVE_DIR=directory.name, AUDIT_RETENTION_DAYS=30)
+        archive_settings.enable()
+        self.addCleanup(archive_settings.disable)
+
+        now = timezone.now()
+        self.old = [now - timezone.timedelta(days=days) for days in (100, 95, 40)]
+        for i, timestamp in enumerate(self.old + [now]):
+            AdminLoginLog.objects.create(ip_address=f'10.0.0.{i + 1}', success=bool(i % 2), timestamp=timestamp)
+
+    def test_archived_rows_read_back_newest_first(self):
+        from .retention import archive_old_rows, audit_rows
+        with self.assertLogs('api.retention', 'INFO'):
+            self.assertEqual(archive_old_rows()['adminloginlog'], 3)
+        self.assertEqual(AdminLoginLog.objects.count(), 1)
+
+        rows = audit_rows('adminloginlog')
+        self.assertEqual([row['ip_address'] for row in rows], ['10.0.0.4', '10.0.0.3', '10.0.0.2', '10.0.0.1'])
+        self.assertEqual([row['ip_address'] for row in audit_rows('adminloginlog', success=True)], ['10.0.0.4', '10.0.0.2'])
+        start = self.old[1] - timezone.timedelta(seconds=1)
+        self.assertEqual(len(audit_rows('adminloginlog', start=start, end=self.old[2] - timezone.timedelta(seconds=1))), 1)
+
+    def test_limit_stops_before_older_archives(self):
+        import gzip as gzip_module
+        from .retention import archive_old_rows, audit_rows
+        with self.assertLogs('api.retention', 'INFO'):
+            archive_old_rows()
+        with mock.patch('api.retention.gzip.open', wraps=gzip_module.open) as opened:
+            rows = audit_rows('adminloginlog', limit=2)
+        self.assertEqual([row['ip_address'] for row in rows], ['10.0.0.4', '10.0.0.3'])
+        newest = self.old[2].astimezone(timezone.utc).strftime('%Y-%m')
+        self.assertEqual([call.args[0][-len('YYYY-MM.ndjson.gz'):-len('.ndjson.gz')] for call in opened.call_args_list], [newest])
+
+    def test_retention_is_independent_of_backup_retention(self):
+        from .retention import archive_old_rows, retention_days
+        with mock.patch('api.system_settings.system_settings.get', return_value=1):
+            self.assertEqual(retention_days(), 30)
+            self.assertEqual(archive_old_rows(dry_run=True)['adminloginlog'], 3)
+
+
+class BackupJobTests(TestCase):
+    def setUp(self):
+        import tempfile
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        backup_settings = override_settings(BACKUP_DIR=directory.name, BACKUP_JOB_STALE_SECONDS=60)
+        backup_settings.enable()
+        self.addCleanup(backup_settings.disable)
+
+    def dead_pid(self):
+        import subprocess
+        import sys
+        child = subprocess.Popen([sys.executable, '-c', 'pass'])
+        child.wait()
+        return child.pid
+
+    def test_live_job_blocks_a_second_one(self):
+        from .backups import BackupRunning, create_job, running_job
+        job = create_job('manual')
+        self.assertEqual(running_job()['id'], job.id)
+        with self.assertRaises(BackupRunning) as raised:
+            create_job('scheduled')
+        self.assertEqual(raised.exception.job['id'], job.id)
+
+    def test_job_of_a_dead_worker_is_failed(self):
+        from .backups import create_job, get_job, running_job
+        job = create_job('manual')
+        job.state['owner']['pid'] = self.dead_pid()
+        job.update(status='running')
+        with self.assertLogs('api.backups', 'WARNING'):
+            self.assertIsNone(running_job())
+        state = get_job(job.id)
+        self.assertEqual(state['status'], 'failed')
+        self.assertIn('exited', state['error'])
+        self.assertNotEqual(create_job('manual').id, job.id)
+
+    def test_job_without_heartbeat_is_failed(self):
+        from .backups import _job_path, _write_json, create_job, get_job, running_job
+        job = create_job('manual')
+        state = dict(job.state, status='running', owner={'host': 'elsewhere', 'pid': 1},
+                     heartbeat_at=(timezone.now() - timezone.timedelta(seconds=61)).isoformat())
+        _write_json(_job_path(job.id), state)
+        with self.assertLogs('api.backups', 'WARNING'):
+            self.assertIsNone(running_job())
+        self.assertIn('heartbeat', get_job(job.id)['error'])
+
+    def test_pooled_postgres_engine_uses_pg_dump(self):
+        from django.db.utils import ConnectionHandler
+        from .backups import create_job, run_backup
+        pooled = ConnectionHandler({'default': {'ENGINE': 'api.postgres_backend', 'NAME': 'groupflow', 'USER': 'gf'}})
+        entry = {'type': 'database', 'name': 'db.sql', 'size': 0, 'stored': 0, 'chunks': []}
+        with mock.patch('api.backups.connections', pooled), \
+                mock.patch('api.backups._postgres_backup', return_value=entry) as pg_dump, \
+                mock.patch('api.backups._sqlite_backup') as sqlite_backup, \
+                mock.patch('api.backup_store.ChunkStore.add_backup', side_effect=RuntimeError('stop')):
+            with self.assertRaisesRegex(RuntimeError, 'stop'), self.assertLogs('api.backups', 'ERROR'):
+                run_backup(create_job('manual'))
+        self.assertEqual(pg_dump.call_args.args[1]['NAME'], 'groupflow')
+        sqlite_backup.assert_not_called()
+
+    @override_settings(BACKUP_JOB_HEARTBEAT_SECONDS=0.01)
+    def test_heartbeat_saves_until_done(self):
+        import threading
+        from .backups import create_job, get_job
+        job = create_job('manual')
+        first = get_job(job.id)['heartbeat_at']
+        beat = threading.Thread(target=job.beat)
+        beat.start()
+        time.sleep(0.05)
+        job.done.set()
+        beat.join(1)
+        self.assertFalse(beat.is_alive())
+        self.assertGreater(get_job(job.id)['heartbeat_at'], first)
+
+    def test_concurrent_starts_create_one_job(self):
+        import threading
+        from . import backups
+        created, refused = [], []
+        check = backups.running_job
+
+        def slow_check():
+            # Widen the window between checking and creating
+            running = check()
+            time.sleep(0.02)
+            return running
+
+        def start():
+            try:
+                created.append(backups.create_job('manual'))
+            except backups.BackupRunning:
+                refused.append(True)
+
+        with mock.patch.object(backups, 'running_job', slow_check):
+            threads = [threading.Thread(target=start) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual((len(created), len(refused)), (1, 3))
+
+
+class ChunkStoreTests(unittest.TestCase):
+    def setUp(self):
+        import tempfile
+        from .backup_store import ChunkStore
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.root = directory.name
+        self.store = ChunkStore(f'{self.root}/store')
+
+    def backup(self, backup_id, data, created=None):
+        import io
+        from .backup_store import fixed_chunks
+        known = self.store.load_index()
+        entry = self.store.put_file(fixed_chunks(io.BytesIO(data), 4), {'type': 'database', 'name': 'db.sqlite3'}, known)
+        return self.store.add_backup({
+            'id': backup_id, 'created': created or time.time(), 'files': [entry],
+        }, known)
+
+    def test_unchanged_chunks_are_stored_once(self):
+        first = self.backup('a', b'aaaabbbbcccc')
+        second = self.backup('b', b'aaaabbbbdddd')
+        self.assertEqual(first['files'][0]['chunks'][:2], second['files'][0]['chunks'][:2])
+        self.assertGreater(first['files'][0]['stored'], 0)
+        index = self.store.load_index()
+        self.assertEqual(len(index), 4)
+        self.assertEqual(sorted(chunk['refs'] for chunk in index.values()), [1, 1, 2, 2])
+
+    def test_line_chunks_resync_after_an_insert(self):
+        import io
+        from .backup_store import line_chunks
+        lines = [f'INSERT INTO t VALUES ({i});\n'.encode() for i in range(2000)]
+        before = list(line_chunks(io.BytesIO(b''.join(lines)), 512))
+        after = list(line_chunks(io.BytesIO(b''.join(lines[:10] + [b'INSERT new;\n'] + lines[10:])), 512))
+        self.assertEqual(b''.join(before), b''.join(lines))
+        self.assertGreater(len(set(before) & set(after)), len(before) - 3)
+
+    def test_restore_round_trip_and_corruption(self):
+        import gzip as gzip_module
+        from .backup_store import ChunkError
+        manifest = self.backup('a', b'aaaabbbbcc')
+        [path] = self.store.restore(manifest, f'{self.root}/out')
+        with open(path, 'rb') as restored:
+            self.assertEqual(restored.read(), b'aaaabbbbcc')
+
+        sha = manifest['files'][0]['chunks'][1]
+        codec = self.store.load_index()[sha]['codec']
+        with open(self.store.chunk_path(sha, codec), 'wb') as chunk:
+            chunk.write(gzip_module.compress(b'evil'))
+        self.assertEqual(list(self.store.verify(manifest)), [sha])
+        with self.assertRaises(ChunkError):
+            self.store.restore(manifest, f'{self.root}/out2')
+
+    def test_prune_frees_only_unshared_chunks(self):
+        import os
+        old = self.backup('a', b'aaaabbbb', created=time.time() - 10 * 86400)
+        self.backup('b', b'aaaacccc')
+        shared, dropped = old['files'][0]['chunks']
+        codec = self.store.load_index()[dropped]['codec']
+        with self.assertLogs('api.backup_store', 'INFO'):
+            self.assertEqual(self.store.prune(days=7), ['a'])
+        index = self.store.load_index()
+        self.assertEqual(index[shared]['refs'], 1)
+        self.assertNotIn(dropped, index)
+        self.assertFalse(os.path.exists(self.store.chunk_path(dropped, codec)))
+        self.assertEqual([manifest['id'] for manifest in self.store.manifests()], ['b'])
+
+
+@override_settings(BACKUP_SCHEDULE_WINDOW_MINUTES=120)
+class BackupScheduleTests(TestCase):
+    def at(self, *args):
+        from datetime import datetime
+        return timezone.make_aware(datetime(*args))
+
+    def test_daily_runs_once_per_slot_inside_the_window(self):
+        from .backups import backup_due
+        config = {'autoBackup': True, 'backupFrequency': 'daily', 'backupTime': '02:00'}
+        self.assertTrue(backup_due(config, None, now=self.at(2026, 3, 10, 2, 30)))
+        self.assertTrue(backup_due(config, self.at(2026, 3, 9, 2, 1), now=self.at(2026, 3, 10, 2, 30)))
+        self.assertFalse(backup_due(config, self.at(2026, 3, 10, 2, 1), now=self.at(2026, 3, 10, 2, 30)))
+        # Missed the window: wait for the next slot rather than run at peak time
+        self.assertFalse(backup_due(config, None, now=self.at(2026, 3, 10, 9, 0)))
+        self.assertFalse(backup_due(dict(config, autoBackup=False), None, now=self.at(2026, 3, 10, 2, 30)))
+
+    def test_weekly_and_monthly(self):
+        from .backups import backup_due
+        weekly = {'autoBackup': True, 'backupFrequency': 'weekly', 'backupTime': '02:00'}
+        now = self.at(2026, 3, 10, 2, 30)
+        self.assertFalse(backup_due(weekly, self.at(2026, 3, 5, 2, 1), now=now))
+        self.assertTrue(backup_due(weekly, self.at(2026, 3, 3, 2, 1), now=now))
+
+        monthly = dict(weekly, backupFrequency='monthly')
+        self.assertFalse(backup_due(monthly, self.at(2026, 3, 1, 2, 1), now=now))
+        self.assertTrue(backup_due(monthly, self.at(2026, 2, 28, 2, 1), now=now))
+
+    def test_last_scheduled_run_ignores_manual_runs(self):
+        import tempfile
+        from .backups import last_scheduled_run
+        with tempfile.TemporaryDirectory() as directory, override_settings(BACKUP_DIR=directory):
+            self.assertIsNone(last_scheduled_run())
+            with open(f'{directory}/history.ndjson', 'w') as history:
+                history.write(json.dumps({'type': 'scheduled', 'started_at': '2026-03-09T02:00:00+00:00'}) + '\n')
+                history.write(json.dumps({'type': 'manual', 'started_at': '2026-03-10T12:00:00+00:00'}) + '\n')
+            self.assertEqual(last_scheduled_run(), self.at(2026, 3, 9, 2, 0))
+
+    def test_scheduler_skips_the_slot_while_a_backup_runs(self):
+        import io
+        import tempfile
+        from django.core.management import call_command
+        from .backups import create_job
+        from .management.commands.backup_scheduler import Command
+        with tempfile.TemporaryDirectory() as directory, override_settings(BACKUP_DIR=directory), \
+                mock.patch.object(Command, 'lower_priority'), mock.patch('api.management.commands.backup_scheduler.run_backup') as run:
+            running = create_job('manual')
+            out = io.StringIO()
+            call_command('backup_scheduler', '--now', stdout=out)
+        self.assertIn(f'Backup {running.id} is still running', out.getvalue())
+        run.assert_not_called()
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class DumpRestoreTests(TestCase):
+    def setUp(self):
+        import tempfile
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+        domain = Domain.objects.create(name='Machine Learning')
+        topic = Topic.objects.create(name='Vision', domain=domain, description='', max_groups=50)
+        faculty_user = User.objects.create_user(username='FAC001', password='FAC001', role='faculty')
+        faculty = Faculty.objects.create(user=faculty_user, name='Dr. Rao', email='rao@college.edu', max_groups=50)
+        for i in range(3):
+            create_selected_group(i, faculty, domain, topic)
+
+    def counts(self):
+        return {model: model.objects.count() for model in (User, Student, Faculty, Group, GroupMember, GroupSelection)}
+
+    def test_round_trip_with_flush(self):
+        from .dumps import DumpError, dump, restore
+        before = self.counts()
+        manifest = dump(self.directory)
+        self.assertEqual(manifest['models']['api.GroupSelection']['rows'], 3)
+        with self.assertRaises(DumpError):
+            restore(self.directory)
+
+        Student.objects.filter(roll_number='CS0000').update(name='Changed')
+        loaded = restore(self.directory, flush=True)
+        self.assertEqual(loaded['api.GroupMember'], 6)
+        self.assertEqual(self.counts(), before)
+        self.assertEqual(Student.objects.get(roll_number='CS0000').name, 'Student CS0000')
+
+    def test_flush_removes_admin_log_entries_of_the_old_users(self):
+        from django.contrib.admin.models import ADDITION, LogEntry
+        from django.contrib.contenttypes.models import ContentType
+        from .dumps import dump, restore
+        dump(self.directory)
+        admin = User.objects.create_user(username='root', password='root', role='super_admin')
+        LogEntry.objects.log_action(admin.pk, ContentType.objects.get_for_model(Domain).pk, '1', 'Machine Learning', ADDITION)
+
+        restore(self.directory, flush=True)
+        self.assertFalse(User.objects.filter(username='root').exists())
+        self.assertFalse(LogEntry.objects.exists())
+        connection.check_constraints()
+
+    def test_failed_load_keeps_the_old_rows(self):
+        from . import dumps
+        dumps.dump(self.directory)
+        before = self.counts()
+        load = dumps._load_model
+
+        def failing_load(model, *args, **kwargs):
+            if model is GroupSelection:
+                raise dumps.DumpError('disk went away')
+            return load(model, *args, **kwargs)
+
+        with mock.patch.object(dumps, '_load_model', failing_load), self.assertRaises(dumps.DumpError):
+            dumps.restore(self.directory, flush=True)
+        self.assertEqual(self.counts(), before)
+
+
+class SystemSettingsTests(TestCase):
+    def setUp(self):
+        import tempfile
+        from .system_settings import SystemSettings
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.path = f'{self.directory}/system_settings.json'
+        self.write({'features': {'maxGroupSize': '5', 'allowStudentRegistration': 'false'}})
+        self.settings = SystemSettings(self.path)
+
+    def write(self, data):
+        with open(self.path, 'w') as f:
+            json.dump(data, f)
+
+    def test_values_are_coerced_to_their_default_type(self):
+        self.assertEqual(self.settings.get('features', 'maxGroupSize'), 5)
+        self.assertIs(self.settings.get('features', 'allowStudentRegistration'), False)
+        self.assertEqual(self.settings.get('features', 'minGroupSize'), 2)  # missing: DEFAULT_SETTINGS
+        self.assertEqual(self.settings.get('backup', 'retentionDays', 7), 7)
+
+    @override_settings(SYSTEM_SETTINGS_CHECK_SECONDS=3600)
+    def test_file_is_parsed_once_until_it_changes(self):
+        import os
+        with mock.patch.object(self.settings, '_load', wraps=self.settings._load) as load:
+            for _ in range(50):
+                self.settings.get('features', 'maxGroupSize')
+            self.assertEqual(load.call_count, 1)
+
+            self.write({'features': {'maxGroupSize': 3}})
+            os.utime(self.path, ns=(time.time_ns(), time.time_ns() + 10 ** 9))
+            self.assertEqual(self.settings.get('features', 'maxGroupSize'), 5)  # not re-checked yet
+            self.settings.invalidate()
+            self.assertEqual(self.settings.get('features', 'maxGroupSize'), 3)
+            self.assertEqual(load.call_count, 2)
+
+    def test_concurrent_updates_keep_every_key(self):
+        import os
+        import threading
+        from .system_settings import SystemSettings
+        workers = [SystemSettings(self.path) for _ in range(4)]
+        threads = [
+            threading.Thread(target=worker.update, args=('general',), kwargs={f'key{i}': i})
+            for i, worker in enumerate(workers)
+        ]
+        # The version bump would write the test database from other threads
+        with mock.patch('api.system_settings.bus.bump'):
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        general = SystemSettings(self.path).section('general')
+        self.assertEqual({general[f'key{i}'] for i in range(4)}, {0, 1, 2, 3})
+        self.assertEqual(sorted(os.listdir(self.directory)), ['system_settings.json', 'system_settings.json.lock'])
+
+    def test_registration_follows_the_setting(self):
+        from .system_settings import system_settings
+        with override_settings(SYSTEM_SETTINGS_FILE=self.path):
+            system_settings.invalidate()
+            self.addCleanup(system_settings.invalidate)
+            with self.assertLogs('django.request', 'WARNING'):
+                response = APIClient().post('/api/register/', {}, format='json')
+            self.assertEqual(response.status_code, 403)
+
+            system_settings.update('features', allowStudentRegistration=True)
+            with self.assertLogs('django.request', 'WARNING'):
+                response = APIClient().post('/api/register/', {}, format='json')
+            self.assertEqual(response.status_code, 400)  # open, but the form is empty
+
+
+class InvalidationTests(TestCase):
+    def setUp(self):
+        import tempfile
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = f'{directory.name}/versions.bin'
+
+    def test_bumps_of_one_transaction_publish_once(self):
+        from .invalidation import CATALOG, STUDENTS, bus
+        with mock.patch.object(bus, 'publish') as publish:
+            with self.captureOnCommitCallbacks(execute=True) as callbacks:
+                domain = Domain.objects.create(name='Machine Learning')
+                for i in range(5):
+                    Topic.objects.create(name=f'Topic {i}', domain=domain, description='')
+                bus.bump(STUDENTS)
+            self.assertEqual(len(callbacks), 1)
+            publish.assert_called_once_with({CATALOG, STUDENTS})
+
+    def test_first_bump_in_a_rolled_back_savepoint_is_dropped(self):
+        from django.db import transaction
+        from .invalidation import STUDENTS, bus
+        with mock.patch.object(bus, 'publish') as publish:
+            with self.captureOnCommitCallbacks(execute=True):
+                try:
+                    with transaction.atomic():
+                        bus.bump('rolled-back')
+                        raise DatabaseError
+                except DatabaseError:
+                    pass
+                bus.bump(STUDENTS)
+            publish.assert_called_once_with({STUDENTS})
+
+    def test_database_versions(self):
+        from .invalidation import CATALOG, DatabaseVersions
+        versions = DatabaseVersions()
+        self.assertEqual(versions.read(), {})
+        versions.bump({CATALOG})
+        versions.bump({CATALOG})
+        self.assertEqual(versions.read(), {CATALOG: 2})
+
+    def test_file_versions_are_shared_through_the_file(self):
+        from .invalidation import CATALOG, SELECTIONS, FileVersions
+        writer, reader = FileVersions(self.path), FileVersions(self.path)
+        self.assertEqual(reader.read()[CATALOG], 0)
+        writer.bump({CATALOG})
+        writer.bump({CATALOG})
+        self.assertEqual(reader.read()[CATALOG], 2)
+        self.assertEqual(reader.read()[SELECTIONS], 0)
+
+    def test_local_cache_drops_entries_when_its_topic_moves(self):
+        from . import invalidation
+        with override_settings(CACHE_VERSION_BACKEND='file', CACHE_VERSION_FILE=self.path), \
+                mock.patch.object(invalidation, 'bus', invalidation.InvalidationBus()):
+            cache = invalidation.LocalCache(invalidation.CATALOG)
+            compute = mock.Mock(side_effect=[1, 2])
+            self.assertEqual(cache.get_or_set('domains', compute), 1)
+            self.assertEqual(cache.get_or_set('domains', compute), 1)
+            invalidation.bus.bump(invalidation.STUDENTS)
+            self.assertEqual(cache.get_or_set('domains', compute), 1)
+
+            # Another worker bumps the shared file; this one sees it after the check interval
+            invalidation.FileVersions(self.path).bump({invalidation.CATALOG})
+            invalidation.bus.next_check = 0.0
+            self.assertEqual(cache.get_or_set('domains', compute), 2)
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', 'BEGIN IMMEDIATE is SQLite specific')
+class WriteTransactionTests(unittest.TestCase):
+    """Runs outside TestCase's wrapping transaction, so the BEGIN statements are visible"""
+
+    def begins(self, block):
+        with CaptureQueriesContext(connection) as queries:
+            with block():
+                User.objects.exists()
+                with block():  # nested: a savepoint, never a second BEGIN
+                    User.objects.exists()
+        return [query['sql'] for query in queries if query['sql'].startswith('BEGIN')]
+
+    def test_plain_atomic_stays_deferred(self):
+        from django.db import transaction
+        self.assertEqual(self.begins(transaction.atomic), ['BEGIN'])
+
+    def test_write_transaction_is_immediate(self):
+        from django.db import transaction
+        from .transactions import write_transaction
+        self.assertEqual(self.begins(write_transaction), ['BEGIN IMMEDIATE'])
+        # The next plain transaction is deferred again
+        self.assertEqual(self.begins(transaction.atomic), ['BEGIN'])
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class FCFSSelectionTests(TestCase):
+    def setUp(self):
+        self.domain = Domain.objects.create(name='Machine Learning')
+        self.topic = Topic.objects.create(name='Vision', domain=self.domain, description='', max_groups=5)
+        faculty_user = User.objects.create_user(username='FAC001', password='FAC001', role='faculty')
+        self.faculty = Faculty.objects.create(user=faculty_user, name='Dr. Rao', email='rao@college.edu', max_groups=1)
+        self.groups = []
+        for i in range(2):
+            selection = create_selected_group(i, self.faculty, self.domain, self.topic)
+            selection.delete()
+            self.groups.append(selection.group)
+        self.client = APIClient()
+        self.client.force_authenticate(faculty_user)
+
+    def select(self, group):
+        return self.client.post('/api/select-fcfs/', {
+            'group_id': str(group.group_id), 'faculty_id': self.faculty.id,
+            'domain_id': self.domain.id, 'topic_id': self.topic.id,
+        }, format='json')
+
+    def test_counts_are_checked_and_updated_together(self):
+        first = self.select(self.groups[0])
+        self.assertEqual(first.status_code, 200, first.content)
+        self.assertEqual(first.json()['queue_position'], 1)
+
+        with self.assertLogs('django.request', 'WARNING'):
+            second = self.select(self.groups[1])
+        self.assertEqual(second.status_code, 400)
+        self.assertEqual(second.json()['error'], 'Faculty has reached maximum groups')
+
+        self.faculty.refresh_from_db()
+        self.topic.refresh_from_db()
+        self.assertEqual((self.faculty.current_groups, self.faculty.is_available), (1, False))
+        self.assertEqual(self.topic.current_groups, 1)
+        self.assertEqual(GroupSelection.objects.count(), 1)
+
+
+    def test_listing_applies_the_system_wide_cap(self):
+        from .system_settings import system_settings
+        real_get = system_settings.get
+        self.faculty.max_groups = 3
+        self.faculty.save()
+        self.assertEqual(self.select(self.groups[0]).status_code, 200)
+
+        def lowered(section, key):
+            return 1 if key == 'maxGroupsPerFaculty' else real_get(section, key)
+        with mock.patch.object(system_settings, 'get', side_effect=lowered):
+            listed = self.client.get('/api/available-faculty/').json()
+            self.assertNotIn(self.faculty.id, [faculty['id'] for faculty in listed])
+            with self.assertLogs('django.request', 'WARNING'):
+                self.assertEqual(self.select(self.groups[1]).status_code, 400)
+        listed = self.client.get('/api/available-faculty/').json()
+        self.assertIn(self.faculty.id, [faculty['id'] for faculty in listed])
+
+
+class ConnectionPoolTests(unittest.TestCase):
+    class FakeConnection:
+        def __init__(self):
+            self.closed = False
+            self.broken = False
+
+        def close(self):
+            self.closed = True
+
+    def pool(self, size=2, timeout=0.05, max_age=600, ping_after=30):
+        from .db_pool import ConnectionPool
+
+        def ping(conn):
+            if conn.broken:
+                raise OSError('server closed the connection')
+
+        def reset(conn):
+            if conn.broken:
+                raise OSError('cannot roll back')
+
+        return ConnectionPool(size, timeout, max_age, ping_after, ping, reset)
+
+    def test_returned_connections_are_reused(self):
+        pool = self.pool()
+        conn = pool.checkout(self.FakeConnection)
+        pool.checkin(conn)
+        self.assertIs(pool.checkout(self.FakeConnection), conn)
+        stats = pool.snapshot()
+        self.assertEqual((stats['connects'], stats['reused'], stats['open'], stats['in_use']), (1, 1, 1, 1))
+
+    def test_full_pool_waits_then_times_out(self):
+        import threading
+        from .db_pool import PoolTimeout
+        pool = self.pool(size=1, timeout=1)
+        held = pool.checkout(self.FakeConnection)
+        threading.Timer(0.05, pool.checkin, args=(held,)).start()
+        self.assertIs(pool.checkout(self.FakeConnection), held)  # handed over once returned
+
+        pool.timeout = 0.05
+        with self.assertRaises(PoolTimeout):
+            pool.checkout(self.FakeConnection)
+        stats = pool.snapshot()
+        self.assertEqual((stats['waits'], stats['timeouts']), (2, 1))
+
+    def test_dead_idle_connection_is_replaced(self):
+        pool = self.pool(ping_after=0)
+        conn = pool.checkout(self.FakeConnection)
+        pool.checkin(conn)
+        conn.broken = True
+        fresh = pool.checkout(self.FakeConnection)
+        self.assertIsNot(fresh, conn)
+        self.assertTrue(conn.closed)
+        self.assertEqual((pool.snapshot()['reconnects'], pool.snapshot()['open']), (1, 1))
+
+    def test_broken_and_expired_connections_are_not_pooled(self):
+        pool = self.pool(max_age=0)
+        conn = pool.checkout(self.FakeConnection)
+        pool.checkin(conn)
+        self.assertTrue(conn.closed)
+
+        pool.max_age = 600
+        conn = pool.checkout(self.FakeConnection)
+        conn.broken = True
+        pool.checkin(conn)
+        stats = pool.snapshot()
+        self.assertEqual((stats['expired'], stats['broken'], stats['open'], stats['idle']), (1, 1, 0, 0))
+
+    def test_failed_connect_frees_its_slot(self):
+        pool = self.pool(size=1)
+        with self.assertRaises(OSError):
+            pool.checkout(mock.Mock(side_effect=OSError('refused')))
+        self.assertIsInstance(pool.checkout(self.FakeConnection), self.FakeConnection)
+
+    def test_forked_child_drops_the_parents_connections(self):
+        pool = self.pool()
+        pool.checkin(pool.checkout(self.FakeConnection))
+        pool.pid -= 1  # as if this were a forked child
+        conn = pool.checkout(self.FakeConnection)
+        self.assertEqual((pool.snapshot()['connects'], conn.closed), (1, False))
+        self.assertEqual(pool.open, 1)
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS, REPLICA_MAX_LAG_SECONDS=10, REPLICA_LAG_CHECK_SECONDS=5)
+class ReplicaRouterTests(TestCase):
+    """The test database as primary and a second SQLite file, copied from it, as replica"""
+
+    @classmethod
+    def setUpClass(cls):
+        import sqlite3
+        import tempfile
+        # Copied before TestCase opens its class-wide transaction, whose locks
+        # would block the copy: the replica has the schema but none of the test rows
+        cls.template = tempfile.NamedTemporaryFile(suffix='.sqlite3')
+        primary_name = str(connection.settings_dict['NAME'])
+        source = sqlite3.connect(primary_name, uri=primary_name.startswith('file:'))
+        target = sqlite3.connect(cls.template.name)
+        source.backup(target)
+        target.close()
+        source.close()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.template.close()
+
+    def setUp(self):
+        import shutil
+        import tempfile
+        from django.db import connections
+        from . import routers
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.replica_path = shutil.copy(self.template.name, f'{self.directory}/replica.sqlite3')
+
+        # connections.settings is settings.DATABASES, so this configures the replica
+        connections.settings[routers.REPLICA] = dict(connection.settings_dict, NAME=self.replica_path, TEST={})
+        self.addCleanup(self.remove_replica)
+        lag = mock.patch.dict(routers._lag, {'seconds': 0.0, 'checked': time.monotonic()})
+        lag.start()
+        self.addCleanup(lag.stop)
+
+        self.user = User.objects.create_user(username='ADMIN1', password='ADMIN1', role='admin')
+        Domain.objects.create(name='Only on the primary')
+
+    def remove_replica(self):
+        from django.db import connections
+        from .routers import REPLICA
+        if hasattr(connections._connections, REPLICA):
+            connections[REPLICA].close()
+            del connections[REPLICA]
+        del connections.settings[REPLICA]
+
+    def view(self, write=False):
+        from django.test import RequestFactory
+        from .routers import read_replica
+
+        @read_replica
+        def listing(request):
+            if write:
+                Domain.objects.create(name='Written mid-request')
+            return HttpResponse(str(Domain.objects.count()))
+
+        request = RequestFactory().get('/')
+        request.user = self.user
+        return int(listing(request).content)
+
+    def test_reads_go_to_the_replica_until_the_request_writes(self):
+        self.assertEqual(self.view(), 0)
+        self.assertEqual(self.view(write=True), 2)
+        self.assertEqual(Domain.objects.count(), 2)  # undecorated code reads the primary
+
+    def test_pin_keeps_the_user_on_the_primary(self):
+        import tempfile
+        from .routers import pin_to_primary, sticky_seconds
+        self.assertEqual(sticky_seconds(), 15)
+        with override_settings(REPLICA_STICKY_SECONDS=60):
+            self.assertEqual(sticky_seconds(), 60)
+
+        with tempfile.TemporaryDirectory() as location, \
+                override_settings(CACHES=shared_cache_settings('ratelimit', location)):
+            pin_to_primary(self.user.pk)
+            self.assertEqual(self.view(), 1)
+
+    def test_per_process_pins_keep_signed_in_users_on_the_primary(self):
+        import tempfile
+        from django.contrib.auth.models import AnonymousUser
+        from .routers import replica_allowed
+        with mock.patch.dict('os.environ', {'WEB_CONCURRENCY': '4'}):
+            self.assertFalse(replica_allowed(self.user))
+            self.assertTrue(replica_allowed(AnonymousUser()))
+            with tempfile.TemporaryDirectory() as location, \
+                    override_settings(CACHES=shared_cache_settings('ratelimit', location)):
+                self.assertTrue(replica_allowed(self.user))
+
+    def test_lagging_replica_is_skipped(self):
+        import os
+        from . import routers
+        primary_path = f'{self.directory}/primary.sqlite3'
+        open(primary_path, 'w').close()
+        os.utime(self.replica_path, (time.time() - 30, time.time() - 30))
+        with mock.patch.dict(connection.settings_dict, NAME=primary_path):
+            self.assertGreater(routers.measure_lag(), 20)
+            routers._lag['checked'] = 0.0
+            self.assertEqual(self.view(), 1)
+
+            os.utime(self.replica_path)
+            routers._lag['checked'] = 0.0
+            self.assertEqual(routers.replica_lag(), 0.0)
+
+    def test_sticky_cache_check(self):
+        from django.conf import settings
+        from .checks import check_shared_caches
+
+        def sticky_warnings():
+            return [warning for warning in check_shared_caches(None) if 'REPLICA_STICKY_CACHE_ALIAS' in warning.msg]
+
+        with mock.patch.dict('os.environ', {'WEB_CONCURRENCY': '4'}):
+            self.assertEqual(len(sticky_warnings()), 1)
+            with mock.patch.dict(settings.DATABASES):
+                del settings.DATABASES['replica']
+                self.assertEqual(sticky_warnings(), [])
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class QueryInstrumentationTests(TestCase):
+    def setUp(self):
+        from .instrumentation import reset_view_stats
+        reset_view_stats()
+        self.addCleanup(reset_view_stats)
+
+    def test_fingerprint_collapses_literals_and_in_lists(self):
+        from .instrumentation import fingerprint
+        self.assertEqual(
+            fingerprint("SELECT t1.id FROM t1 WHERE t1.id IN (%s, %s, %s) AND name = 'O''Brien' LIMIT 21"),
+            "SELECT t1.id FROM t1 WHERE t1.id IN (...) AND name = ? LIMIT ?",
+        )
+        self.assertEqual(fingerprint('SELECT 1 WHERE id IN (%s, %s)'), fingerprint('SELECT 2 WHERE id IN (%s, %s, %s)'))
+
+    def test_histogram_percentiles(self):
+        from .instrumentation import Histogram
+        histogram = Histogram((1, 5, 10))
+        for value in (0.5, 2, 3, 4, 7, 50):
+            histogram.add(value)
+        snapshot = histogram.snapshot()
+        self.assertEqual((snapshot['p50'], snapshot['p95'], snapshot['max']), (5, 50, 50))
+        self.assertEqual(snapshot['buckets'], {'<=1': 1, '<=5': 3, '<=10': 1, '>10': 1})
+        self.assertEqual(Histogram((1,)).snapshot()['p50'], 0)
+
+    @override_settings(QUERY_BUDGET=3, QUERY_BUDGETS={'roomy': 100})
+    def test_over_budget_views_log_their_repeated_queries(self):
+        from .instrumentation import RequestRecorder, record, view_stats
+        with RequestRecorder() as recorder:
+            for user_id in range(5):
+                list(User.objects.filter(pk=user_id))
+        self.assertEqual(recorder.queries, 5)
+
+        with self.assertLogs('api.instrumentation', 'WARNING') as logs:
+            record('tight', recorder, 0.01, 100)
+        self.assertIn('ran 5 queries (budget 3)', logs.output[0])
+        self.assertIn('5x SELECT', logs.output[0])
+
+        with self.assertNoLogs('api.instrumentation', 'WARNING'):
+            record('roomy', recorder, 0.01, 100)
+        stats = view_stats()
+        self.assertEqual((stats['tight']['over_budget'], stats['roomy']['over_budget']), (1, 0))
+        self.assertEqual(stats['tight']['duplicate_queries'][0]['requests'], 1)
+
+    def test_middleware_records_per_view(self):
+        from django.core.exceptions import MiddlewareNotUsed
+        from .middleware import QueryInstrumentationMiddleware
+        with self.assertRaises(MiddlewareNotUsed):
+            QueryInstrumentationMiddleware(lambda request: None)
+
+        admin = User.objects.create_user(username='SUPER1', password='SUPER1', role='super_admin')
+        with override_settings(QUERY_INSTRUMENTATION=True):
+            client = APIClient()
+            client.force_authenticate(admin)
+            client.get('/api/selection-queue/')
+            client.get('/api/selection-queue/')
+            data = client.get('/api/super-admin/instrumentation/').json()
+        stats = data['views']['selection_queue']
+        self.assertEqual(stats['requests'], 2)
+        self.assertGreater(stats['queries']['mean'], 0)
+        self.assertGreater(stats['response_bytes']['max'], 0)
+
+
+# A full table scan: SQLite "SCAN <table>" without an index, Postgres "Seq Scan"
+FULL_SCAN = re.compile(r'\bSCAN \w+\s*$|Seq Scan', re.MULTILINE)
+
+
+@unittest.skipUnless(connection.vendor in ('sqlite', 'postgresql'), 'EXPLAIN output is vendor specific')
+class QueryPlanTests(TestCase):
+    """EXPLAIN each hot filter and fail if any of them falls back to a full table scan"""
+
+    def setUp(self):
+        if connection.vendor == 'postgresql':
+            # Tiny test tables make a seq scan the cheapest plan regardless of indexes
+            with connection.cursor() as cursor:
+                cursor.execute('SET enable_seqscan = off')
+
+    def hot_queries(self):
+        now = timezone.now()
+        return {
+            'group member by student': GroupMember.objects.filter(student_id=1).select_related('group'),
+            'lockout warm-up': AdminLoginLog.objects.filter(
+                success=False, timestamp__gte=now
+            ).values_list('ip_address', 'timestamp'),
+            'failed logins per IP': AdminLoginLog.objects.filter(ip_address='10.0.0.1', success=False, timestamp__gte=now),
+            'login audit by time': AdminLoginLog.objects.filter(timestamp__lt=now).order_by('timestamp', 'id')[:100],
+            'recovery audit by time': RecoveryLog.objects.filter(timestamp__lt=now),
+            'queue by faculty': GroupSelection.objects.filter(faculty_id=1).order_by('submitted_at', 'id')[:50],
+            'queue by domain': GroupSelection.objects.filter(domain_id=1).order_by('submitted_at', 'id')[:50],
+            'queue position': GroupSelection.objects.filter(faculty_id=1, submitted_at__lt=now),
+            'available topics': Topic.objects.filter(domain_id=1, is_available=True),
+            'available faculty': Faculty.objects.filter(is_available=True, current_groups__lt=F('max_groups')),
+            'user by email': User.objects.filter(email='student@college.edu'),
+            'user by recovery email': User.objects.filter(recovery_email='student@college.edu'),
+            'user by phone': User.objects.filter(phone_number='9999999999'),
+            'user by recovery phone': User.objects.filter(recovery_phone='9999999999'),
+        }
+
+    def test_hot_queries_use_indexes(self):
+        for name, queryset in self.hot_queries().items():
+            with self.subTest(name):
+                plan = queryset.explain()
+                self.assertIsNone(FULL_SCAN.search(plan), f'{name} does a full scan:\n{plan}')
+
+
+class FastJSONRendererTests(unittest.TestCase):
+    """orjson output must match DRF's stdlib JSONRenderer byte for byte"""
+
+    def test_output_matches_stdlib_renderer(self):
+        from rest_framework.renderers import JSONRenderer
+        from .renderers import FastJSONRenderer, orjson
+        if orjson is None:
+            self.skipTest('orjson is not installed')
+
+        data = {
+            'when': timezone.datetime(2024, 5, 1, 12, 30, 15, 123456, tzinfo=timezone.utc),
+            'day': timezone.datetime(2024, 5, 1).date(),
+            'score': Decimal('12.50'),
+            'id': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+            'name': 'Ünïcode \u2028 separator',
+            'nested': [{'n': 1, 'ok': True, 'none': None}, [1.5, 'x']],
+        }
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_indent_falls_back_to_stdlib(self):
+        from rest_framework.renderers import JSONRenderer
+        from .renderers import FastJSONRenderer
+        data = {'a': [1, 2]}
+        media_type = 'application/json; indent=4'
+        self.assertEqual(
+            FastJSONRenderer().render(data, media_type, {}),
+            JSONRenderer().render(data, media_type, {}),
+        )
+
+
+class ResponseCompressionTests(unittest.TestCase):
+
+    def setUp(self):
+        from django.test import RequestFactory
+        from .middleware import ResponseCompressionMiddleware
+        self.factory = RequestFactory()
+        self.payload = json.dumps([{'roll_number': f'CS{i:04d}', 'name': 'Student'} for i in range(200)])
+        self.middleware = ResponseCompressionMiddleware(
+            lambda request: HttpResponse(self.payload, content_type='application/json')
+        )
+
+    def get(self, accept_encoding, url_name='admin_all_students'):
+        from django.urls import ResolverMatch
+        request = self.factory.get('/', HTTP_ACCEPT_ENCODING=accept_encoding)
+        request.resolver_match = ResolverMatch(lambda r: None, (), {}, url_name=url_name)
+        return self.middleware(request)
+
+    def test_negotiation_honours_q_values(self):
+        from . import middleware
+        with mock.patch.object(middleware, 'brotli', object()):
+            self.assertEqual(self.middleware.negotiate('gzip, br'), 'br')
+            self.assertEqual(self.middleware.negotiate('br;q=0.5, gzip'), 'gzip')
+            self.assertEqual(self.middleware.negotiate('*'), 'br')
+            self.assertIsNone(self.middleware.negotiate('br;q=0, gzip;q=0'))
+        with mock.patch.object(middleware, 'brotli', None):
+            self.assertEqual(self.middleware.negotiate('br, gzip;q=0.1'), 'gzip')
+            self.assertIsNone(self.middleware.negotiate('br'))
+        self.assertIsNone(self.middleware.negotiate(''))
+        self.assertIsNone(self.middleware.negotiate('identity'))
+
+    def test_gzip_round_trip(self):
+        response = self.get('gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(gzip.decompress(response.content).decode(), self.payload)
+
+    def test_uncompressed_without_accept_encoding(self):
+        response = self.get('')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(response.content.decode(), self.payload)
+
+    def test_secret_bearing_views_are_not_compressed(self):
+        response = self.get('gzip, br', url_name='verify_reset_otp')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(response.content.decode(), self.payload)
@@ -0,0 +1,156 @@
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.throttling import SimpleRateThrottle
+from contextlib import contextmanager
+import logging
+import math
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucketThrottle(SimpleRateThrottle):
+    """
+    Token-bucket throttle configured with DRF's 'N/period' rates.
+
+    The bucket holds up to N tokens and refills continuously at N per period,
+    so short bursts are allowed while the sustained rate is capped. DRF runs
+    throttles before the view body, so rejected logins never reach
+    authenticate() and its PBKDF2 hash. Buckets live in the ratelimit cache.
+
+    Reading and refilling a bucket is a read-modify-write, so it runs under a
+    per-bucket lock taken with cache.add(). Only the locmem, Redis and
+    Memcached backends are supported (api.ratelimit.ATOMIC_ADD_CACHES; the
+    api.W002 check flags others such as FileBasedCache, whose add() is not
+    atomic). A request that can't get the lock within LOCK_WAIT seconds is
+    throttled rather than let through unchecked.
+    """
+
+    cache_format = 'throttle:%(scope)s:%(ident)s'
+    LOCK_WAIT = 0.2
+    LOCK_TIMEOUT = 1  # seconds; frees the lock of a worker that died holding it
+
+    def __init__(self):
+        super().__init__()
+        self.cache = caches[getattr(settings, 'RATELIMIT_CACHE_ALIAS', 'default')]
+        self.refill_per_second = self.num_requests / self.duration if self.rate else None
+        self.wait_seconds = None
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        with self.bucket_lock() as locked:
+            if locked:
+                now = self.timer()
+                tokens, last = self.cache.get(self.key, (self.num_requests, now))
+                tokens = min(self.num_requests, tokens + (now - last) * self.refill_per_second)
+                if tokens >= 1:
+                    self.cache.set(self.key, (tokens - 1, now), math.ceil(self.duration))
+                    record_throttle_metric(self.scope, 'served')
+                    return True
+                self.wait_seconds = (1 - tokens) / self.refill_per_second
+            else:
+                self.wait_seconds = self.LOCK_WAIT
+
+        record_throttle_metric(self.scope, 'throttled')
+        logger.warning(f"Throttled {self.scope} for {self.key}")
+        return False
+
+    @contextmanager
+    def bucket_lock(self):
+        """Yields whether the bucket's lock was acquired within LOCK_WAIT"""
+        lock_key = f'{self.key}:lock'
+        deadline = time.monotonic() + self.LOCK_WAIT
+        while not self.cache.add(lock_key, True, self.LOCK_TIMEOUT):
+            if time.monotonic() >= deadline:
+                yield False
+                return
+            time.sleep(0.002)
+        try:
+            yield True
+        finally:
+            self.cache.delete(lock_key)
+
+    def wait(self):
+        return self.wait_seconds
+
+
+class IPTokenBucketThrottle(TokenBucketThrottle):
+    """Bucket per client IP"""
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {'scope': self.scope, 'ident': self.get_ident(request)}
+
+
+class IdentifierTokenBucketThrottle(TokenBucketThrottle):
+    """Bucket per submitted username/email/phone, whichever the endpoint uses"""
+
+    identifier_fields = ('username', 'username_or_email', 'identifier')
+
+    def get_cache_key(self, request, view):
+        for field in self.identifier_fields:
+            value = request.data.get(field) if hasattr(request.data, 'get') else None
+            if value:
+                return self.cache_format % {'scope': self.scope, 'ident': str(value).strip().lower()}
+        return None
+
+
+class LoginIPThrottle(IPTokenBucketThrottle):
+    scope = 'login_ip'
+
+
+class LoginUsernameThrottle(IdentifierTokenBucketThrottle):
+    scope = 'login_user'
+
+
+class PasswordResetIPThrottle(IPTokenBucketThrottle):
+    scope = 'password_reset_ip'
+
+
+class PasswordResetIdentifierThrottle(IdentifierTokenBucketThrottle):
+    scope = 'password_reset_user'
+
+
+class OTPVerifyThrottle(IdentifierTokenBucketThrottle):
+    scope = 'otp_verify'
+    identifier_fields = ('user_id',)
+
+
+class LookupIPThrottle(IPTokenBucketThrottle):
+    scope = 'lookup_ip'
+
+
+LOGIN_THROTTLES = [LoginIPThrottle, LoginUsernameThrottle]
+PASSWORD_RESET_THROTTLES = [PasswordResetIPThrottle, PasswordResetIdentifierThrottle]
+OTP_VERIFY_THROTTLES = [PasswordResetIPThrottle, OTPVerifyThrottle]
+
+
+def _metric_key(scope, outcome):
+    return f'throttle:metrics:{scope}:{outcome}'
+
+
+def record_throttle_metric(scope, outcome):
+    cache = caches[getattr(settings, 'RATELIMIT_CACHE_ALIAS', 'default')]
+    key = _metric_key(scope, outcome)
+    if not cache.add(key, 1, None):
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, 1, None)
+
+
+def throttle_metrics():
+    """{scope: {'served': n, 'throttled': n}} for every configured throttle scope"""
+    cache = caches[getattr(settings, 'RATELIMIT_CACHE_ALIAS', 'default')]
+    scopes = settings.REST_FRAMEWORK.get('DEFAULT_THROTTLE_RATES', {})
+    keys = [_metric_key(scope, outcome) for scope in scopes for outcome in ('served', 'throttled')]
+    values = cache.get_many(keys)
+    return {
+        scope: {outcome: values.get(_metric_key(scope, outcome), 0) for outcome in ('served', 'throttled')}
+        for scope in scopes
+    }
@@ -0,0 +1,226 @@
+from django.conf import settings
+from django.core import signing
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare, salted_hmac
+from rest_framework import exceptions
+from rest_framework.authentication import BaseAuthentication, get_authorization_header
+from datetime import datetime, timezone as dt_timezone
+import secrets
+import threading
+import time
+
+from .models import RevokedToken, User
+
+# User fields carried in every token for the client; the server always reloads the row
+CLAIM_FIELDS = ('id', 'username', 'role', 'roll_number', 'faculty_id', 'is_group_leader', 'is_active')
+TOKEN_SALTS = {
+    'access': 'api.tokens.access',
+    'refresh': 'api.tokens.refresh',
+}
+
+
+class TokenError(Exception):
+    pass
+
+
+class TokenDenylist:
+    """
+    Revoked token/session ids of this process, kept only until the tokens expire.
+
+    Ids are 16 hex chars, so even a busy day of logouts stays small. Each
+    worker has its own copy, checked on every request without a query. An
+    access token revoked in another worker is therefore still accepted here
+    until it expires (ACCESS_TOKEN_LIFETIME at most). Refresh tokens are
+    also checked against the RevokedToken table, shared by all workers, so a
+    rotated refresh token or a logged-out session can't mint new tokens.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = {}
+        self.next_purge = 0
+
+    def add(self, token_id, expires_at):
+        with self.lock:
+            self.entries[token_id] = max(expires_at, self.entries.get(token_id, 0))
+            self._purge()
+
+    def __contains__(self, token_id):
+        expires_at = self.entries.get(token_id)
+        return expires_at is not None and expires_at > time.time()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _purge(self):
+        now = time.time()
+        if now < self.next_purge:
+            return
+        self.entries = {token_id: exp for token_id, exp in self.entries.items() if exp > now}
+        self.next_purge = now + 60
+
+
+denylist = TokenDenylist()
+
+
+def _lifetime(token_type):
+    if token_type == 'access':
+        return getattr(settings, 'ACCESS_TOKEN_LIFETIME', 15 * 60)
+    return getattr(settings, 'REFRESH_TOKEN_LIFETIME', 24 * 60 * 60)
+
+
+def _encode(token_type, claims, sid):
+    now = int(time.time())
+    payload = {
+        **claims,
+        'typ': token_type,
+        'sid': sid,
+        'jti': secrets.token_hex(8),
+        # Rotation never extends a login past REFRESH_TOKEN_LIFETIME from auth_time
+        'exp': min(now + _lifetime(token_type), claims['auth_time'] + _lifetime('refresh')),
+    }
+    return signing.dumps(payload, salt=TOKEN_SALTS[token_type])
+
+
+def password_fingerprint(user):
+    """Changes whenever the password does, which invalidates every token issued before"""
+    return salted_hmac('api.tokens.password', user.password, algorithm='sha256').hexdigest()[:16]
+
+
+def user_claims(user):
+    return {field: getattr(user, field) for field in CLAIM_FIELDS}
+
+
+def issue_tokens(user, sid=None, auth_time=None):
+    """
+    Access/refresh pair for user. Both tokens share `sid` so logout can revoke
+    them together; a new login (no sid) starts a new session at auth_time.
+    """
+    claims = {
+        **user_claims(user),
+        'pwd': password_fingerprint(user),
+        'auth_time': auth_time or int(time.time()),
+    }
+    sid = sid or secrets.token_hex(8)
+    return {
+        'access': _encode('access', claims, sid),
+        'refresh': _encode('refresh', claims, sid),
+        'token_type': 'Bearer',
+        'expires_in': _lifetime('access'),
+    }
+
+
+def decode_token(token, token_type='access'):
+    """Verified claims of token, or TokenError if it is forged, expired or revoked"""
+    try:
+        claims = signing.loads(token, salt=TOKEN_SALTS[token_type], max_age=_lifetime(token_type))
+    except signing.SignatureExpired:
+        raise TokenError('Token has expired')
+    except signing.BadSignature:
+        raise TokenError('Invalid token')
+
+    if claims.get('typ') != token_type or claims.get('exp', 0) <= time.time():
+        raise TokenError('Invalid token')
+    if claims['jti'] in denylist or claims['sid'] in denylist:
+        raise TokenError('Token has been revoked')
+    return claims
+
+
+def _deny_shared(token_id, expires_at):
+    """Record token_id in RevokedToken; False if it was already there"""
+    try:
+        with transaction.atomic():
+            RevokedToken.objects.create(
+                token_id=token_id, expires_at=datetime.fromtimestamp(expires_at, tz=dt_timezone.utc)
+            )
+    except IntegrityError:
+        return False
+    return True
+
+
+_next_purge = [0.0]
+
+
+def purge_revoked_tokens():
+    """Delete RevokedToken rows whose tokens have expired; at most once a minute per process"""
+    now = time.time()
+    if now < _next_purge[0]:
+        return 0
+    _next_purge[0] = now + 60
+    deleted, _ = RevokedToken.objects.filter(expires_at__lte=timezone.now()).delete()
+    return deleted
+
+
+def revoke(claims, whole_session=False):
+    """Deny this token, or with whole_session every token issued at the same login"""
+    if whole_session:
+        # Rotated refresh tokens never outlive the newest one, which expires within REFRESH_TOKEN_LIFETIME
+        expires_at = time.time() + _lifetime('refresh')
+        denylist.add(claims['sid'], expires_at)
+        _deny_shared(claims['sid'], expires_at)
+    else:
+        denylist.add(claims['jti'], claims['exp'])
+        if claims['typ'] == 'refresh':
+            _deny_shared(claims['jti'], claims['exp'])
+
+
+def _check_password(user, claims):
+    if not constant_time_compare(claims.get('pwd', ''), password_fingerprint(user)):
+        raise TokenError('Password has changed, please log in again')
+
+
+def refresh_tokens(refresh_token):
+    """Rotate a refresh token: revoke it and return a new pair with claims reloaded from the DB"""
+    claims = decode_token(refresh_token, 'refresh')
+    purge_revoked_tokens()
+    if RevokedToken.objects.filter(token_id=claims['sid']).exists():
+        raise TokenError('Token has been revoked')
+    user = User.objects.filter(pk=claims['id'], is_active=True).first()
+    if user is None:
+        raise TokenError('User no longer active')
+    _check_password(user, claims)
+
+    # Inserting the jti consumes it; only one worker can rotate a given token
+    if not _deny_shared(claims['jti'], claims['exp']):
+        # A rotated token came back: someone holds a copy, end the whole login
+        revoke(claims, whole_session=True)
+        raise TokenError('Token has been revoked')
+    denylist.add(claims['jti'], claims['exp'])
+    return user, issue_tokens(user, sid=claims['sid'], auth_time=claims['auth_time'])
+
+
+class SignedTokenAuthentication(BaseAuthentication):
+    """
+    Authorization: Bearer <access token> issued by the login views.
+
+    The user is loaded from the DB by primary key, never rebuilt from the
+    claims: views save request.user, and stale claim values (role,
+    is_group_leader, ...) must not be written back over the row.
+    """
+
+    keyword = 'Bearer'
+
+    def authenticate(self, request):
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(auth) != 2:
+            raise exceptions.AuthenticationFailed('Invalid Authorization header')
+
+        try:
+            claims = decode_token(auth[1].decode(), 'access')
+        except (TokenError, UnicodeError) as e:
+            raise exceptions.AuthenticationFailed(str(e))
+
+        user = User.objects.filter(pk=claims['id']).first()
+        if user is None or not user.is_active:
+            raise exceptions.AuthenticationFailed('User inactive')
+        try:
+            _check_password(user, claims)
+        except TokenError as e:
+            raise exceptions.AuthenticationFailed(str(e))
+        return user, claims
+
+    def authenticate_header(self, request):
+        return self.keyword
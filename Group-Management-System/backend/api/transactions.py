@@ -0,0 +1,27 @@
+"""
+write_transaction(): transaction.atomic() for read-then-write blocks.
+
+On api.sqlite_backend the outermost block starts with BEGIN IMMEDIATE, so
+it holds SQLite's write lock from its first read and concurrent writers
+queue on busy_timeout instead of failing to upgrade a read lock. Inside an
+open transaction it is a savepoint like atomic(), and on other databases
+it is atomic() (select_for_update does the locking there).
+"""
+from django.db import transaction
+from contextlib import contextmanager
+
+
+@contextmanager
+def write_transaction(using=None):
+    conn = transaction.get_connection(using)
+    immediate = conn.vendor == 'sqlite' and not conn.in_atomic_block
+    if immediate:
+        conn.immediate = True
+    try:
+        with transaction.atomic(using=using):
+            if immediate:
+                conn.immediate = False
+            yield
+    finally:
+        if immediate:
+            conn.immediate = False
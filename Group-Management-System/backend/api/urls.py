@@ -5,6 +5,7 @@ urlpatterns = [
     # Authentication
     path('login/', views.login_view, name='login'),
     path('logout/', views.logout_view, name='logout'),
+    path('token/refresh/', views.token_refresh_view, name='token_refresh'),
     path('register/', views.register_view, name='register'),
     path('forgot-password/', views.forgot_password, name='forgot_password'),
     path('reset-password/', views.reset_password, name='reset_password'),
@@ -47,6 +48,8 @@ urlpatterns = [
     path('super-admin/login/', views.super_admin_login_view, name='super_admin_login'),
     path('super-admin/dashboard-stats/', views.super_admin_dashboard_stats, name='super_admin_dashboard_stats'),
     path('super-admin/admins/', views.get_all_admins, name='super_admin_admins'),
+    path('super-admin/throttle-metrics/', views.super_admin_throttle_metrics, name='super_admin_throttle_metrics'),
+    path('super-admin/instrumentation/', views.super_admin_instrumentation, name='super_admin_instrumentation'),
     
     # Biometric Authentication
     path('super-admin/register-biometric/', views.register_biometric, name='register_biometric'),
@@ -64,10 +67,14 @@ urlpatterns = [
     
     # Analytics and Settings
     path('super-admin/analytics/', views.super_admin_analytics, name='super_admin_analytics'),
+    path('super-admin/analytics/history/', views.super_admin_analytics_history, name='super_admin_analytics_history'),
+    path('super-admin/audit-logs/', views.super_admin_audit_logs, name='super_admin_audit_logs'),
     path('super-admin/settings/', views.super_admin_settings, name='super_admin_settings'),
     path('super-admin/settings/reset/', views.super_admin_settings_reset, name='super_admin_settings_reset'),
     path('super-admin/test-email/', views.test_email, name='test_email'),
     path('super-admin/backup/', views.manual_backup, name='manual_backup'),
+    path('super-admin/backup/status/', views.backup_status, name='backup_status_list'),
+    path('super-admin/backup/status/<str:job_id>/', views.backup_status, name='backup_status'),
 
     # Sheets Import
     path('import-students/', views.import_students_from_sheet, name='import_students'),
@@ -84,6 +91,7 @@ urlpatterns = [
     # FCFS System
     path('select-fcfs/', views.select_group_preferences_fcfs, name='select_fcfs'),
     path('selection-queue/', views.get_selection_queue, name='selection_queue'),
+    path('selection-queue/position/<str:group_id>/', views.get_queue_position, name='selection_queue_position'),
 
     # Faculty Management
     path('faculty/export/', views.export_faculty_to_sheet, name='export_faculty'),
@@ -3,6 +3,7 @@ import pandas as pd
 from google.oauth2 import service_account
 from googleapiclient.discovery import build
 from django.conf import settings
+from .invalidation import STUDENTS, LocalCache
 from .models import Student, User
 import logging
 
@@ -91,10 +92,19 @@ class GoogleSheetsHelper:
         logger.info(f"Synced {synced_count} new students from Google Sheets")
         return True
 
+# roll_number -> name, or None for unknown roll numbers
+student_names = LocalCache(STUDENTS, max_entries=10000)
+
+
+def student_name(roll_number):
+    """Name of the student with this roll number, None if there is none"""
+    return student_names.get_or_set(
+        roll_number,
+        lambda: Student.objects.filter(roll_number=roll_number).values_list('name', flat=True).first()
+    )
+
+
 def verify_student(roll_number, name):
     """Verify if a student exists in the database with matching name"""
-    try:
-        student = Student.objects.get(roll_number=roll_number)
-        return student.name.lower() == name.lower()
-    except Student.DoesNotExist:
-        return False
\ No newline at end of file
+    registered = student_name(roll_number)
+    return registered is not None and registered.lower() == name.lower()
\ No newline at end of file
@@ -1,15 +1,15 @@
 from rest_framework import status
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, authentication_classes, permission_classes, throttle_classes
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from django.contrib.auth import authenticate, login as auth_login, logout
 from django.db import transaction
-from django.db.models import F
+from django.db.models import F, Q
 from django.contrib.auth.hashers import make_password, check_password
 from django.contrib.auth.tokens import default_token_generator
 from django.contrib.auth.password_validation import validate_password
 from django.core.exceptions import ValidationError
-from django.core.mail import send_mail
+from django.core.mail import get_connection, send_mail
 from django.conf import settings
 from django.utils import timezone
 import logging
@@ -17,8 +17,7 @@ import os
 import json
 import secrets
 import string
-import subprocess
-import shutil
+from copy import deepcopy
 from datetime import datetime
 import pyotp
 import pandas as pd
@@ -39,15 +38,37 @@ from webauthn.helpers.structs import (
 
 from .models import *
 from .serializers import *
-from .utils import GoogleSheetsHelper, verify_student
-from .otp_utils import generate_otp, send_otp_email, send_otp_sms
+from .utils import GoogleSheetsHelper, student_name, verify_student
+from .invalidation import CATALOG, LocalCache
+from .analytics import (
+    GRANULARITY_STEP, HISTORY_PERIODS, activity_series, history_series, rollup_totals,
+    user_totals, group_totals, selection_totals, catalog_totals
+)
+from .otp_utils import otp_store, send_otp_email, send_otp_sms
+from .mailer import enqueue_email
+from .throttles import LOGIN_THROTTLES, PASSWORD_RESET_THROTTLES, OTP_VERIFY_THROTTLES, LookupIPThrottle, throttle_metrics
+from .tokens import TokenError, decode_token, issue_tokens, refresh_tokens, revoke
+from .audit import record_audit
+from .retention import audit_rows
+from .system_settings import DEFAULT_SETTINGS, REQUIRED_SECTIONS, system_settings
+from .db_pool import pool_stats
+from .instrumentation import reset_view_stats, view_stats
+from .routers import read_replica
+from .ratelimit import client_ip
+from .backups import BackupRunning, backup_history, get_job, recent_jobs, start_backup
+from .transactions import write_transaction
 
 logger = logging.getLogger(__name__)
 
+# Serialized catalog listings, dropped on any Domain/Topic/Faculty write in any worker
+catalog_cache = LocalCache(CATALOG)
+
 # ==================== AUTHENTICATION VIEWS ====================
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@authentication_classes([])
+@throttle_classes(LOGIN_THROTTLES)
 def login_view(request):
     """Handle user login"""
     serializer = LoginSerializer(data=request.data)
@@ -75,7 +96,8 @@ def login_view(request):
                 'roll_number': user.roll_number,
                 'faculty_id': user.faculty_id,  # Add this for faculty
                 'is_first_login': is_first_login
-            }
+            },
+            'tokens': issue_tokens(user)
         })
     else:
         return Response({
@@ -86,14 +108,57 @@ def login_view(request):
 @api_view(['POST'])
 def logout_view(request):
     """Handle user logout"""
+    # Bearer logins: revoke the access token and every token from the same login
+    if isinstance(request.auth, dict) and 'sid' in request.auth:
+        revoke(request.auth, whole_session=True)
     logout(request)
     return Response({'success': True, 'message': 'Logged out successfully'})
 
 
+@api_view(['POST'])
+@permission_classes([AllowAny])
+@authentication_classes([])
+def token_refresh_view(request):
+    """Exchange a refresh token for a new access/refresh pair"""
+    refresh = request.data.get('refresh')
+    if not refresh:
+        return Response({
+            'success': False,
+            'error': 'Refresh token is required'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        user, tokens = refresh_tokens(refresh)
+    except TokenError as e:
+        return Response({
+            'success': False,
+            'error': str(e)
+        }, status=status.HTTP_401_UNAUTHORIZED)
+
+    return Response({
+        'success': True,
+        'user': {
+            'id': user.id,
+            'username': user.username,
+            'role': user.role,
+            'is_group_leader': user.is_group_leader,
+            'roll_number': user.roll_number,
+            'faculty_id': user.faculty_id
+        },
+        'tokens': tokens
+    })
+
+
 @api_view(['POST'])
 @permission_classes([AllowAny])
 def register_view(request):
     """Handle new user registration"""
+    if not system_settings.get('features', 'allowStudentRegistration'):
+        return Response({
+            'success': False,
+            'error': 'Student registration is closed'
+        }, status=status.HTTP_403_FORBIDDEN)
+    
     try:
         username = request.data.get('username')
         password = request.data.get('password')
@@ -148,7 +213,8 @@ def register_view(request):
                 'role': user.role,
                 'is_group_leader': user.is_group_leader,
                 'roll_number': user.roll_number
-            }
+            },
+            'tokens': issue_tokens(user)
         }, status=status.HTTP_201_CREATED)
         
     except Exception as e:
@@ -160,6 +226,7 @@ def register_view(request):
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@throttle_classes(PASSWORD_RESET_THROTTLES)
 def forgot_password(request):
     """Send password reset email"""
     try:
@@ -189,9 +256,19 @@ def forgot_password(request):
             }, status=status.HTTP_404_NOT_FOUND)
         
         token = default_token_generator.make_token(user)
-        reset_link = f"http://localhost:3000/reset-password/{user.id}/{token}"
-        
-        print(f"\n=== PASSWORD RESET LINK ===\n{reset_link}\n==========================\n")
+        frontend_url = getattr(settings, 'FRONTEND_URL', 'http://localhost:3000').rstrip('/')
+        reset_link = f"{frontend_url}/reset-password/{user.id}/{token}"
+        
+        recipient = username_or_email if '@' in username_or_email else user.email
+        if recipient:
+            enqueue_email(
+                'Password Reset - GroupFlow',
+                f'Use this link to reset your password:\n\n{reset_link}\n\n'
+                f"If you didn't request this, please ignore this email.",
+                [recipient]
+            )
+        else:
+            logger.warning(f"No email address for {user.username}, reset link not sent")
         
         return Response({
             'success': True,
@@ -364,6 +441,12 @@ def create_group(request):
     group_size = serializer.validated_data['group_size']
     members_data = serializer.validated_data['members']
     
+    min_size = system_settings.get('features', 'minGroupSize')
+    max_size = system_settings.get('features', 'maxGroupSize')
+    if not min_size <= group_size <= max_size:
+        return Response({'error': f'Group size must be between {min_size} and {max_size}'},
+                       status=status.HTTP_400_BAD_REQUEST)
+    
     try:
         leader = Student.objects.get(roll_number=leader_roll)
     except Student.DoesNotExist:
@@ -418,20 +501,20 @@ def create_group(request):
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
+@throttle_classes([LookupIPThrottle])
 def get_student_name(request, roll_number):
     """Get student name by roll number"""
-    try:
-        student = Student.objects.get(roll_number=roll_number)
-        return Response({
-            'success': True,
-            'name': student.name,
-            'roll_number': student.roll_number
-        })
-    except Student.DoesNotExist:
+    name = student_name(roll_number)
+    if name is None:
         return Response({
             'success': False,
             'error': 'Student not found'
         }, status=status.HTTP_404_NOT_FOUND)
+    return Response({
+        'success': True,
+        'name': name,
+        'roll_number': roll_number
+    })
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
@@ -442,7 +525,7 @@ def check_group_status(request, roll_number):
         group_member = GroupMember.objects.filter(student=student).first()
         
         if group_member:
-            group = group_member.group
+            group = GroupSerializer.setup_eager_loading(Group.objects.all()).get(pk=group_member.group_id)
             # Use the updated GroupSerializer which now includes selection_details
             serializer = GroupSerializer(group)
             return Response({
@@ -457,6 +540,18 @@ def check_group_status(request, roll_number):
     except Student.DoesNotExist:
         return Response({'error': 'Student not found'}, status=status.HTTP_404_NOT_FOUND)
 
+def _group_limit(setting, instance=None):
+    """
+    Effective max_groups of a faculty/topic: its own limit, capped by the
+    system-wide features.<setting>. Without instance, a filter for the rows
+    still below it, so listings offer exactly what FCFS selection accepts.
+    """
+    cap = system_settings.get('features', setting)
+    if instance is not None:
+        return min(instance.max_groups, cap)
+    return Q(current_groups__lt=F('max_groups')) & Q(current_groups__lt=cap)
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def select_group_preferences_fcfs(request):
@@ -473,7 +568,14 @@ def select_group_preferences_fcfs(request):
     submission_time = now()
     
     # Format timestamp with milliseconds
-    timestamp_str = submission_time.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]  # Keep 3 digits for milliseconds
+    timestamp_str = _format_submitted_at(submission_time)
+    
+    if not system_settings.get('features', 'allowTopicSelection'):
+        return Response({
+            'success': False,
+            'error': 'Topic selection is closed',
+            'timestamp': timestamp_str
+        }, status=status.HTTP_403_FORBIDDEN)
     
     try:
         group = Group.objects.get(group_id=group_id)
@@ -486,36 +588,34 @@ def select_group_preferences_fcfs(request):
                 'timestamp': timestamp_str
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        # Check faculty availability with LOCK to prevent race conditions
-        from django.db import transaction
-        with transaction.atomic():
-            # Lock the faculty row for update
+        # Check and update the counts in one write transaction: the faculty
+        # and topic rows stay locked until the selection is saved
+        with write_transaction():
             faculty = Faculty.objects.select_for_update().get(id=faculty_id)
+            faculty_max = _group_limit('maxGroupsPerFaculty', faculty)
             
-            if faculty.current_groups >= faculty.max_groups:
+            if faculty.current_groups >= faculty_max:
                 return Response({
                     'success': False,
                     'error': 'Faculty has reached maximum groups',
                     'faculty_current': faculty.current_groups,
-                    'faculty_max': faculty.max_groups,
+                    'faculty_max': faculty_max,
                     'timestamp': timestamp_str
                 }, status=status.HTTP_400_BAD_REQUEST)
-        
-        # Check topic availability with LOCK
-        with transaction.atomic():
+            
             topic = Topic.objects.select_for_update().get(id=topic_id)
+            topic_max = _group_limit('maxGroupsPerTopic', topic)
             
-            if topic.current_groups >= topic.max_groups:
+            if topic.current_groups >= topic_max:
                 return Response({
                     'success': False,
                     'error': 'Topic has reached maximum groups',
                     'topic_current': topic.current_groups,
-                    'topic_max': topic.max_groups,
+                    'topic_max': topic_max,
                     'timestamp': timestamp_str
                 }, status=status.HTTP_400_BAD_REQUEST)
-        
-        # Create selection with timestamp
-        with transaction.atomic():
+            
+            # Create selection with timestamp
             selection = GroupSelection.objects.create(
                 group=group,
                 faculty=faculty,
@@ -526,19 +626,17 @@ def select_group_preferences_fcfs(request):
             
             # Update counts
             faculty.current_groups += 1
-            if faculty.current_groups >= faculty.max_groups:
+            if faculty.current_groups >= faculty_max:
                 faculty.is_available = False
             faculty.save()
             
             topic.current_groups += 1
-            if topic.current_groups >= topic.max_groups:
+            if topic.current_groups >= topic_max:
                 topic.is_available = False
             topic.save()
         
         # Get queue position
-        queue_position = GroupSelection.objects.filter(
-            submitted_at__lt=submission_time
-        ).count() + 1
+        queue_position = _queue_position(GroupSelection.objects.all(), selection.submitted_at, selection.id)
         
         serializer = GroupSelectionSerializer(selection)
         
@@ -574,9 +672,14 @@ def select_group_preferences_fcfs(request):
 @permission_classes([IsAuthenticated])
 def get_available_faculty(request):
     """Get available faculty members"""
-    faculty = Faculty.objects.filter(is_available=True, current_groups__lt=F('max_groups'))
-    serializer = FacultySerializer(faculty, many=True)
-    return Response(serializer.data)
+    limit = _group_limit('maxGroupsPerFaculty')
+
+    def available():
+        faculty = Faculty.objects.filter(limit, is_available=True)
+        return FacultySerializer(faculty, many=True).data
+    # The cap is part of the key: lowering the setting doesn't touch the catalog version
+    cap = system_settings.get('features', 'maxGroupsPerFaculty')
+    return Response(catalog_cache.get_or_set(('available_faculty', cap), available))
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
@@ -683,68 +786,168 @@ def import_faculty_from_sheet(request):
 @permission_classes([IsAuthenticated])
 def get_domains(request):
     """Get all domains"""
-    domains = Domain.objects.all()
-    serializer = DomainSerializer(domains, many=True)
-    return Response(serializer.data)
+    return Response(catalog_cache.get_or_set(
+        'domains', lambda: DomainSerializer(Domain.objects.all(), many=True).data
+    ))
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_topics_by_domain(request, domain_id):
     """Get topics for a specific domain"""
-    topics = Topic.objects.filter(domain_id=domain_id, is_available=True)
-    serializer = TopicSerializer(topics, many=True)
-    return Response(serializer.data)
+    limit = _group_limit('maxGroupsPerTopic')
+
+    def topics():
+        queryset = TopicSerializer.setup_eager_loading(
+            Topic.objects.filter(limit, domain_id=domain_id, is_available=True)
+        )
+        return TopicSerializer(queryset, many=True).data
+    cap = system_settings.get('features', 'maxGroupsPerTopic')
+    return Response(catalog_cache.get_or_set(('topics', domain_id, cap), topics))
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@read_replica
 def faculty_dashboard(request, faculty_id):
     """Get groups assigned to a faculty member"""
     try:
         faculty = Faculty.objects.get(id=faculty_id)
-        selections = GroupSelection.objects.filter(faculty=faculty)
+        selections = GroupSelectionSerializer.setup_eager_loading(
+            GroupSelection.objects.filter(faculty=faculty)
+        )
         serializer = GroupSelectionSerializer(selections, many=True)
         return Response(serializer.data)
     except Faculty.DoesNotExist:
         return Response({'error': 'Faculty not found'}, status=status.HTTP_404_NOT_FOUND)
     
 
+SELECTION_QUEUE_FILTERS = ('domain_id', 'faculty_id', 'topic_id')
+SELECTION_QUEUE_PAGE_SIZE = 50
+SELECTION_QUEUE_MAX_PAGE_SIZE = 500
+
+
+def _filtered_selection_queue(params):
+    """GroupSelection queryset filtered by any combination of domain/faculty/topic.
+
+    Raises ValueError for non-numeric filter values.
+    """
+    queue = GroupSelection.objects.all()
+    for name in SELECTION_QUEUE_FILTERS:
+        value = params.get(name)
+        if value:
+            queue = queue.filter(**{name: int(value)})
+    return queue
+
+
+def _format_submitted_at(submitted_at):
+    """Queue timestamps as the FCFS endpoints have always sent them, to the millisecond"""
+    return submitted_at.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]
+
+
+def _queue_position(queue, submitted_at, selection_id):
+    """1-based FCFS position of a selection within `queue` using an indexed count.
+
+    Ties on submitted_at are broken by id so positions are stable.
+    """
+    ahead = queue.filter(
+        Q(submitted_at__lt=submitted_at) | Q(submitted_at=submitted_at, id__lt=selection_id)
+    ).count()
+    return ahead + 1
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@read_replica
 def get_selection_queue(request):
-    """Get current queue status for FCFS"""
-    
-    domain_id = request.GET.get('domain_id')
-    faculty_id = request.GET.get('faculty_id')
-    
-    if domain_id:
-        queue = GroupSelection.objects.filter(
-            domain_id=domain_id,
-            submitted_at__isnull=False
-        ).order_by('submitted_at')
-    elif faculty_id:
-        queue = GroupSelection.objects.filter(
-            faculty_id=faculty_id,
-            submitted_at__isnull=False
-        ).order_by('submitted_at')
+    """Get current queue status for FCFS
+
+    Without page/page_size the whole queue is returned in the original
+    shape; with either of them the queue is paginated and `total` counts
+    the whole queue. `group_id` adds that group's position, so pollers
+    need one request.
+    """
+    
+    paginated = 'page' in request.GET or 'page_size' in request.GET
+    try:
+        queue = _filtered_selection_queue(request.GET)
+        page = max(int(request.GET.get('page', 1)), 1)
+        page_size = int(request.GET.get('page_size', SELECTION_QUEUE_PAGE_SIZE))
+    except ValueError:
+        return Response({
+            'success': False,
+            'error': 'Invalid filter or pagination parameter'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    rows = queue.order_by('submitted_at', 'id').values_list(
+        'group__group_id', 'submitted_at', 'faculty__name', 'domain__name', 'topic__name'
+    )
+    if paginated:
+        page_size = min(max(page_size, 1), SELECTION_QUEUE_MAX_PAGE_SIZE)
+        offset = (page - 1) * page_size
+        rows = rows[offset:offset + page_size]
     else:
-        queue = GroupSelection.objects.all().order_by('submitted_at')
-    
-    queue_data = []
-    for idx, item in enumerate(queue, 1):
-        queue_data.append({
-            'position': idx,
-            'group_id': item.group.group_id,
-            'submitted_at': item.submitted_at.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3],
-            'faculty': item.faculty.name if item.faculty else None,
-            'domain': item.domain.name if item.domain else None
+        offset = 0
+    
+    queue_data = [{
+        'position': offset + idx,
+        'group_id': group_id,
+        'submitted_at': _format_submitted_at(submitted_at),
+        'faculty': faculty_name,
+        'domain': domain_name,
+        'topic': topic_name
+    } for idx, (group_id, submitted_at, faculty_name, domain_name, topic_name) in enumerate(rows, 1)]
+    
+    data = {
+        'success': True,
+        'queue': queue_data,
+    }
+    if paginated:
+        total = queue.count()
+        data.update({
+            'total': total,
+            'page': page,
+            'page_size': page_size,
+            'has_next': offset + page_size < total
         })
+    else:
+        data['total'] = len(queue_data)
+    
+    group_id = request.GET.get('group_id')
+    if group_id:
+        selection = queue.filter(group__group_id=group_id).values('id', 'submitted_at').first()
+        data['group_position'] = (
+            _queue_position(queue, selection['submitted_at'], selection['id']) if selection else None
+        )
+    
+    return Response(data)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_queue_position(request, group_id):
+    """Get a single group's FCFS position without listing the queue"""
+    
+    try:
+        queue = _filtered_selection_queue(request.GET)
+    except ValueError:
+        return Response({
+            'success': False,
+            'error': 'Invalid filter parameter'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    selection = queue.filter(group__group_id=group_id).values('id', 'submitted_at').first()
+    if not selection:
+        return Response({
+            'success': False,
+            'error': 'Group has no selection in this queue'
+        }, status=status.HTTP_404_NOT_FOUND)
     
     return Response({
         'success': True,
-        'queue': queue_data,
-        'total': len(queue_data)
+        'group_id': group_id,
+        'position': _queue_position(queue, selection['submitted_at'], selection['id']),
+        'submitted_at': _format_submitted_at(selection['submitted_at'])
     })
 
 
@@ -752,6 +955,7 @@ def get_selection_queue(request):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@read_replica
 def get_all_faculties(request):
     """Get all faculties (for admin)"""
     faculties = Faculty.objects.all()
@@ -868,6 +1072,7 @@ def admin_create_domain(request):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@read_replica
 def admin_get_all_groups(request):
     """Get all groups with their details for admin view"""
     
@@ -921,6 +1126,7 @@ def admin_get_all_groups(request):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@read_replica
 def admin_get_all_students(request):
     """Get all students with their group info"""
     
@@ -1019,6 +1225,8 @@ def admin_delete_topic(request, topic_id):
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@authentication_classes([])
+@throttle_classes(LOGIN_THROTTLES)
 def super_admin_login_view(request):
     """Handle super admin login"""
     serializer = LoginSerializer(data=request.data)
@@ -1033,9 +1241,10 @@ def super_admin_login_view(request):
     if user is not None and user.role == 'super_admin':
         auth_login(request, user)
         
-        AdminLoginLog.objects.create(
+        record_audit(
+            AdminLoginLog,
             user=user,
-            ip_address=request.META.get('REMOTE_ADDR'),
+            ip_address=client_ip(request),
             user_agent=request.META.get('HTTP_USER_AGENT', ''),
             success=True,
             two_factor_used=False
@@ -1049,11 +1258,13 @@ def super_admin_login_view(request):
                 'role': user.role,
                 'is_group_leader': user.is_group_leader,
                 'roll_number': user.roll_number
-            }
+            },
+            'tokens': issue_tokens(user)
         })
     else:
-        AdminLoginLog.objects.create(
-            ip_address=request.META.get('REMOTE_ADDR'),
+        record_audit(
+            AdminLoginLog,
+            ip_address=client_ip(request),
             user_agent=request.META.get('HTTP_USER_AGENT', ''),
             success=False
         )
@@ -1066,6 +1277,7 @@ def super_admin_login_view(request):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@read_replica
 def super_admin_dashboard_stats(request):
     """Get real statistics for super admin dashboard"""
     
@@ -1073,20 +1285,57 @@ def super_admin_dashboard_stats(request):
         return Response({'error': 'Unauthorized'}, status=status.HTTP_403_FORBIDDEN)
     
     try:
+        users = user_totals()
+        catalog = catalog_totals()
         stats = {
-            'totalAdmins': User.objects.filter(role='admin').count(),
-            'totalStudents': Student.objects.count(),
-            'totalFaculty': Faculty.objects.count(),
+            'totalAdmins': users['admins'],
+            'totalStudents': users['students'],
+            'totalFaculty': users['faculty'],
             'totalGroups': Group.objects.count(),
-            'pendingRecoveries': RecoveryLog.objects.filter(success=False).count(),
-            'totalDomains': Domain.objects.count(),
-            'totalTopics': Topic.objects.count(),
+            'pendingRecoveries': rollup_totals()['failed_recoveries'],
+            'totalDomains': catalog['total'],
+            'totalTopics': catalog['topics'],
         }
         return Response(stats)
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def super_admin_throttle_metrics(request):
+    """Served vs throttled request counts per throttle scope"""
+    
+    if request.user.role != 'super_admin':
+        return Response({'error': 'Unauthorized'}, status=status.HTTP_403_FORBIDDEN)
+    
+    return Response({'success': True, 'throttles': throttle_metrics()})
+
+
+@api_view(['GET', 'DELETE'])
+@permission_classes([IsAuthenticated])
+def super_admin_instrumentation(request):
+    """
+    Database pool counters and per-view query statistics of the worker process
+    serving the request. DELETE clears the view statistics.
+    """
+    
+    if request.user.role != 'super_admin':
+        return Response({'error': 'Unauthorized'}, status=status.HTTP_403_FORBIDDEN)
+    
+    if request.method == 'DELETE':
+        reset_view_stats()
+        return Response({'success': True, 'pid': os.getpid()})
+    
+    return Response({
+        'success': True,
+        'pid': os.getpid(),
+        'databases': pool_stats(),
+        'query_instrumentation': settings.QUERY_INSTRUMENTATION,
+        'views': view_stats(),
+    })
+
+
 # ==================== BIOMETRIC AUTHENTICATION ====================
 
 @api_view(['GET'])
@@ -1245,7 +1494,8 @@ def verify_biometric_login(request):
                 'id': user.id,
                 'username': user.username,
                 'role': user.role
-            }
+            },
+            'tokens': issue_tokens(user)
         })
         
     except Exception as e:
@@ -1355,7 +1605,8 @@ def emergency_paper_recovery(request):
             user.set_password(temp_password)
             user.save()
             
-            RecoveryLog.objects.create(
+            record_audit(
+                RecoveryLog,
                 user=user,
                 method='paper_key',
                 success=True,
@@ -1380,72 +1631,49 @@ def emergency_paper_recovery(request):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@read_replica
 def super_admin_analytics(request):
     """Get comprehensive analytics for super admin"""
     
     if request.user.role != 'super_admin':
         return Response({'error': 'Unauthorized'}, status=status.HTTP_403_FORBIDDEN)
     
+    granularity = request.GET.get('granularity', 'day')
+    if granularity not in GRANULARITY_STEP:
+        return Response({'error': 'granularity must be hour or day'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        today = timezone.localdate()
+        end = datetime.strptime(request.GET['end'], '%Y-%m-%d').date() if 'end' in request.GET else today
+        start = datetime.strptime(request.GET['start'], '%Y-%m-%d').date() if 'start' in request.GET else end - timezone.timedelta(days=6)
+    except ValueError:
+        return Response({'error': 'start/end must be dates in YYYY-MM-DD format'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    if start > end:
+        return Response({'error': 'start must not be after end'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    if granularity == 'hour' and (end - start).days > 31:
+        return Response({'error': 'Hourly analytics are limited to 31 days'}, status=status.HTTP_400_BAD_REQUEST)
+    
     try:
-        end_date = timezone.now()
-        start_date = end_date - timezone.timedelta(days=7)
+        range_start = timezone.make_aware(datetime.combine(start, datetime.min.time()))
+        range_end = timezone.make_aware(datetime.combine(end + timezone.timedelta(days=1), datetime.min.time()))
+        series = activity_series(range_start, range_end, granularity)
         
-        daily_activity = []
-        for i in range(7):
-            day = end_date - timezone.timedelta(days=i)
-            next_day = day + timezone.timedelta(days=1)
-            
-            logins = AdminLoginLog.objects.filter(
-                timestamp__gte=day,
-                timestamp__lt=next_day
-            ).count()
-            
-            groups = Group.objects.filter(
-                created_at__gte=day,
-                created_at__lt=next_day
-            ).count()
-            
-            selections = GroupSelection.objects.filter(
-                selected_at__gte=day,
-                selected_at__lt=next_day
-            ).count()
-            
-            daily_activity.append({
-                'date': day.date(),
-                'logins': logins,
-                'groupCreations': groups,
-                'selections': selections,
-                'total': logins + groups + selections
-            })
+        groups = group_totals()
+        selections = selection_totals()
         
         analytics = {
-            'users': {
-                'total': User.objects.count(),
-                'students': Student.objects.count(),
-                'faculty': Faculty.objects.count(),
-                'admins': User.objects.filter(role='admin').count(),
-                'superAdmins': User.objects.filter(role='super_admin').count()
-            },
-            'groups': {
-                'total': Group.objects.count(),
-                'active': Group.objects.filter(is_complete=False).count(),
-                'completed': Group.objects.filter(is_complete=True).count(),
-                'twoMember': Group.objects.filter(size=2).count(),
-                'fourMember': Group.objects.filter(size=4).count()
-            },
-            'domains': {
-                'total': Domain.objects.count(),
-                'topics': Topic.objects.count()
-            },
-            'selections': {
-                'total': GroupSelection.objects.count(),
-                'approved': GroupSelection.objects.filter(is_approved=True).count(),
-                'pending': GroupSelection.objects.filter(is_approved=False).count()
-            },
+            'users': user_totals(),
+            'groups': groups,
+            'domains': catalog_totals(),
+            'selections': selections,
             'activity': {
-                'last7Days': daily_activity,
-                'totalLogins': AdminLoginLog.objects.filter(success=True).count(),
-                'totalActions': Group.objects.count() + GroupSelection.objects.count()
+                'range': {'start': start, 'end': end, 'granularity': granularity},
+                'series': series,
+                'last7Days': series,  # kept for older dashboards
+                'totalLogins': rollup_totals()['successful_logins'],
+                'totalActions': groups['total'] + selections['total']
             }
         }
         
@@ -1455,6 +1683,119 @@ def super_admin_analytics(request):
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@read_replica
+def super_admin_analytics_history(request):
+    """Historical activity over an arbitrary range, bucketed minute..month"""
+    
+    if request.user.role != 'super_admin':
+        return Response({'error': 'Unauthorized'}, status=status.HTTP_403_FORBIDDEN)
+    
+    granularity = request.GET.get('granularity', 'day')
+    if granularity not in HISTORY_PERIODS:
+        return Response({
+            'error': f'granularity must be one of {", ".join(HISTORY_PERIODS)}'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        today = timezone.localdate()
+        end = datetime.strptime(request.GET['end'], '%Y-%m-%d').date() if 'end' in request.GET else today
+        start = datetime.strptime(request.GET['start'], '%Y-%m-%d').date() if 'start' in request.GET else end - timezone.timedelta(days=29)
+        opening = None
+        if request.GET.get('opening'):
+            opening = datetime.fromisoformat(request.GET['opening'])
+            if timezone.is_naive(opening):
+                opening = timezone.make_aware(opening)
+    except ValueError:
+        return Response({
+            'error': 'start/end must be YYYY-MM-DD and opening an ISO datetime'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    if start > end:
+        return Response({'error': 'start must not be after end'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    range_start = timezone.make_aware(datetime.combine(start, datetime.min.time()))
+    range_end = timezone.make_aware(datetime.combine(end + timezone.timedelta(days=1), datetime.min.time()))
+    
+    try:
+        history = history_series(range_start, range_end, granularity, opening)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    return Response({
+        'range': {'start': start, 'end': end, 'granularity': granularity},
+        **history
+    })
+
+
+# Audit log page filter -> (archived model, exact-match filters)
+AUDIT_LOG_FILTERS = {
+    'LOGIN': ('adminloginlog', {'success': True}),
+    'FAILED_LOGIN': ('adminloginlog', {'success': False}),
+    'CREATE_ADMIN': ('recoverylog', {'method': 'create_admin'}),
+    'DELETE_ADMIN': ('recoverylog', {'method': 'delete_admin'}),
+    'PASSWORD_RESET': ('recoverylog', {'method': 'password_reset'}),
+    'EMERGENCY_RECOVERY': ('recoverylog', {'method': 'paper_key'}),
+}
+
+
+def _audit_log_entry(name, row):
+    if name == 'adminloginlog':
+        action = 'LOGIN' if row['success'] else 'FAILED_LOGIN'
+        details = {'user_agent': row['user_agent'], 'two_factor_used': row['two_factor_used']}
+    else:
+        action = 'EMERGENCY_RECOVERY' if row['method'] == 'paper_key' else row['method'].upper()
+        details = row['metadata']
+    return {
+        'id': f"{name}-{row['id']}",
+        'timestamp': row['timestamp'],
+        'user': row['user__username'] or 'unknown',
+        'action': action,
+        'ip_address': row['ip_address'],
+        'success': row['success'],
+        'details': details
+    }
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@read_replica
+def super_admin_audit_logs(request):
+    """Login and recovery audit trail, including rows already moved to the archives"""
+    
+    if request.user.role != 'super_admin':
+        return Response({'error': 'Unauthorized'}, status=status.HTTP_403_FORBIDDEN)
+    
+    action = request.GET.get('filter', 'all')
+    if action != 'all' and action not in AUDIT_LOG_FILTERS:
+        return Response({'error': f'Unknown filter {action}'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        start = end = None
+        if request.GET.get('start'):
+            start = timezone.make_aware(datetime.strptime(request.GET['start'], '%Y-%m-%d'))
+        if request.GET.get('end'):
+            end = timezone.make_aware(datetime.strptime(request.GET['end'], '%Y-%m-%d')) + timezone.timedelta(days=1)
+        limit = min(int(request.GET.get('limit', 500)), 5000)
+    except ValueError:
+        return Response({
+            'error': 'start/end must be YYYY-MM-DD and limit an integer'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    if action == 'all':
+        sources = [('adminloginlog', {}), ('recoverylog', {})]
+    else:
+        sources = [AUDIT_LOG_FILTERS[action]]
+    
+    entries = []
+    for name, filters in sources:
+        entries.extend(_audit_log_entry(name, row) for row in audit_rows(name, start, end, limit, **filters))
+    entries.sort(key=lambda entry: entry['timestamp'], reverse=True)
+    
+    return Response(entries[:limit])
+
+
 @api_view(['GET', 'POST'])
 @permission_classes([IsAuthenticated])
 def super_admin_settings(request):
@@ -1463,94 +1804,24 @@ def super_admin_settings(request):
     if request.user.role != 'super_admin':
         return Response({'error': 'Unauthorized'}, status=status.HTTP_403_FORBIDDEN)
     
-    default_settings = {
-        'general': {
-            'siteName': 'GroupFlow',
-            'siteUrl': 'http://localhost:3000',
-            'adminEmail': 'admin@groupflow.com',
-            'timezone': 'Asia/Kolkata',
-            'dateFormat': 'YYYY-MM-DD',
-            'timeFormat': '24h'
-        },
-        'security': {
-            'sessionTimeout': 30,
-            'maxLoginAttempts': 5,
-            'lockoutDuration': 15,
-            'passwordMinLength': 8,
-            'passwordRequireUppercase': True,
-            'passwordRequireLowercase': True,
-            'passwordRequireNumbers': True,
-            'passwordRequireSpecial': True,
-            'twoFactorRequired': False,
-            'sessionPerUser': True,
-            'ipWhitelist': []
-        },
-        'email': {
-            'smtpHost': 'smtp.gmail.com',
-            'smtpPort': 587,
-            'smtpUser': 'noreply@groupflow.com',
-            'smtpPassword': '',
-            'useTLS': True,
-            'fromEmail': 'noreply@groupflow.com',
-            'fromName': 'GroupFlow System'
-        },
-        'features': {
-            'allowStudentRegistration': True,
-            'allowFacultyRegistration': False,
-            'requireEmailVerification': True,
-            'requirePhoneVerification': False,
-            'maxGroupSize': 4,
-            'minGroupSize': 2,
-            'allowTopicSelection': True,
-            'maxGroupsPerTopic': 3,
-            'maxGroupsPerFaculty': 3
-        },
-        'backup': {
-            'autoBackup': True,
-            'backupFrequency': 'daily',
-            'backupTime': '02:00',
-            'retentionDays': 30,
-            'lastBackup': None
-        },
-        'notifications': {
-            'emailNotifications': True,
-            'smsNotifications': False,
-            'adminAlerts': True,
-            'securityAlerts': True,
-            'backupAlerts': True,
-            'dailyDigest': False
-        }
-    }
-    
     if request.method == 'GET':
-        try:
-            settings_file = os.path.join(settings.BASE_DIR, 'system_settings.json')
-            if os.path.exists(settings_file):
-                with open(settings_file, 'r') as f:
-                    saved_settings = json.load(f)
-                return Response(saved_settings)
-            else:
-                return Response(default_settings)
-        except Exception as e:
-            return Response(default_settings)
+        return Response(system_settings.all())
     
     elif request.method == 'POST':
         try:
             new_settings = request.data
             
-            required_sections = ['general', 'security', 'email', 'features', 'backup', 'notifications']
-            for section in required_sections:
+            for section in REQUIRED_SECTIONS:
                 if section not in new_settings:
                     return Response({
                         'success': False,
                         'error': f'Missing {section} settings'
                     }, status=status.HTTP_400_BAD_REQUEST)
             
-            settings_file = os.path.join(settings.BASE_DIR, 'system_settings.json')
-            with open(settings_file, 'w') as f:
-                json.dump(new_settings, f, indent=2)
+            system_settings.save(new_settings)
             
-            RecoveryLog.objects.create(
+            record_audit(
+                RecoveryLog,
                 user=request.user,
                 method='settings_update',
                 success=True,
@@ -1563,7 +1834,8 @@ def super_admin_settings(request):
             })
             
         except Exception as e:
-            RecoveryLog.objects.create(
+            record_audit(
+                RecoveryLog,
                 user=request.user,
                 method='settings_update',
                 success=False,
@@ -1584,71 +1856,12 @@ def super_admin_settings_reset(request):
     if request.user.role != 'super_admin':
         return Response({'error': 'Unauthorized'}, status=status.HTTP_403_FORBIDDEN)
     
-    default_settings = {
-        'general': {
-            'siteName': 'GroupFlow',
-            'siteUrl': 'http://localhost:3000',
-            'adminEmail': 'admin@groupflow.com',
-            'timezone': 'Asia/Kolkata',
-            'dateFormat': 'YYYY-MM-DD',
-            'timeFormat': '24h'
-        },
-        'security': {
-            'sessionTimeout': 30,
-            'maxLoginAttempts': 5,
-            'lockoutDuration': 15,
-            'passwordMinLength': 8,
-            'passwordRequireUppercase': True,
-            'passwordRequireLowercase': True,
-            'passwordRequireNumbers': True,
-            'passwordRequireSpecial': True,
-            'twoFactorRequired': False,
-            'sessionPerUser': True,
-            'ipWhitelist': []
-        },
-        'email': {
-            'smtpHost': 'smtp.gmail.com',
-            'smtpPort': 587,
-            'smtpUser': 'noreply@groupflow.com',
-            'smtpPassword': '',
-            'useTLS': True,
-            'fromEmail': 'noreply@groupflow.com',
-            'fromName': 'GroupFlow System'
-        },
-        'features': {
-            'allowStudentRegistration': True,
-            'allowFacultyRegistration': False,
-            'requireEmailVerification': True,
-            'requirePhoneVerification': False,
-            'maxGroupSize': 4,
-            'minGroupSize': 2,
-            'allowTopicSelection': True,
-            'maxGroupsPerTopic': 3,
-            'maxGroupsPerFaculty': 3
-        },
-        'backup': {
-            'autoBackup': True,
-            'backupFrequency': 'daily',
-            'backupTime': '02:00',
-            'retentionDays': 30,
-            'lastBackup': None
-        },
-        'notifications': {
-            'emailNotifications': True,
-            'smsNotifications': False,
-            'adminAlerts': True,
-            'securityAlerts': True,
-            'backupAlerts': True,
-            'dailyDigest': False
-        }
-    }
-    
     try:
-        settings_file = os.path.join(settings.BASE_DIR, 'system_settings.json')
-        with open(settings_file, 'w') as f:
-            json.dump(default_settings, f, indent=2)
+        default_settings = deepcopy(DEFAULT_SETTINGS)
+        system_settings.save(default_settings)
         
-        RecoveryLog.objects.create(
+        record_audit(
+            RecoveryLog,
             user=request.user,
             method='settings_reset',
             success=True
@@ -1678,19 +1891,18 @@ def test_email(request):
     try:
         email_config = request.data
         
-        old_settings = {
-            'EMAIL_HOST': settings.EMAIL_HOST,
-            'EMAIL_PORT': settings.EMAIL_PORT,
-            'EMAIL_HOST_USER': settings.EMAIL_HOST_USER,
-            'EMAIL_HOST_PASSWORD': settings.EMAIL_HOST_PASSWORD,
-            'EMAIL_USE_TLS': settings.EMAIL_USE_TLS,
-        }
-        
-        settings.EMAIL_HOST = email_config.get('smtpHost', settings.EMAIL_HOST)
-        settings.EMAIL_PORT = email_config.get('smtpPort', settings.EMAIL_PORT)
-        settings.EMAIL_HOST_USER = email_config.get('smtpUser', settings.EMAIL_HOST_USER)
-        settings.EMAIL_HOST_PASSWORD = email_config.get('smtpPassword', settings.EMAIL_HOST_PASSWORD)
-        settings.EMAIL_USE_TLS = email_config.get('useTLS', settings.EMAIL_USE_TLS)
+        # Verifying the SMTP settings needs the result, so this one is sent inline
+        # with a bounded timeout instead of going through the outbox
+        connection = get_connection(
+            'django.core.mail.backends.smtp.EmailBackend',
+            host=email_config.get('smtpHost', settings.EMAIL_HOST),
+            port=email_config.get('smtpPort', settings.EMAIL_PORT),
+            username=email_config.get('smtpUser', settings.EMAIL_HOST_USER),
+            password=email_config.get('smtpPassword', settings.EMAIL_HOST_PASSWORD),
+            use_tls=email_config.get('useTLS', settings.EMAIL_USE_TLS),
+            timeout=getattr(settings, 'EMAIL_TEST_TIMEOUT', 10),
+            fail_silently=False,
+        )
         
         send_mail(
             'Test Email from GroupFlow',
@@ -1699,13 +1911,11 @@ def test_email(request):
             f'If you received this, your email settings are working correctly!',
             email_config.get('fromEmail', settings.DEFAULT_FROM_EMAIL),
             [request.user.email],
-            fail_silently=False,
+            connection=connection,
         )
         
-        for key, value in old_settings.items():
-            setattr(settings, key, value)
-        
-        RecoveryLog.objects.create(
+        record_audit(
+            RecoveryLog,
             user=request.user,
             method='test_email',
             success=True
@@ -1717,7 +1927,8 @@ def test_email(request):
         })
         
     except Exception as e:
-        RecoveryLog.objects.create(
+        record_audit(
+            RecoveryLog,
             user=request.user,
             method='test_email',
             success=False,
@@ -1733,99 +1944,55 @@ def test_email(request):
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def manual_backup(request):
-    """Perform manual system backup"""
+    """Start a manual system backup in the background; poll backup_status for progress"""
     
     if request.user.role != 'super_admin':
         return Response({'error': 'Unauthorized'}, status=status.HTTP_403_FORBIDDEN)
     
     try:
-        backup_dir = os.path.join(settings.BASE_DIR, 'backups')
-        os.makedirs(backup_dir, exist_ok=True)
-        
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        
-        db_settings = settings.DATABASES['default']
-        db_engine = db_settings['ENGINE']
-        
-        backup_info = {
-            'timestamp': timestamp,
-            'type': 'manual',
-            'files': []
-        }
-        
-        if 'sqlite' in db_engine:
-            db_path = db_settings['NAME']
-            backup_file = os.path.join(backup_dir, f'db_backup_{timestamp}.sqlite3')
-            shutil.copy2(db_path, backup_file)
-            backup_info['files'].append({
-                'type': 'database',
-                'file': f'db_backup_{timestamp}.sqlite3',
-                'size': os.path.getsize(backup_file)
-            })
-            
-        elif 'postgresql' in db_engine:
-            backup_file = os.path.join(backup_dir, f'db_backup_{timestamp}.sql')
-            db_name = db_settings['NAME']
-            db_user = db_settings['USER']
-            db_host = db_settings.get('HOST', 'localhost')
-            db_port = db_settings.get('PORT', '5432')
-            
-            cmd = f"pg_dump -h {db_host} -p {db_port} -U {db_user} -d {db_name} > {backup_file}"
-            subprocess.run(cmd, shell=True, check=True)
-            backup_info['files'].append({
-                'type': 'database',
-                'file': f'db_backup_{timestamp}.sql',
-                'size': os.path.getsize(backup_file) if os.path.exists(backup_file) else 0
-            })
-        
-        if hasattr(settings, 'MEDIA_ROOT') and os.path.exists(settings.MEDIA_ROOT):
-            media_backup = os.path.join(backup_dir, f'media_backup_{timestamp}.zip')
-            shutil.make_archive(media_backup.replace('.zip', ''), 'zip', settings.MEDIA_ROOT)
-            backup_info['files'].append({
-                'type': 'media',
-                'file': f'media_backup_{timestamp}.zip',
-                'size': os.path.getsize(media_backup) if os.path.exists(media_backup) else 0
-            })
-        
-        info_file = os.path.join(backup_dir, f'backup_{timestamp}.json')
-        with open(info_file, 'w') as f:
-            json.dump(backup_info, f, indent=2)
-        
-        settings_file = os.path.join(settings.BASE_DIR, 'system_settings.json')
-        if os.path.exists(settings_file):
-            with open(settings_file, 'r') as f:
-                current_settings = json.load(f)
-            if 'backup' not in current_settings:
-                current_settings['backup'] = {}
-            current_settings['backup']['lastBackup'] = timestamp
-            with open(settings_file, 'w') as f:
-                json.dump(current_settings, f, indent=2)
-        
-        RecoveryLog.objects.create(
-            user=request.user,
-            method='manual_backup',
-            success=True,
-            metadata=backup_info
-        )
-        
+        job = start_backup('manual', user=request.user, ip_address=client_ip(request) or '127.0.0.1')
+    except BackupRunning as e:
         return Response({
-            'success': True,
-            'message': 'Backup completed successfully',
-            'backup': backup_info
-        })
-        
+            'success': False,
+            'error': 'A backup is already running',
+            'job': e.job
+        }, status=status.HTTP_409_CONFLICT)
     except Exception as e:
-        RecoveryLog.objects.create(
+        record_audit(
+            RecoveryLog,
             user=request.user,
             method='manual_backup',
+            ip_address=client_ip(request) or '127.0.0.1',
             success=False,
             metadata={'error': str(e)}
         )
-        
         return Response({
             'success': False,
             'error': f'Backup failed: {str(e)}'
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    
+    return Response({
+        'success': True,
+        'message': 'Backup started',
+        'job': job.state
+    }, status=status.HTTP_202_ACCEPTED)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def backup_status(request, job_id=None):
+    """Progress of one backup job, or the most recent jobs and run history"""
+    
+    if request.user.role != 'super_admin':
+        return Response({'error': 'Unauthorized'}, status=status.HTTP_403_FORBIDDEN)
+    
+    if job_id is None:
+        return Response({'success': True, 'jobs': recent_jobs(), 'history': backup_history()})
+    
+    job = get_job(job_id)
+    if job is None:
+        return Response({'error': 'Backup job not found'}, status=status.HTTP_404_NOT_FOUND)
+    return Response({'success': True, 'job': job})
 
 
 # ==================== OTP VERIFICATION ====================
@@ -1842,6 +2009,8 @@ def verify_otp_helper(secret, otp):
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@authentication_classes([])
+@throttle_classes(LOGIN_THROTTLES)
 def admin_login_view(request):
     """Enhanced admin login with 2FA and security features"""
     
@@ -1849,7 +2018,8 @@ def admin_login_view(request):
     password = request.data.get('password')
     otp = request.data.get('otp')
     
-    ip = request.META.get('REMOTE_ADDR')
+    ip = client_ip(request)
+    # Throttle buckets may be per worker; the login log is shared by all of them
     recent_attempts = AdminLoginLog.objects.filter(
         ip_address=ip,
         timestamp__gte=timezone.now() - timezone.timedelta(minutes=15)
@@ -1866,7 +2036,8 @@ def admin_login_view(request):
     if user and user.role == 'admin':
         if user.two_factor_enabled:
             if not verify_otp_helper(user.totp_secret, otp):
-                AdminLoginLog.objects.create(
+                record_audit(
+                    AdminLoginLog,
                     user=user,
                     ip_address=ip,
                     user_agent=request.META.get('HTTP_USER_AGENT', ''),
@@ -1877,7 +2048,8 @@ def admin_login_view(request):
                     'error': 'Invalid 2FA code'
                 }, status=status.HTTP_401_UNAUTHORIZED)
         
-        AdminLoginLog.objects.create(
+        record_audit(
+            AdminLoginLog,
             user=user,
             ip_address=ip,
             user_agent=request.META.get('HTTP_USER_AGENT', ''),
@@ -1894,10 +2066,12 @@ def admin_login_view(request):
                 'username': user.username,
                 'role': user.role,
                 'two_factor_enabled': user.two_factor_enabled
-            }
+            },
+            'tokens': issue_tokens(user)
         })
     
-    AdminLoginLog.objects.create(
+    record_audit(
+        AdminLoginLog,
         ip_address=ip,
         user_agent=request.META.get('HTTP_USER_AGENT', ''),
         success=False
@@ -1944,7 +2118,8 @@ def super_admin_create_admin(request):
             role='admin'
         )
         
-        RecoveryLog.objects.create(
+        record_audit(
+            RecoveryLog,
             user=request.user,
             method='create_admin',
             success=True,
@@ -1980,15 +2155,22 @@ def change_password(request):
         return Response({'error': list(e.messages)[0]}, status=400)
     
     request.user.set_password(new_password)
-    request.user.save()
-    
-    return Response({'success': True, 'message': 'Password changed successfully'})
+    request.user.save(update_fields=['password'])
+
+    response = {'success': True, 'message': 'Password changed successfully'}
+    # The new password invalidates every token issued before; Bearer clients
+    # get a fresh login for this device
+    if isinstance(request.auth, dict) and 'sid' in request.auth:
+        revoke(request.auth, whole_session=True)
+        response['tokens'] = issue_tokens(request.user)
+    return Response(response)
 
 
 # ==================== PASSWORD RESET WITH OTP ====================
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@throttle_classes(PASSWORD_RESET_THROTTLES)
 def request_password_reset(request):
     """Request password reset via email or phone"""
     
@@ -2022,10 +2204,7 @@ def request_password_reset(request):
             'message': 'If an account exists, instructions will be sent'
         })
     
-    otp = generate_otp()
-    user.otp_secret = otp
-    user.otp_created_at = timezone.now()
-    user.save()
+    otp = otp_store.issue(user.id, 'password_reset')
     
     if method == 'email':
         send_otp_email(identifier, otp, user.role)
@@ -2041,6 +2220,7 @@ def request_password_reset(request):
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@throttle_classes(OTP_VERIFY_THROTTLES)
 def verify_reset_otp(request):
     """Verify OTP and allow password reset"""
     
@@ -2051,11 +2231,12 @@ def verify_reset_otp(request):
         return Response({'error': 'User ID and OTP required'}, status=400)
     
     try:
-        user = User.objects.get(id=user_id)
+        # Only the fields the reset token is derived from
+        user = User.objects.only('id', 'password', 'last_login', 'email').get(id=user_id)
     except User.DoesNotExist:
         return Response({'error': 'User not found'}, status=404)
     
-    if user.otp_secret == otp and user.otp_created_at and (timezone.now() - user.otp_created_at).seconds < 600:
+    if otp_store.verify(user.id, 'password_reset', otp):
         token = default_token_generator.make_token(user)
         return Response({
             'success': True,
@@ -2093,9 +2274,10 @@ def reset_password_with_otp(request):
     except ValidationError as e:
         return Response({'error': list(e.messages)[0]}, status=400)
     
+    # Changing the hash also invalidates the user's existing tokens (api.tokens.password_fingerprint)
     user.set_password(new_password)
-    user.otp_secret = ''
-    user.save()
+    user.save(update_fields=['password'])
+    otp_store.discard(user.id, 'password_reset')
     
     return Response({'success': True, 'message': 'Password reset successful'})
 
@@ -2186,6 +2368,7 @@ def admin_create_admin(request):
     
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@read_replica
 def export_faculty_to_sheet(request):
     """Export faculty to Google Sheet format"""
     
@@ -2254,7 +2437,7 @@ def admin_profile(request):
             request.user.phone_number = request.data.get('phone_number', request.user.phone_number)
             request.user.recovery_email = request.data.get('recovery_email', request.user.recovery_email)
             request.user.recovery_phone = request.data.get('recovery_phone', request.user.recovery_phone)
-            request.user.save()
+            request.user.save(update_fields=['email', 'phone_number', 'recovery_email', 'recovery_phone'])
             
             return Response({
                 'success': True,
@@ -2269,6 +2452,7 @@ def admin_profile(request):
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@throttle_classes(PASSWORD_RESET_THROTTLES)
 def admin_forgot_password(request):
     """Send OTP to admin's email or phone for password reset"""
     
@@ -2307,10 +2491,7 @@ def admin_forgot_password(request):
         })
     
     # Generate OTP
-    otp = generate_otp()
-    user.otp_secret = otp
-    user.otp_created_at = timezone.now()
-    user.save()
+    otp = otp_store.issue(user.id, 'password_reset')
     
     # Send OTP
     if method == 'email':
@@ -2327,6 +2508,7 @@ def admin_forgot_password(request):
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@throttle_classes(OTP_VERIFY_THROTTLES)
 def admin_verify_otp(request):
     """Verify OTP and allow password reset"""
     
@@ -2337,11 +2519,11 @@ def admin_verify_otp(request):
         return Response({'error': 'User ID and OTP required'}, status=400)
     
     try:
-        user = User.objects.get(id=user_id, role='admin')
+        user = User.objects.only('id', 'password', 'last_login', 'email').get(id=user_id, role='admin')
     except User.DoesNotExist:
         return Response({'error': 'Admin not found'}, status=404)
     
-    if user.otp_secret == otp and user.otp_created_at and (timezone.now() - user.otp_created_at).seconds < 600:
+    if otp_store.verify(user.id, 'password_reset', otp):
         # Generate reset token
         token = default_token_generator.make_token(user)
         return Response({
@@ -2383,14 +2565,16 @@ def admin_reset_password(request):
         return Response({'error': list(e.messages)[0]}, status=400)
     
     # Set new password
+    # Changing the hash also invalidates the user's existing tokens (api.tokens.password_fingerprint)
     user.set_password(new_password)
-    user.otp_secret = ''  # Clear OTP
-    user.save()
+    user.save(update_fields=['password'])
+    otp_store.discard(user.id, 'password_reset')
     
     return Response({'success': True, 'message': 'Password reset successful'})
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@read_replica
 def admin_get_all_faculty_details(request):
     """Get all faculties with their assigned groups and domains"""
     
@@ -41,11 +41,15 @@ GSHEETS = {
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',  # Whitenoise for static files
+    'api.middleware.QueryInstrumentationMiddleware',  # per-view query stats, when QUERY_INSTRUMENTATION is on
+    'api.middleware.ResponseCompressionMiddleware',  # gzip/brotli for API responses
     'corsheaders.middleware.CorsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
+    'api.middleware.AdminSecurityMiddleware',  # brute-force lockout for admin paths
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'api.middleware.ReplicaStickinessMiddleware',  # read-your-writes for replica reads
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -77,19 +81,74 @@ if os.environ.get('RENDER'):
     DATABASES = {
         'default': dj_database_url.config(
             default=os.environ.get('DATABASE_URL'),
-            conn_max_age=600,
-            conn_health_checks=True,
+            conn_max_age=int(os.environ.get('DB_CONN_MAX_AGE', 600)),
+            conn_health_checks=os.environ.get('DB_CONN_HEALTH_CHECKS', 'true').lower() == 'true',
         )
     }
+    if os.environ.get('DB_POOL', '').lower() == 'true':
+        # Threaded workers: share a per-process pool (api.db_pool) instead of
+        # one persistent connection per thread
+        DATABASES['default']['ENGINE'] = 'api.postgres_backend'
+        DATABASES['default']['CONN_MAX_AGE'] = 0
 else:
-    # Local development with SQLite
+    # Local development and small deployments with SQLite. api.sqlite_backend
+    # opens api.transactions.write_transaction() blocks with BEGIN IMMEDIATE;
+    # api.sqlite_profile sets WAL, busy_timeout and the cache pragmas on every
+    # connection
     DATABASES = {
         'default': {
-            'ENGINE': 'django.db.backends.sqlite3',
+            'ENGINE': 'api.sqlite_backend',
             'NAME': BASE_DIR / 'db.sqlite3',
         }
     }
 
+# Overrides for api.sqlite_profile.DEFAULT_PRAGMAS, e.g. {'synchronous': 'FULL'}
+SQLITE_PRAGMAS = {}
+
+
+# Read replica for heavy admin/analytics reads (api.routers): a PostgreSQL
+# streaming replica on Render, or locally a second SQLite file kept in step
+# with `manage.py sync_sqlite_replica`
+if os.environ.get('REPLICA_DATABASE_URL'):
+    DATABASES['replica'] = dj_database_url.parse(
+        os.environ['REPLICA_DATABASE_URL'],
+        conn_max_age=int(os.environ.get('DB_CONN_MAX_AGE', 600)),
+        conn_health_checks=True,
+    )
+elif os.environ.get('SQLITE_REPLICA_PATH') and not os.environ.get('RENDER'):
+    DATABASES['replica'] = {
+        'ENGINE': 'api.sqlite_backend',
+        'NAME': os.environ['SQLITE_REPLICA_PATH'],
+    }
+if 'replica' in DATABASES:
+    # Tests read and write one database
+    DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+
+DATABASE_ROUTERS = ['api.routers.ReplicaRouter']
+REPLICA_MAX_LAG_SECONDS = 10
+REPLICA_LAG_CHECK_SECONDS = 5
+# Reads stay on the primary this long after a user's write (never less than
+# max lag + check interval). With several workers the cache must be shared,
+# otherwise signed-in users are kept on the primary (see CACHES)
+REPLICA_STICKY_SECONDS = REPLICA_MAX_LAG_SECONDS + REPLICA_LAG_CHECK_SECONDS
+REPLICA_STICKY_CACHE_ALIAS = 'ratelimit'
+
+# Per-view query counts and timings (api.instrumentation), served at
+# super-admin/instrumentation/. A view running more queries than its budget
+# logs a warning with its repeated queries; QUERY_BUDGETS maps view names
+# (e.g. 'admin_all_groups') to their own budget
+QUERY_INSTRUMENTATION = os.environ.get('QUERY_INSTRUMENTATION', 'false').lower() == 'true'
+QUERY_BUDGET = 30
+QUERY_BUDGETS = {}
+
+# api.db_pool, used when DB_POOL=true: connections per worker process,
+# seconds to wait for a free one, seconds before a connection is replaced,
+# and idle seconds after which it is pinged before reuse
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 4))
+DB_POOL_TIMEOUT = 10
+DB_POOL_MAX_AGE = 600
+DB_POOL_PING_AFTER = 30
+
 
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
@@ -121,6 +180,31 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
 
+# Cache - per-process memory by default. For lockouts and throttles shared
+# across gunicorn workers set RATELIMIT_CACHE_BACKEND to
+# django.core.cache.backends.redis.RedisCache (or a Memcached backend) and
+# RATELIMIT_CACHE_LOCATION to its URL; the throttles need an atomic add(), so
+# FileBasedCache is not supported there. Sessions may use FileBasedCache with
+# a writable directory. With WEB_CONCURRENCY > 1 the api.checks system check
+# warns about aliases that are still per worker.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'groupflow-default',
+    },
+    'ratelimit': {
+        'BACKEND': os.environ.get('RATELIMIT_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('RATELIMIT_CACHE_LOCATION', 'groupflow-ratelimit'),
+    },
+    'sessions': {
+        'BACKEND': os.environ.get('SESSION_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('SESSION_CACHE_LOCATION', 'groupflow-sessions'),
+        'OPTIONS': {'MAX_ENTRIES': 20000},
+    },
+}
+RATELIMIT_CACHE_ALIAS = 'ratelimit'
+
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -129,6 +213,10 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 AUTH_USER_MODEL = 'api.User'
 
 
+# Where the React app is served; password reset emails link to it
+FRONTEND_URL = os.environ.get('FRONTEND_URL', 'http://localhost:3000').rstrip('/')
+
+
 # CORS settings
 CORS_ALLOW_ALL_ORIGINS = False
 CORS_ALLOWED_ORIGINS = [
@@ -154,8 +242,20 @@ AUTHENTICATION_BACKENDS = [
 ]
 
 
+# Admin brute-force lockout (see api.middleware.AdminSecurityMiddleware)
+ADMIN_SECURITY_PATH_PREFIXES = ('/admin/', '/api/admin/', '/api/super-admin/')
+ADMIN_LOCKOUT_MAX_ATTEMPTS = 5
+ADMIN_LOCKOUT_MINUTES = 30
+# Verifications per user and hour that may scan backup codes issued before
+# lookup tags (one PBKDF2 hash per stored code each)
+BACKUP_CODE_LEGACY_SCANS = 5
+
+
 # Session settings
-SESSION_ENGINE = 'django.contrib.sessions.backends.db'
+SESSION_ENGINE = 'api.sessions'  # cache-first, DB write-behind; plain DB sessions unless SESSION_CACHE_BACKEND is shared
+SESSION_CACHE_ALIAS = 'sessions'
+SESSION_WRITE_BEHIND_SECONDS = 2  # 0 = write through on every save
+SESSION_CLEANUP_BATCH_SIZE = 1000
 SESSION_COOKIE_AGE = 1209600  # 2 weeks
 SESSION_COOKIE_HTTPONLY = True
 SESSION_COOKIE_SAMESITE = 'Lax'
@@ -178,14 +278,98 @@ else:
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
+        'api.tokens.SignedTokenAuthentication',  # Bearer tokens, no DB lookup
         'rest_framework.authentication.SessionAuthentication',
-        'rest_framework.authentication.BasicAuthentication',
     ],
+    # Proxies in front of the app that append to X-Forwarded-For (Render: 1);
+    # api.ratelimit.client_ip and the throttles trust only their entries
+    'NUM_PROXIES': int(os.environ.get('NUM_PROXIES', 1 if os.environ.get('RENDER') else 0)),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',  # orjson when installed, stdlib otherwise
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    # Token-bucket burst sizes, refilled evenly over the period (api.throttles)
+    'DEFAULT_THROTTLE_RATES': {
+        'login_ip': '20/min',
+        'login_user': '5/min',
+        'password_reset_ip': '10/hour',
+        'password_reset_user': '5/hour',
+        'otp_verify': '5/min',
+        'lookup_ip': '60/min',
+    },
 }
 
+# One-time codes (see api.otp_utils.OTPStore). 'db' uses the narrow OTPCode
+# table; 'cache' is only used when OTP_CACHE_ALIAS is shared by all workers
+OTP_STORE = os.environ.get('OTP_STORE', 'db')
+OTP_CACHE_ALIAS = 'default'
+OTP_TTL_SECONDS = 600
+OTP_MAX_ATTEMPTS = 5
+
+# Audit log write-behind (see api.audit.AuditSink)
+AUDIT_WRITE_BEHIND = True  # False = insert inside the request
+AUDIT_FLUSH_BATCH_SIZE = 100
+AUDIT_FLUSH_INTERVAL_MS = 500
+# Runtime files of the audit log; point it at a persistent volume in production
+AUDIT_DATA_DIR = os.environ.get('AUDIT_DATA_DIR', os.path.join(BASE_DIR, 'data'))
+AUDIT_SPOOL_PATH = os.path.join(AUDIT_DATA_DIR, 'audit_spool.ndjson')  # used while audit writes fail
+
+# Audit retention (see api.retention); separate from backup.retentionDays, which only prunes backups
+AUDIT_RETENTION_DAYS = int(os.environ.get('AUDIT_RETENTION_DAYS', 90))
+AUDIT_ARCHIVE_DIR = os.path.join(BASE_DIR, 'audit_archive')
+AUDIT_ARCHIVE_CHUNK_SIZE = 1000
+
+# Online backups (see api.backups, api.backup_store); chunks use zstd when the zstandard package is installed
+BACKUP_DIR = os.path.join(BASE_DIR, 'backups')
+BACKUP_PAGES_PER_STEP = 256  # SQLite pages copied per backup step
+BACKUP_STEP_SLEEP_MS = 20  # pause between steps so writers are not stalled
+BACKUP_MAX_RESTARTS = 3  # copy in one step once concurrent writes restarted it this often
+BACKUP_CHUNK_SIZE = 256 * 1024  # deduplication unit of api.backup_store
+BACKUP_RETENTION_DAYS = 30  # used when backup.retentionDays is not set
+BACKUP_VERIFY_WORKERS = None  # threads checking chunks on restore; None = one per CPU
+BACKUP_JOB_HEARTBEAT_SECONDS = 10  # a running job re-saves its status this often
+BACKUP_JOB_STALE_SECONDS = 120  # a queued/running job without a heartbeat this long is marked failed
+BACKUP_SCHEDULE_WINDOW_MINUTES = 120  # a missed backupTime is only caught up within this window
+BACKUP_SCHEDULE_POLL_SECONDS = 60
+BACKUP_SCHEDULE_MAX_BYTES_PER_SECOND = 20 * 1024 * 1024  # scheduled runs only; None = unbounded
+BACKUP_SCHEDULE_NICE = 19
+BACKUP_GZIP_LEVEL = 6
+BACKUP_ZSTD_LEVEL = 3
+
+# Logical dump/restore commands (see api.dumps)
+DUMP_BATCH_SIZE = 2000  # rows fetched per query
+DUMP_GZIP_LEVEL = 3
+RESTORE_BATCH_SIZE = 2000  # rows per bulk insert batch
+RESTORE_WORKERS = None  # tables loaded at once on PostgreSQL; None = min(8, CPUs)
+
+# Super admin settings (system_settings.json), cached per process and
+# re-checked for changes at most this often
+SYSTEM_SETTINGS_FILE = os.path.join(BASE_DIR, 'system_settings.json')
+SYSTEM_SETTINGS_CHECK_SECONDS = 1
+
+# Cross-worker invalidation of process-local caches (api.invalidation):
+# 'db' keeps topic versions in the CacheVersion table, 'file' in an mmap'd
+# file shared by the workers of one host
+CACHE_VERSION_BACKEND = os.environ.get('CACHE_VERSION_BACKEND', 'db')
+CACHE_VERSION_FILE = os.environ.get('CACHE_VERSION_FILE', os.path.join(BASE_DIR, 'cache_versions.bin'))
+CACHE_VERSION_CHECK_MS = 500
+
+# Signed access/refresh tokens (see api.tokens)
+ACCESS_TOKEN_LIFETIME = 15 * 60  # seconds
+REFRESH_TOKEN_LIFETIME = 24 * 60 * 60
+
+# Response compression (see api.middleware.ResponseCompressionMiddleware)
+COMPRESSION_MIN_SIZE = 1024  # bytes
+COMPRESSION_BROTLI_QUALITY = 5
+# URL names whose responses carry secrets and are sent uncompressed (BREACH)
+COMPRESSION_EXCLUDE_VIEWS = (
+    'login', 'token_refresh', 'register', 'super_admin_login', 'verify_biometric_login',
+    'verify_reset_otp', 'admin_verify_otp', 'get_paper_keys', 'generate_paper_keys',
+)
+
 
 # Google Sheets Configuration
 GOOGLE_SHEET_ID = os.environ.get('GOOGLE_SHEET_ID', '')
@@ -202,6 +386,18 @@ EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'  # For testing
 # EMAIL_HOST_USER = os.environ.get('EMAIL_HOST_USER', '')
 # EMAIL_HOST_PASSWORD = os.environ.get('EMAIL_HOST_PASSWORD', '')
 
+# Email outbox (see api.mailer); request handlers enqueue, a background thread sends
+EMAIL_OUTBOX_ASYNC = True  # False = send inline when enqueued
+EMAIL_OUTBOX_BATCH_SIZE = 50
+EMAIL_OUTBOX_POLL_SECONDS = 5
+EMAIL_OUTBOX_MAX_ATTEMPTS = 5
+EMAIL_OUTBOX_RETRY_BASE_SECONDS = 30  # doubled per attempt
+EMAIL_OUTBOX_RETRY_MAX_SECONDS = 3600
+EMAIL_OUTBOX_LEASE_SECONDS = 300  # claimed but unsent emails are retried after this
+EMAIL_OUTBOX_SENT_RETENTION_DAYS = 30  # sent rows keep no body, only the envelope
+EMAIL_OUTBOX_FAILED_RETENTION_DAYS = 7  # failed rows still hold their body (OTPs, reset links)
+EMAIL_TEST_TIMEOUT = 10
+
 
 # Logging configuration
 LOGGING = {
@@ -57,13 +57,17 @@ import PasswordReset from './components/PasswordReset';
 axios.defaults.baseURL = process.env.REACT_APP_API_URL || 'http://localhost:8000/api';
 axios.defaults.withCredentials = true;
 
-// CSRF Token Interceptor
+// CSRF Token + Bearer Token Interceptor
 axios.interceptors.request.use(
   config => {
     const csrfToken = Cookies.get('csrftoken');
     if (csrfToken) {
       config.headers['X-CSRFToken'] = csrfToken;
     }
+    const tokens = JSON.parse(localStorage.getItem('tokens') || 'null');
+    if (tokens?.access && !config.headers['Authorization']) {
+      config.headers['Authorization'] = `Bearer ${tokens.access}`;
+    }
     return config;
   },
   error => {
@@ -71,6 +75,42 @@ axios.interceptors.request.use(
   }
 );
 
+// Store tokens returned by the login endpoints and refresh them once on 401
+let refreshRequest = null;
+
+axios.interceptors.response.use(
+  response => {
+    if (response.data?.tokens) {
+      localStorage.setItem('tokens', JSON.stringify(response.data.tokens));
+    }
+    if (response.config.url?.endsWith('/logout/')) {
+      localStorage.removeItem('tokens');
+    }
+    return response;
+  },
+  async error => {
+    const original = error.config;
+    const tokens = JSON.parse(localStorage.getItem('tokens') || 'null');
+    if (error.response?.status !== 401 || !tokens?.refresh || original._retried || original.url?.endsWith('/token/refresh/')) {
+      return Promise.reject(error);
+    }
+
+    original._retried = true;
+    try {
+      // Concurrent 401s share one refresh call
+      refreshRequest = refreshRequest || axios.post('/token/refresh/', { refresh: tokens.refresh });
+      const response = await refreshRequest;
+      original.headers['Authorization'] = `Bearer ${response.data.tokens.access}`;
+      return axios(original);
+    } catch (refreshError) {
+      localStorage.removeItem('tokens');
+      return Promise.reject(error);
+    } finally {
+      refreshRequest = null;
+    }
+  }
+);
+
 function App() {
   const [user, setUser] = useState(null);
   const [loading, setLoading] = useState(true);
@@ -105,13 +105,10 @@ function GroupWindow({ user }) {
 
   const fetchQueue = async () => {
     try {
-      const response = await axios.get('/selection-queue/');
+      const response = await axios.get('/selection-queue/', { params: { group_id: groupId } });
       setQueue(response.data.queue || []);
       
-      const position = response.data.queue.findIndex(
-        item => item.group_id === groupId
-      ) + 1;
-      setQueuePosition(position > 0 ? position : null);
+      setQueuePosition(response.data.group_position || null);
     } catch (error) {
       console.error('Failed to fetch queue:', error);
     }
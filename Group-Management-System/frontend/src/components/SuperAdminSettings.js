@@ -174,16 +174,36 @@ function SuperAdminSettings() {
     }
   };
 
+  const pollBackup = (jobId) => {
+    const timer = setInterval(async () => {
+      try {
+        const response = await axios.get(`/super-admin/backup/status/${jobId}/`);
+        const job = response.data.job;
+        if (job.status === 'succeeded') {
+          clearInterval(timer);
+          toast.success('✅ Backup completed successfully!');
+          fetchSettings();
+        } else if (job.status === 'failed') {
+          clearInterval(timer);
+          toast.error(`Backup failed: ${job.error}`);
+        }
+      } catch (error) {
+        clearInterval(timer);
+        toast.error('Could not get backup status');
+      }
+    }, 2000);
+  };
+
   const runBackup = async () => {
     if (window.confirm('Start manual backup now?')) {
       try {
         const response = await axios.post('/super-admin/backup/');
         if (response.data.success) {
-          toast.success('✅ Backup completed successfully!');
-          fetchSettings();
+          toast.info('Backup started...');
+          pollBackup(response.data.job.id);
         }
       } catch (error) {
-        toast.error('Backup failed');
+        toast.error(error.response?.data?.error || 'Backup failed');
       }
     }
   };